@@ -6,29 +6,11 @@ Service
 
 """
 
-from ._access_service import *
-from ._errors import *
-from ._checksum import *
-from ._request import *
-from ._runrequest import *
-from ._worksheet import *
+_submodules = ["_access_service", "_errors", "_checksum", "_request",
+               "_runrequest", "_worksheet"]
 
-try:
-    if __IPYTHON__:
-        def _set_printer(C):
-            """Function to tell ipython to use __str__ if available"""
-            get_ipython().display_formatter.formatters['text/plain'].for_type(
-                C,
-                lambda obj, p, cycle: p.text(str(obj) if not cycle else '...')
-                )
+# the objects in this module are only imported when they are first
+# used, so that importing this module is fast
+from Acquire.Stubs import lazy_package as _lazy_package
 
-        import sys as _sys
-        import inspect as _inspect
-
-        _clsmembers = _inspect.getmembers(_sys.modules[__name__],
-                                          _inspect.isclass)
-
-        for _clsmember in _clsmembers:
-            _set_printer(_clsmember[1])
-except:
-    pass
+__getattr__, __dir__ = _lazy_package(__name__, _submodules)
@@ -177,19 +177,23 @@ class WorkSheet:
         # value in the credit notes
         self.save()
 
-        compute_cheque = _Cheque.write(
-                                account=access_account,
-                                resource="work %s" % self.uid(),
-                                max_spend=10.0,
-                                recipient_url=compute_service.canonical_url(),
-                                expiry_date=endtime)
-
-        storage_cheque = _Cheque.write(
-                                account=access_account,
-                                resource="work %s" % self.uid(),
-                                max_spend=10.0,
-                                recipient_url=storage_service.canonical_url(),
-                                expiry_date=endtime)
+        def _write_cheque(service):
+            return _Cheque.write(account=access_account,
+                                 resource="work %s" % self.uid(),
+                                 max_spend=10.0,
+                                 recipient_url=service.canonical_url(),
+                                 expiry_date=endtime)
+
+        # the two cheques are independent, so are written concurrently
+        from concurrent.futures import ThreadPoolExecutor \
+            as _ThreadPoolExecutor
+
+        with _ThreadPoolExecutor(max_workers=2) as pool:
+            compute_cheque = pool.submit(_write_cheque, compute_service)
+            storage_cheque = pool.submit(_write_cheque, storage_service)
+
+            compute_cheque = compute_cheque.result()
+            storage_cheque = storage_cheque.result()
 
         self._compute_cheque = compute_cheque
         self._storage_cheque = storage_cheque
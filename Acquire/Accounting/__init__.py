@@ -5,39 +5,13 @@ This module implements everything necessary to build an
 Acquire Accounting Service
 """
 
-from ._account import *
-from ._accounts import *
-from ._balance import *
-from ._errors import *
-from ._transaction import *
-from ._transactionrecord import *
-from ._accounting_service import *
-from ._creditnote import *
-from ._debitnote import *
-from ._pairednote import *
-from ._lineitem import *
-from ._receipt import *
-from ._decimal import *
-from ._transactioninfo import *
-from ._ledger import *
-from ._refund import *
+_submodules = ["_account", "_accounts", "_balance", "_errors", "_transaction",
+               "_transactionrecord", "_accounting_service", "_creditnote",
+               "_debitnote", "_pairednote", "_lineitem", "_receipt",
+               "_decimal", "_transactioninfo", "_ledger", "_refund"]
 
-try:
-    if __IPYTHON__:
-        def _set_printer(C):
-            """Function to tell ipython to use __str__ if available"""
-            get_ipython().display_formatter.formatters['text/plain'].for_type(
-                C,
-                lambda obj, p, cycle: p.text(str(obj) if not cycle else '...')
-                )
+# the objects in this module are only imported when they are first
+# used, so that importing this module is fast
+from Acquire.Stubs import lazy_package as _lazy_package
 
-        import sys as _sys
-        import inspect as _inspect
-
-        _clsmembers = _inspect.getmembers(_sys.modules[__name__],
-                                          _inspect.isclass)
-
-        for _clsmember in _clsmembers:
-            _set_printer(_clsmember[1])
-except:
-    pass
+__getattr__, __dir__ = _lazy_package(__name__, _submodules)
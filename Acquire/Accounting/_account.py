@@ -1,31 +1,15 @@
 
 __all__ = ["Account"]
 
+# the maximum number of times to retry a compare-and-swap of the
+# pointer to the latest hourly balance before giving up
+_max_cas_attempts = 100
+
 
 def _account_root():
     return "accounting/accounts"
 
 
-def _get_last_day(datetime):
-    """Return the start of the day before 'datetime', e.g.
-       _get_last_day(April 1st) will return March 31st
-    """
-    import datetime as _datetime
-    datetime = datetime - _datetime.timedelta(days=1)
-    return _datetime.datetime(year=datetime.year, month=datetime.month,
-                              day=datetime.day, tzinfo=datetime.tzinfo)
-
-
-def _get_last_month(datetime):
-    """Return the date at the start of the month before 'datetime', e.g.
-       _get_last_month(March 21st) will return February 1st
-    """
-    import datetime as _datetime
-    datetime = datetime.replace(day=1) - _datetime.timedelta(days=1)
-    return _datetime.datetime(year=datetime.year, month=datetime.month,
-                              day=1, tzinfo=datetime.tzinfo)
-
-
 def _get_hourly_datetime(datetime):
     """Return the datetime for the top of the hour of 'datetime',
        e.g. 5.42pm would return 5.00pm
@@ -72,6 +56,35 @@ def _get_key_from_month(start, datetime):
     return "%s/%4d-%02d" % (start, datetime.year, datetime.month)
 
 
+def _get_next_day(datetime):
+    """Return the start of the day after 'datetime', e.g.
+       _get_next_day(March 31st 5.42pm) will return April 1st
+    """
+    import datetime as _datetime
+    datetime = datetime + _datetime.timedelta(days=1)
+    return _datetime.datetime(year=datetime.year, month=datetime.month,
+                              day=datetime.day, tzinfo=datetime.tzinfo)
+
+
+def _get_next_month(datetime):
+    """Return the date at the start of the month after 'datetime', e.g.
+       _get_next_month(March 21st) will return April 1st
+    """
+    import datetime as _datetime
+    datetime = datetime.replace(day=28) + _datetime.timedelta(days=4)
+    return _datetime.datetime(year=datetime.year, month=datetime.month,
+                              day=1, tzinfo=datetime.tzinfo)
+
+
+def _get_day_datetime(datetime):
+    """Return the datetime for midnight at the start of the day
+       of 'datetime'
+    """
+    import datetime as _datetime
+    return _datetime.datetime(year=datetime.year, month=datetime.month,
+                              day=datetime.day, tzinfo=datetime.tzinfo)
+
+
 def _get_hour_from_key(key):
     """Return the date that is encoded in the passed key"""
     import re as _re
@@ -295,11 +308,14 @@ class Account:
         self._save_account(bucket)
 
     def _get_transactions_between(self, start_datetime, end_datetime,
-                                  bucket=None):
+                                  bucket=None, include_start=False,
+                                  include_end=True):
         """Return all of the object store keys for transactions in this
            account beteen 'start_datetime' and 'end_datetime' (inclusive, e.g.
            start_datetime < transaction <= end_datetime). This will return an
-           empty list if there were no transactions in this time
+           empty list if there were no transactions in this time. Pass
+           'include_start' or 'include_end' to change whether transactions
+           at exactly 'start_datetime' or 'end_datetime' are included
         """
         # convert both times to UTC
         from Acquire.ObjectStore import datetime_to_datetime \
@@ -316,11 +332,23 @@ class Account:
         start_day = start_datetime.toordinal()
         end_day = end_datetime.toordinal()
 
-        if end_datetime.time() == _datetime.time():
+        if end_datetime.time() == _datetime.time() and not include_end:
             # this ends on midnight of the first day - do not
             # include this last day as nothing will match
             end_day -= 1
 
+        def _is_between(datetime):
+            if include_start:
+                if datetime < start_datetime:
+                    return False
+            elif datetime <= start_datetime:
+                return False
+
+            if include_end:
+                return datetime <= end_datetime
+            else:
+                return datetime < end_datetime
+
         from Acquire.ObjectStore import string_to_datetime \
             as _string_to_datetime
         from Acquire.ObjectStore import date_to_string as _date_to_string
@@ -348,17 +376,16 @@ class Account:
 
                 for key in keys:
                     transaction = _TransactionInfo.from_key(key)
-                    datetime = transaction.datetime()
-                    if datetime > start_datetime and datetime <= end_datetime:
+                    if _is_between(transaction.datetime()):
                         transactions.append(transaction)
 
             return transactions
 
-        # elif num_days < 300:  Try a better algorithm for weeks and months
-
         else:
             # likely more than years - easier to just scan all transactions
-            # on the account
+            # on the account. Note that balances over long periods should
+            # use _get_balance_between, which uses the daily and monthly
+            # roll-ups rather than listing every transaction
             prefix = self._transactions_key()
 
             try:
@@ -371,99 +398,274 @@ class Account:
 
             for key in keys:
                 transaction = _TransactionInfo.from_key(key)
-                datetime = transaction.datetime()
-                if datetime > start_datetime and datetime <= end_datetime:
+                if _is_between(transaction.datetime()):
                     transactions.append(transaction)
 
             return transactions
 
-    def _get_balance_key(self, now=None):
-        """Return the balance key for the passed time. This is the key
-           into the object store of the object that holds the starting
-           balance for the account on the hour of the passed datetime.
-           If 'now' is None, then the key for actual now is returned
+    def _get_rollup(self, start, period, bucket=None):
+        """Return the summed Balance of all transactions in the day
+           (if 'period' is "day") or month (if 'period' is "month") that
+           starts at 'start' (i.e. start <= transaction < end of the
+           period, as the transactions are found from the day or month
+           prefix of their keys). The sum is saved as a roll-up in the
+           object store once the period is complete, so that it
+           does not need to be recalculated
         """
+        from Acquire.Accounting import Balance as _Balance
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
 
-        if self.is_null():
-            return None
+        if period == "day":
+            rollup_key = _get_key_from_day(start="%s/day" % self._rollup_key(),
+                                           datetime=start)
+            prefix = _get_key_from_day(start=self._transactions_key(),
+                                       datetime=start)
+            end = _get_next_day(start)
         else:
-            return _get_key_from_hour(start=self._balance_key(),
-                                      datetime=self._get_now(now))
+            rollup_key = _get_key_from_month(
+                                    start="%s/month" % self._rollup_key(),
+                                    datetime=start)
+            prefix = _get_key_from_month(start=self._transactions_key(),
+                                         datetime=start)
+            end = _get_next_month(start)
 
-    def _find_last_balance_key(self, now=None, bucket=None):
-        """Return the key containing the last hourly balance update before
-           'now' (defaults to actual now if not set)
-        """
-        from Acquire.ObjectStore import ObjectStore as _ObjectStore
-        now = self._get_now(now)
         bucket = self._get_account_bucket(bucket)
-        start = self._balance_key()
 
-        # look for any balance keys from today
-        prefix = _get_key_from_day(start=start, datetime=now)
         try:
-            keys = _ObjectStore.get_all_object_names(bucket=bucket,
-                                                     prefix=prefix)
+            data = _ObjectStore.get_object_from_json(bucket=bucket,
+                                                     key=rollup_key)
+            return _Balance.from_data(data)
         except:
-            keys = []
+            pass
 
-        if len(keys) > 0:
-            keys.sort()
-            return keys[-1]
-
-        # look for any balance keys from yesterday
-        # (we do this to stop big lookups for active accounts when
-        #  we jump between months)
-        now = _get_last_day(now)
-        prefix = _get_key_from_day(start=start, datetime=now)
         try:
             keys = _ObjectStore.get_all_object_names(bucket=bucket,
                                                      prefix=prefix)
         except:
             keys = []
 
-        if len(keys) > 0:
-            keys.sort()
-            return keys[-1]
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+        rollup = _sum_transactions(
+                            [_TransactionInfo.from_key(key) for key in keys])
+
+        # only save the roll-up if no more transactions can be added
+        # to this period, using the same top-of-the-hour rule as
+        # the hourly balances
+        if end <= _get_hourly_datetime(self._get_now()):
+            _ObjectStore.set_object_from_json(bucket=bucket,
+                                              key=rollup_key,
+                                              data=rollup.to_data())
+
+        return rollup
+
+    def _get_first_transaction_day(self, bucket=None):
+        """Return midnight at the start of the day of the first
+           transaction in this account, or None if there have not
+           been any transactions. This is recorded in the object
+           store after it has been found
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import datetime_to_string \
+            as _datetime_to_string
+        from Acquire.ObjectStore import string_to_datetime \
+            as _string_to_datetime
+
+        bucket = self._get_account_bucket(bucket)
+        first_key = "%s/first" % self._rollup_key()
 
-        # look for any balance keys from this month
-        prefix = _get_key_from_month(start=start, datetime=now)
         try:
-            keys = _ObjectStore.get_all_object_names(bucket=bucket,
-                                                     prefix=prefix)
+            data = _ObjectStore.get_object_from_json(bucket=bucket,
+                                                     key=first_key)
+            return _string_to_datetime(data["datetime"])
+        except:
+            pass
+
+        try:
+            keys = _ObjectStore.get_all_object_names(
+                                        bucket=bucket,
+                                        prefix=self._transactions_key())
         except:
             keys = []
 
-        if len(keys) > 0:
-            keys.sort()
-            return keys[-1]
+        if len(keys) == 0:
+            return None
+
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+        first_day = _get_day_datetime(
+                        _TransactionInfo.from_key(min(keys)).datetime())
+
+        _ObjectStore.set_object_from_json(
+                            bucket=bucket, key=first_key,
+                            data={"datetime": _datetime_to_string(first_day)})
+
+        return first_day
+
+    def _get_balance_between(self, start_datetime, end_datetime,
+                             bucket=None):
+        """Return the summed Balance of all transactions in this account
+           between 'start_datetime' and 'end_datetime' (inclusive, e.g.
+           start_datetime < transaction <= end_datetime). Whole months
+           and days in this range are summed from their roll-ups, so only
+           the partial days at either end need their transactions
+           to be listed. The roll-ups include transactions at exactly
+           midnight at the start of their day, so the range is split
+           into (start_datetime, first_day), the roll-ups covering
+           [first_day, last_day) and [last_day, end_datetime]
+        """
+        from Acquire.ObjectStore import datetime_to_datetime \
+            as _datetime_to_datetime
+
+        if start_datetime is None or end_datetime is None:
+            raise ValueError("NULL %s | %s" % (start_datetime, end_datetime))
+
+        start_datetime = _datetime_to_datetime(start_datetime)
+        end_datetime = _datetime_to_datetime(end_datetime)
+
+        # the whole days in this range are from first_day to last_day.
+        # The day that starts at start_datetime is never whole, as a
+        # transaction at exactly start_datetime is not included
+        first_day = _get_next_day(_get_day_datetime(start_datetime))
+        last_day = _get_day_datetime(end_datetime)
+
+        if first_day >= last_day:
+            # no whole days - just sum up the transactions
+            return _sum_transactions(self._get_transactions_between(
+                                            start_datetime=start_datetime,
+                                            end_datetime=end_datetime,
+                                            bucket=bucket))
+
+        bucket = self._get_account_bucket(bucket)
+
+        if (last_day - first_day).days > 366:
+            # there are no transactions before the first transaction
+            # day, so there is no need to look at roll-ups before then
+            # (this stops us walking back to the beginning of time)
+            first_transaction_day = self._get_first_transaction_day(bucket)
+
+            if first_transaction_day is None:
+                from Acquire.Accounting import Balance as _Balance
+                return _Balance()
+            elif first_transaction_day > first_day:
+                # there are no transactions before this day, so
+                # nothing is missed by starting the roll-ups here
+                first_day = min(first_transaction_day, last_day)
+                start_datetime = first_day
+
+        total = _sum_transactions(self._get_transactions_between(
+                                            start_datetime=start_datetime,
+                                            end_datetime=first_day,
+                                            bucket=bucket,
+                                            include_end=False))
+
+        day = first_day
+
+        while day < last_day:
+            if day.day == 1 and _get_next_month(day) <= last_day:
+                total = total + self._get_rollup(start=day, period="month",
+                                                 bucket=bucket)
+                day = _get_next_month(day)
+            else:
+                total = total + self._get_rollup(start=day, period="day",
+                                                 bucket=bucket)
+                day = _get_next_day(day)
+
+        total = total + _sum_transactions(self._get_transactions_between(
+                                            start_datetime=last_day,
+                                            end_datetime=end_datetime,
+                                            bucket=bucket,
+                                            include_start=True))
+
+        return total
+
+    def _get_balance_key(self, now=None):
+        """Return the balance key for the passed time. This is the key
+           into the object store of the object that holds the starting
+           balance for the account on the hour of the passed datetime.
+           If 'now' is None, then the key for actual now is returned
+        """
 
-        for _ in range(0, 6):
-            now = _get_last_month(now)
-            prefix = _get_key_from_month(start=start, datetime=now)
+        if self.is_null():
+            return None
+        else:
+            return _get_key_from_hour(start=self._balance_key(),
+                                      datetime=self._get_now(now))
+
+    def _set_last_balance_key(self, hourly_key, bucket=None):
+        """Record that 'hourly_key' is the key of the latest hourly
+           balance of this account. This pointer only ever moves
+           forwards in time, and is updated using compare-and-swap,
+           so that concurrent writers cannot move it backwards
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        import json as _json
+
+        bucket = self._get_account_bucket(bucket)
+        key = self._last_balance_key()
+        data = _json.dumps({"key": hourly_key}).encode("utf-8")
+
+        for _attempt in range(0, _max_cas_attempts):
             try:
-                keys = _ObjectStore.get_all_object_names(bucket=bucket,
-                                                         prefix=prefix)
+                (last_data, etag) = _ObjectStore.get_object_and_etag(bucket,
+                                                                     key)
             except:
-                keys = []
+                (last_data, etag) = (None, None)
+
+            try:
+                last_key = _json.loads(last_data.decode("utf-8"))["key"]
+            except:
+                last_key = None
+
+            if last_key is not None and last_key >= hourly_key:
+                # someone has already moved the pointer past this key
+                return
 
-            if len(keys) > 0:
-                keys.sort()
-                return keys[-1]
+            if _ObjectStore.set_object_if(bucket, key, data,
+                                          etag) is not None:
+                return
+
+        from Acquire.Accounting import AccountError
+        raise AccountError(
+            "Cannot update the latest balance of account '%s' as it is "
+            "being updated too often" % self.uid())
+
+    def _find_last_balance_key(self, now=None, bucket=None):
+        """Return the key containing the last hourly balance update before
+           'now' (defaults to actual now if not set). This is read from
+           the latest balance pointer, which is rebuilt from a scan
+           of all of the balance keys if it is missing
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        now = self._get_now(now)
+        bucket = self._get_account_bucket(bucket)
 
-        # wow - no balance keys at all over the last 6 months. Look for
-        # *any* balance keys
         try:
-            keys = _ObjectStore.get_all_object_names(bucket=bucket,
-                                                     prefix=prefix)
+            data = _ObjectStore.get_object_from_json(
+                                        bucket=bucket,
+                                        key=self._last_balance_key())
+            last_key = data["key"]
+        except:
+            last_key = None
+
+        if last_key is not None:
+            if _get_hour_from_key(last_key) < now:
+                return last_key
+
+        # the pointer is missing, or we are looking for a balance
+        # earlier than the latest - scan all of the balance keys
+        try:
+            keys = _ObjectStore.get_all_object_names(
+                                        bucket=bucket,
+                                        prefix=self._balance_key())
         except:
             keys = []
 
         if len(keys) > 0:
+            if last_key is None:
+                self._set_last_balance_key(max(keys), bucket=bucket)
+
             keys.sort()
             # can only return the latest key before 'now'
-            for i in range(len(keys)-1, 0, -1):
-                key = keys[i]
+            for key in reversed(keys):
                 hourly_time = _get_hour_from_key(key)
 
                 if hourly_time < now:
@@ -480,6 +682,7 @@ class Account:
         hourly_balance = _Balance()
         _ObjectStore.set_object_from_json(bucket=bucket, key=hourly_key,
                                           data=hourly_balance.to_data())
+        self._set_last_balance_key(hourly_key, bucket=bucket)
 
         return hourly_key
 
@@ -523,17 +726,18 @@ class Account:
             last_balance = _Balance.from_data(data)
             last_balance_time = _get_hour_from_key(last_balance_key)
 
-            transactions = self._get_transactions_between(
+            total = self._get_balance_between(
                                         start_datetime=last_balance_time,
-                                        end_datetime=hourly_now_time)
-
-            total = _sum_transactions(transactions)
+                                        end_datetime=hourly_now_time,
+                                        bucket=bucket)
 
             hourly_balance = last_balance + total
 
-        _ObjectStore.set_object_from_json(bucket=bucket,
-                                          key=hourly_key,
-                                          data=hourly_balance.to_data())
+            _ObjectStore.set_object_from_json(bucket=bucket,
+                                              key=hourly_key,
+                                              data=hourly_balance.to_data())
+
+            self._set_last_balance_key(hourly_key, bucket=bucket)
 
         self._last_update[hourly_key] = \
             {"hourly_balance": hourly_balance,
@@ -594,12 +798,10 @@ class Account:
 
         # next, get the transactions that have taken place since the last
         # update and sum them to get the current balance
-        transactions = self._get_transactions_between(
+        total = last_update_balance + self._get_balance_between(
                                  start_datetime=last_update_time,
                                  end_datetime=now, bucket=bucket)
 
-        total = last_update_balance + _sum_transactions(transactions)
-
         self._last_update[hourly_key] = {"hourly_balance": hourly_balance,
                                          "last_update_time": now,
                                          "last_update_balance": total}
@@ -1223,6 +1425,212 @@ class Account:
 
         return (uid, now, receipt_by)
 
+    def _debit_batch(self, transactions, authorisation,
+                     is_provisional, receipt_by,
+                     authorisation_resource=None, bucket=None):
+        """Debit the value of all of the passed transactions from this
+           account in a single pass. This is equivalent to calling
+           _debit for each transaction, except that the authorisation
+           and the balance are only checked once, against the summed
+           value of all of the transactions. Either all of the
+           debits are recorded, or (e.g. if there are insufficient funds)
+           none of them are.
+
+           Note that this function is private as it should only be called
+           by the DebitNote class
+
+            Args:
+                transactions (list): The Transactions to be debited
+                from this account
+                authorisation (Authorisation): Authorisation for the
+                transactions
+                is_provisional (bool): If True the transactions will be
+                recorded as liabilities
+                receipt_by (datetime): Datetime by which the transactions
+                should be receipted
+                bucket (dict, default=None): Bucket to load data from
+
+            Returns:
+                list: A (uid, now, receipt_by) tuple for each transaction
+        """
+        if self.is_null() or len(transactions) == 0:
+            return []
+
+        from Acquire.Accounting import Transaction as _Transaction
+
+        total_value = 0
+
+        for transaction in transactions:
+            if not isinstance(transaction, _Transaction):
+                raise TypeError(
+                    "The passed transaction must be a Transaction!")
+
+            if transaction.value() <= 0:
+                raise ValueError("You cannot batch-debit a transaction "
+                                 "with a non-positive value: %s" %
+                                 transaction)
+
+            total_value += transaction.value()
+
+        if authorisation_resource is None:
+            for transaction in transactions:
+                self.assert_valid_authorisation(
+                                    authorisation=authorisation,
+                                    resource=transaction.fingerprint(),
+                                    accept_partial_match=True)
+        else:
+            self.assert_valid_authorisation(
+                                    authorisation=authorisation,
+                                    resource=authorisation_resource,
+                                    accept_partial_match=False)
+
+        bucket = self._get_account_bucket()
+
+        balance = self.balance(bucket=bucket)
+
+        if balance.available(self.get_overdraft_limit()) < total_value:
+            from Acquire.Accounting import InsufficientFundsError
+            raise InsufficientFundsError(
+                "You cannot debit '%s' from account %s as there "
+                "are insufficient funds in this account." %
+                (total_value, str(self)))
+
+        from Acquire.ObjectStore import datetime_to_string \
+            as _datetime_to_string
+        from Acquire.ObjectStore import datetime_to_datetime \
+            as _datetime_to_datetime
+        from Acquire.ObjectStore import get_datetime_future \
+            as _get_datetime_future
+        from Acquire.ObjectStore import create_uuid as _create_uuid
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Accounting import LineItem as _LineItem
+
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+        from Acquire.Accounting import TransactionCode as _TransactionCode
+
+        if is_provisional:
+            code = _TransactionCode.CURRENT_LIABILITY
+        else:
+            code = _TransactionCode.DEBIT
+
+        while True:
+            # create a UID and datetime for each debit - all debits
+            # are recorded at the same time
+            now = self._get_safe_now()
+
+            if is_provisional:
+                if receipt_by is None:
+                    receipt_by = _get_datetime_future(days=7)
+                else:
+                    receipt_by = _datetime_to_datetime(receipt_by)
+
+                delta = (receipt_by - now).total_seconds()
+                if delta < 3600:
+                    from Acquire.Accounting import AccountError
+                    raise AccountError(
+                        "You cannot request a receipt to be provided less "
+                        "than 1 hour into the future! %s versus %s is only "
+                        "%s second(s) in the future!" %
+                        (_datetime_to_string(receipt_by),
+                         _datetime_to_string(now), delta))
+            else:
+                receipt_by = None
+
+            datetime_key = _datetime_to_string(now)
+
+            items = []
+
+            for transaction in transactions:
+                uid = "%s/%s" % (datetime_key, _create_uuid()[0:8])
+                encoded_value = _TransactionInfo.encode(code,
+                                                        transaction.value())
+                item_key = "%s/%s/%s" % (self._transactions_key(),
+                                         uid, encoded_value)
+                items.append((uid, item_key, _LineItem(uid, authorisation)))
+
+            # validate that we have not stepped into another hour...
+            now2 = self._get_safe_now()
+
+            if now.hour == now2.hour:
+                break
+
+        for (uid, item_key, line_item) in items:
+            _ObjectStore.set_object_from_json(bucket=bucket, key=item_key,
+                                              data=line_item.to_data())
+
+        balance = self.balance(bucket=bucket)
+
+        if balance.available(overdraft_limit=self._overdraft_limit) < 0:
+            # These transactions have helped push the account beyond the
+            # overdraft limit. This can only happen if two debits
+            # take place at the same time - all should be rescinded
+            for (uid, item_key, line_item) in items:
+                self._rescind_item(item_key, bucket=bucket)
+
+            from Acquire.Accounting import InsufficientFundsError
+            raise InsufficientFundsError(
+                "You cannot debit '%s' from account %s as there "
+                "are insufficient funds in this account." %
+                (total_value, str(self)))
+
+        return [(uid, now, receipt_by) for (uid, _, _) in items]
+
+    def _rescind_item(self, item_key, bucket=None):
+        """Record a new line item that rescinds the transaction recorded
+           at 'item_key' (as nothing can be deleted from the ledger)
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Accounting import LineItem as _LineItem
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+
+        info = _TransactionInfo.from_key(item_key)
+        info = _TransactionInfo.rescind(info)
+
+        line_item = _LineItem(uid=info.dated_uid(), authorisation=None)
+
+        item_key = "%s/%s" % (self._transactions_key(), info.to_key())
+
+        bucket = self._get_account_bucket(bucket)
+        _ObjectStore.set_object_from_json(bucket=bucket, key=item_key,
+                                          data=line_item.to_data())
+
+    def _rescind_note(self, note, bucket=None):
+        """Rescind the debit or credit recorded in this account by
+           the passed DebitNote or CreditNote. This is used to
+           undo all of the notes of a multi-part transaction if
+           any part fails
+        """
+        from Acquire.Accounting import DebitNote as _DebitNote
+        from Acquire.Accounting import CreditNote as _CreditNote
+        from Acquire.Accounting import TransactionInfo as _TransactionInfo
+        from Acquire.Accounting import TransactionCode as _TransactionCode
+
+        if isinstance(note, _DebitNote):
+            if note.is_provisional():
+                code = _TransactionCode.CURRENT_LIABILITY
+            else:
+                code = _TransactionCode.DEBIT
+        elif isinstance(note, _CreditNote):
+            if note.is_provisional():
+                code = _TransactionCode.ACCOUNT_RECEIVABLE
+            else:
+                code = _TransactionCode.CREDIT
+        else:
+            raise TypeError("You can only rescind a DebitNote or CreditNote")
+
+        if note.is_null():
+            return
+
+        if note.account_uid() != self.uid():
+            raise ValueError("You cannot rescind a note from account %s "
+                             "using account %s" %
+                             (note.account_uid(), self.uid()))
+
+        item_key = "%s/%s/%s" % (self._transactions_key(), note.uid(),
+                                 _TransactionInfo.encode(code, note.value()))
+
+        self._rescind_item(item_key, bucket=bucket)
+
     def get_overdraft_limit(self):
         """Return the overdraft limit of this account
 
@@ -1312,6 +1720,24 @@ class Account:
         else:
             return "%s/balance" % self._key()
 
+    def _last_balance_key(self):
+        """Return the key of the pointer to the latest hourly balance
+           for this account in the object store
+        """
+        if self.is_null():
+            return None
+        else:
+            return "%s/last_balance" % self._key()
+
+    def _rollup_key(self):
+        """Return the root key for the daily and monthly roll-ups
+           of the transactions for this account in the object store
+        """
+        if self.is_null():
+            return None
+        else:
+            return "%s/rollup" % self._key()
+
     def _load_account(self, bucket=None):
         """Load the current state of the account from the object store"""
         if self.is_null():
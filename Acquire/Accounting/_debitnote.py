@@ -382,6 +382,73 @@ class DebitNote:
         else:
             assert(receipt_by is None)
 
+    @staticmethod
+    def _create_from_transactions(transactions, account, authorisation,
+                                  authorisation_resource,
+                                  is_provisional, receipt_by, bucket):
+        """Function used to construct the debit notes for all of the
+           passed transactions, extracting their total value from
+           the passed account in a single batch. Either all of the
+           debits succeed, or none of them are recorded
+
+           Args:
+                transactions (list): Transactions that hold the values
+                to be used
+                account (Account): Account to take value from
+                authorisation (Authorisation): Authorises the removal
+                of value from account
+                is_provisional (bool): Whether the debits are provisional
+                receipt_by (datetime): Datetime by which debits must be
+                receipted
+                bucket (dict): Bucket to read data from
+
+           Returns:
+                list: DebitNotes for each transaction
+        """
+        from Acquire.Accounting import Account as _Account
+
+        if not isinstance(account, _Account):
+            raise TypeError("You can only create a DebitNote with a valid "
+                            "Account")
+
+        if authorisation is not None:
+            from Acquire.Identity import Authorisation as _Authorisation
+
+            if not isinstance(authorisation, _Authorisation):
+                raise TypeError("Authorisation must be of type Authorisation")
+
+        debits = account._debit_batch(
+                        transactions=transactions,
+                        authorisation=authorisation,
+                        authorisation_resource=authorisation_resource,
+                        is_provisional=is_provisional,
+                        receipt_by=receipt_by, bucket=bucket)
+
+        from Acquire.ObjectStore import datetime_to_datetime \
+            as _datetime_to_datetime
+
+        notes = []
+
+        for (transaction, (uid, datetime, receipt_by)) in zip(
+                                                    transactions, debits):
+            note = DebitNote()
+            note._transaction = transaction
+            note._account_uid = account.uid()
+            note._authorisation = authorisation
+            note._is_provisional = is_provisional
+            note._datetime = _datetime_to_datetime(datetime)
+            note._uid = str(uid)
+
+            if is_provisional:
+                assert(receipt_by is not None)
+                note._receipt_by = receipt_by
+            else:
+                assert(receipt_by is None)
+
+            notes.append(note)
+
+        return notes
+
     def to_data(self):
         """Return this DebitNote as a dictionary that can be encoded as json
 
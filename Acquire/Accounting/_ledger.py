@@ -278,7 +278,8 @@ class Ledger:
                 debit_account=None, credit_account=None,
                 authorisation=None,
                 authorisation_resource=None,
-                is_provisional=False, receipt_by=None, bucket=None):
+                is_provisional=False, receipt_by=None, batch=False,
+                bucket=None):
         """Perform the passed transaction(s) between 'debit_account' and
            'credit_account', recording the 'authorisation' for this
            transaction. If 'is_provisional' then record this as a provisional
@@ -293,6 +294,9 @@ class Ledger:
 
            Note that if several transactions are passed, then they must all
            succeed. If one of them fails then they are immediately refunded.
+           If 'batch' is True then the transactions are debited together,
+           checking the authorisation and balance once against their
+           summed value, rather than once per transaction.
 
            Args:
                 transactions (list) : List of Transactions to process
@@ -304,6 +308,8 @@ class Ledger:
                 are provisional
                 receipt_by (datetime, default=None): Date by which transactions
                 must be receipted
+                batch (bool, default=False): Whether to debit all of the
+                transactions in a single batch
                 bucket (dict): Bucket to load data from
 
             Returns:
@@ -355,6 +361,16 @@ class Ledger:
                 as _get_service_account_bucket
             bucket = _get_service_account_bucket()
 
+        if batch:
+            return Ledger._perform_batch(
+                        transactions=transactions,
+                        debit_account=debit_account,
+                        credit_account=credit_account,
+                        authorisation=authorisation,
+                        authorisation_resource=authorisation_resource,
+                        is_provisional=is_provisional,
+                        receipt_by=receipt_by, bucket=bucket)
+
         # first, try to debit all of the transactions. If any fail (e.g.
         # because there is insufficient balance) then they are all
         # immediately refunded
@@ -460,6 +476,72 @@ class Ledger:
         return Ledger._record_to_ledger(paired_notes, is_provisional,
                                         bucket=bucket)
 
+    @staticmethod
+    def _perform_batch(transactions, debit_account, credit_account,
+                       authorisation, authorisation_resource,
+                       is_provisional, receipt_by, bucket):
+        """Internal function used by 'perform' to perform all of the
+           passed transactions as a single batch. The debit account is
+           only checked once for the total value of the transactions,
+           after which all of the credit notes and paired notes are
+           created in one pass. If anything fails then all of the
+           debits and credits that have been recorded are rescinded
+
+           Returns:
+                list: List of TransactionRecords
+        """
+        from Acquire.Accounting import DebitNote as _DebitNote
+        from Acquire.Accounting import CreditNote as _CreditNote
+        from Acquire.Accounting import PairedNote as _PairedNote
+
+        # zero-value transactions are not worth recording
+        transactions = [t for t in transactions if t.value() > 0]
+
+        if len(transactions) == 0:
+            return []
+
+        # this will either debit all of the transactions or none of them
+        debit_notes = _DebitNote._create_from_transactions(
+                            transactions=transactions,
+                            account=debit_account,
+                            authorisation=authorisation,
+                            authorisation_resource=authorisation_resource,
+                            is_provisional=is_provisional,
+                            receipt_by=receipt_by, bucket=bucket)
+
+        credit_notes = {}
+
+        try:
+            for debit_note in debit_notes:
+                credit_notes[debit_note.uid()] = _CreditNote(
+                                                    debit_note,
+                                                    credit_account,
+                                                    bucket=bucket)
+
+            paired_notes = _PairedNote.create(debit_notes, credit_notes)
+        except Exception as e:
+            # rescind everything that has been recorded
+            try:
+                for credit_note in credit_notes.values():
+                    credit_account._rescind_note(credit_note, bucket=bucket)
+
+                for debit_note in debit_notes:
+                    debit_account._rescind_note(debit_note, bucket=bucket)
+            except Exception as e2:
+                from Acquire.Accounting import UnbalancedLedgerError
+                raise UnbalancedLedgerError(
+                    "We have an unbalanced ledger as it was not "
+                    "possible to credit a batched multi-part debit (%s): "
+                    "Credit refusal error = %s. Refund error = %s" %
+                    (debit_notes, str(e), str(e2)))
+
+            raise e
+
+        # now write the paired entries to the ledger. The below function
+        # is guaranteed not to raise an exception
+        return Ledger._record_to_ledger(paired_notes, is_provisional,
+                                        bucket=bucket)
+
     @staticmethod
     def _record_to_ledger(paired_notes, is_provisional=False,
                           receipt=None, refund=None, bucket=None):
@@ -411,16 +411,25 @@ class TransactionRecord:
             bucket = _get_service_account_bucket()
 
         from Acquire.Accounting import Ledger as _Ledger
-        from Acquire.ObjectStore import Mutex as _Mutex
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        import json as _json
 
-        try:
-            mutex = _Mutex(uid, timeout=600, lease_time=600)
-        except Exception as e:
-            raise LedgerError("Cannot secure a Ledger mutex for transaction "
-                              "'%s'. Error = %s" % (uid, str(e)))
+        key = _Ledger.get_key(uid)
 
-        try:
-            transaction = _Ledger.load_transaction(uid, bucket)
+        # the state is updated using a compare-and-swap, so this only
+        # succeeds if no-one else has changed the record since we read
+        # it. If someone has, then re-read and check the state again
+        for _attempt in range(0, 100):
+            try:
+                (data, etag) = _ObjectStore.get_object_and_etag(bucket, key)
+            except Exception as e:
+                raise LedgerError(
+                    "There is no transaction recorded in the "
+                    "ledger with UID=%s (at key %s): %s" %
+                    (uid, key, str(e)))
+
+            transaction = TransactionRecord.from_data(
+                                        _json.loads(data.decode("utf-8")))
 
             if transaction.transaction_state() != expected_state:
                 raise TransactionError(
@@ -429,32 +438,19 @@ class TransactionRecord:
                     (str(transaction), expected_state.value, new_state.value))
 
             transaction._transaction_state = new_state
-        except:
-            mutex.unlock()
-            raise
 
-        # now need to write anything back if the state isn't changed
-        if expected_state == new_state:
-            return transaction
-
-        # make sure we have enough time remaining on the lease to be
-        # able to write this result back to the object store...
-        if mutex.seconds_remaining_on_lease() < 100:
-            try:
-                mutex.fully_unlock()
-            except:
-                pass
+            # no need to write anything back if the state isn't changed
+            if expected_state == new_state:
+                return transaction
 
-            return TransactionRecord.load_test_and_set(uid, expected_state,
-                                                       new_state, bucket)
+            data = _json.dumps(transaction.to_data()).encode("utf-8")
 
-        try:
-            _Ledger.save_transaction(transaction, bucket)
-        except:
-            mutex.unlock()
-            raise
+            if _ObjectStore.set_object_if(bucket, key, data,
+                                          etag) is not None:
+                return transaction
 
-        return transaction
+        raise LedgerError("Cannot update the state of transaction '%s' "
+                          "as it is being changed too often by others" % uid)
 
     @staticmethod
     def from_data(data):
@@ -5,49 +5,30 @@ This module implements all of the classes and functions necessary to build the
 client (user-facing) interfaces for Acquire
 """
 
-from ._qrcode import *
-from ._user import *
-from ._account import *
-from ._drive import *
-from ._job import *
-from ._resources import *
-from ._file import *
-from ._fileops import *
-from ._chunkuploader import *
-from ._chunkdownloader import *
-from ._par import *
-from ._location import *
-from ._wallet import *
-from ._errors import *
-from ._cheque import *
-from ._service import *
-from ._credentials import *
-from ._storagecreds import *
-
 # The below objects are useful for the client, so are pulled into
 # this module to discourage people using the other Acquire modules
-# directly... One day I want to lazy-load all of these...
-from Acquire.Crypto import PublicKey, PrivateKey, OTP
-from Acquire.Identity import Authorisation, ACLRule, ACLRules, ACLUserRules, \
-                             ACLGroupRules, ACLRuleOperation
-from Acquire.Storage import DirMeta, FileMeta, DriveMeta
-
-try:
-    if __IPYTHON__:
-        def _set_printer(C):
-            """Function to tell ipython to use __str__ if available"""
-            get_ipython().display_formatter.formatters['text/plain'].for_type(
-                C,
-                lambda obj, p, cycle: p.text(str(obj) if not cycle else '...')
-                )
+# directly...
+_attributes = {"PublicKey": "Acquire.Crypto",
+               "PrivateKey": "Acquire.Crypto",
+               "OTP": "Acquire.Crypto",
+               "Authorisation": "Acquire.Identity",
+               "ACLRule": "Acquire.Identity",
+               "ACLRules": "Acquire.Identity",
+               "ACLUserRules": "Acquire.Identity",
+               "ACLGroupRules": "Acquire.Identity",
+               "ACLRuleOperation": "Acquire.Identity",
+               "DirMeta": "Acquire.Storage",
+               "FileMeta": "Acquire.Storage",
+               "DriveMeta": "Acquire.Storage"}
 
-        import sys as _sys
-        import inspect as _inspect
+_submodules = ["_qrcode", "_user", "_account", "_drive", "_job", "_resources",
+               "_file", "_fileops", "_compression", "_chunker",
+               "_chunkuploader", "_chunkdownloader", "_par", "_location",
+               "_wallet", "_errors", "_cheque", "_service", "_credentials",
+               "_storagecreds"]
 
-        _clsmembers = _inspect.getmembers(_sys.modules[__name__],
-                                          _inspect.isclass)
+# the objects in this module are only imported when they are first
+# used, so that importing this module is fast
+from Acquire.Stubs import lazy_package as _lazy_package
 
-        for _clsmember in _clsmembers:
-            _set_printer(_clsmember[1])
-except:
-    pass
+__getattr__, __dir__ = _lazy_package(__name__, _submodules, _attributes)
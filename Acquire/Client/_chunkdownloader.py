@@ -1,6 +1,11 @@
 
 __all__ = ["ChunkDownloader"]
 
+# whether or not to ask for chunks to be downloaded as the raw body
+# of a binary frame, rather than as base64-encoded strings within
+# the json response
+_use_binary_transfer = True
+
 
 class ChunkDownloader:
     """This class is used to control the chunked downloading
@@ -91,13 +96,14 @@ class ChunkDownloader:
 
         return self._downloaded_filename
 
-    def download_next_chunk(self):
-        """Download the next chunk. Returns 'True' if something was
-           downloaded, else it returns 'False'
+    def _fetch_chunk(self, index):
+        """Fetch, validate and decompress the chunk at 'index'. This
+           returns a tuple of the decompressed chunk (or None if there
+           is no chunk at this index) and the total number of chunks
+           in the file (or None if this is not yet known). This does
+           not change the state of the downloader, so can be called
+           from several threads at once
         """
-        if not self.is_open():
-            return False
-
         service = self.service()
 
         if service is None:
@@ -109,27 +115,34 @@ class ChunkDownloader:
         secret = _Hash.multi_md5(self._secret,
                                  "%s%s%d" % (self._drive_uid,
                                              self._file_uid,
-                                             self._next_index))
+                                             index))
 
         args = {}
         args["uid"] = self._uid
         args["drive_uid"] = self._drive_uid
         args["file_uid"] = self._file_uid
-        args["chunk_index"] = self._next_index
+        args["chunk_index"] = index
         args["secret"] = secret
 
+        if _use_binary_transfer:
+            args["binary"] = True
+
         response = service.call_function(function="download_chunk",
                                          args=args)
 
+        chunk = None
+
         if "meta" in response:
             import json as _json
             meta = _json.loads(response["meta"])
             checksum = meta["checksum"]
 
-            from Acquire.ObjectStore import string_to_bytes \
-                as _string_to_bytes
-
-            chunk = _string_to_bytes(response["chunk"])
+            if "body" in response:
+                chunk = response["body"]
+            else:
+                from Acquire.ObjectStore import string_to_bytes \
+                    as _string_to_bytes
+                chunk = _string_to_bytes(response["chunk"])
 
             md5 = _Hash.md5(chunk)
 
@@ -139,31 +152,112 @@ class ChunkDownloader:
                     "Problem downloading - checksums don't agree: %s vs %s" %
                     (checksum, md5))
 
-            import bz2 as _bz2
-            chunk = _bz2.decompress(chunk)
+            # chunks uploaded by old clients were always compressed
+            # using bz2, so did not record their compression type
+            from Acquire.Client import uncompress as _uncompress
+            chunk = _uncompress(
+                        inputdata=chunk,
+                        compression_type=meta.get("compression", "bz2"))
+
+        if "num_chunks" in response:
+            num_chunks = int(response["num_chunks"])
+        else:
+            num_chunks = None
+
+        return (chunk, num_chunks)
+
+    def download_next_chunk(self):
+        """Download the next chunk. Returns 'True' if something was
+           downloaded, else it returns 'False'
+        """
+        if not self.is_open():
+            return False
+
+        (chunk, num_chunks) = self._fetch_chunk(self._next_index)
+
+        if chunk is not None:
             self._FILE.write(chunk)
             self._FILE.flush()
             chunk = None
 
             self._next_index = self._next_index + 1
 
-        if "num_chunks" in response:
-            num_chunks = int(response["num_chunks"])
-
+        if num_chunks is not None:
             if self._next_index >= num_chunks:
                 # nothing more to download
                 self.close()
 
         return True
 
-    def download(self, filename=None, dir=None):
+    def _download_parallel(self, parallel):
+        """Download as much of the file as possible, keeping up to
+           'parallel' chunk downloads in flight at once. Chunks are
+           fetched, validated and decompressed in a pool of threads,
+           and are written to the file in order as soon as all
+           earlier chunks have been written. If a chunk fails to
+           download then the exception is raised with the file
+           holding all chunks up to the failed chunk, so that
+           calling 'download' again will resume from that chunk
+        """
+        from concurrent.futures import ThreadPoolExecutor \
+            as _ThreadPoolExecutor
+
+        pending = {}
+        next_submit = self._next_index
+        num_chunks = None
+
+        with _ThreadPoolExecutor(max_workers=parallel) as pool:
+            try:
+                while True:
+                    # keep 'parallel' chunk downloads in flight
+                    while len(pending) < parallel and \
+                            (num_chunks is None or next_submit < num_chunks):
+                        pending[next_submit] = pool.submit(self._fetch_chunk,
+                                                           next_submit)
+                        next_submit += 1
+
+                    future = pending.pop(self._next_index, None)
+
+                    if future is None:
+                        break
+
+                    (chunk, n) = future.result()
+
+                    if n is not None:
+                        num_chunks = n
+
+                    if chunk is None:
+                        # there is no more data available (yet)
+                        break
+
+                    self._FILE.write(chunk)
+                    self._FILE.flush()
+                    chunk = None
+
+                    self._next_index = self._next_index + 1
+            finally:
+                # discard any chunks past the end or past a failed chunk
+                for future in pending.values():
+                    future.cancel()
+
+        if num_chunks is not None and self._next_index >= num_chunks:
+            # nothing more to download
+            self.close()
+
+    def download(self, filename=None, dir=None, parallel=None):
         """Download as much of the file as possible to 'filename'. You
            can call this repeatedly with the same filename (or with
-           no filename set) to stream the file back as it is written
+           no filename set) to stream the file back as it is written.
+           If 'parallel' is greater than 1 then up to this number of
+           chunks are downloaded at once (see _download_parallel)
         """
         self._start_download(filename=filename, dir=dir)
         downloaded_filename = self._downloaded_filename
 
+        if parallel is not None and int(parallel) > 1:
+            self._download_parallel(int(parallel))
+            return downloaded_filename
+
         got_chunk = self.download_next_chunk()
 
         while got_chunk:
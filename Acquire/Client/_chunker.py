@@ -0,0 +1,152 @@
+
+__all__ = ["content_defined_chunks"]
+
+# the minimum, average and maximum sizes of content-defined chunks
+_min_chunk_size = 256 * 1024
+_avg_chunk_size = 1024 * 1024
+_max_chunk_size = 4 * 1024 * 1024
+
+# the number of bytes read from the file at a time
+_read_size = 8 * 1024 * 1024
+
+# the table of random 64-bit values used by the gear rolling hash. This
+# is generated from a fixed seed, as the chunk boundaries (and so the
+# chunk hashes) must be the same on every client
+_gear = None
+
+
+def _get_gear():
+    """Return the table of random values used by the gear hash"""
+    global _gear
+
+    if _gear is None:
+        import random as _random
+        rand = _random.Random(0x41637175697265)
+        _gear = tuple(rand.getrandbits(64) for _ in range(0, 256))
+
+    return _gear
+
+
+def _cut_point(data, min_size, max_size, mask):
+    """Return the size of the first chunk in 'data'. This is the first
+       point after 'min_size' bytes where the high bits of the gear
+       rolling hash (which depend only on the last 64 bytes) match
+       'mask', or 'max_size' (or the end of the data) if there is no
+       such point.
+
+       This is a pure python loop, so hashes about 5 MB of data per
+       second (per core). The hash is only reduced to 64 bits once
+       every 64 bytes, as the high bits that are tested are the same
+       either way, which saves one operation per byte
+    """
+    size = len(data)
+
+    if size <= min_size:
+        return size
+
+    end = min(size, max_size)
+    gear = _get_gear()
+    h = 0
+
+    for start in range(min_size, end, 64):
+        h &= 0xFFFFFFFFFFFFFFFF
+
+        for (i, byte) in enumerate(data[start:min(start + 64, end)], start):
+            h = (h << 1) + gear[byte]
+
+            if not (h & mask):
+                return i + 1
+
+    return end
+
+
+def content_defined_chunks(filename=None, data=None, avg_size=None,
+                           min_size=None, max_size=None):
+    """Iterate over the chunks of either the file 'filename' or the
+       passed 'data', where the chunk boundaries are chosen from the
+       content using a gear rolling hash (as in FastCDC). This means
+       that inserting or removing bytes only changes the chunks around
+       the change, so unchanged parts of a file produce the same
+       chunks (and so can be de-duplicated). Chunks are between
+       'min_size' and 'max_size' bytes, with an average of around
+       'avg_size' bytes.
+
+       Note that the boundaries are found using pure python, at
+       about 5 MB per second, i.e. several minutes per GB. This
+       is only worthwhile for files that are re-uploaded with small
+       changes over slow connections. When chunking a file, at most
+       'max_size' bytes plus one read of the file (8 MB) are held
+       in memory
+
+       Args:
+            filename (str, default=None): File to chunk
+            data (bytes, default=None): Data to chunk
+            avg_size (int, default=None): Average chunk size
+            min_size (int, default=None): Minimum chunk size
+            max_size (int, default=None): Maximum chunk size
+       Returns:
+            generator: Yields each chunk as bytes
+    """
+    if avg_size is None:
+        avg_size = _avg_chunk_size
+    else:
+        avg_size = int(avg_size)
+
+    if min_size is None:
+        min_size = min(_min_chunk_size, avg_size // 4)
+
+    if max_size is None:
+        max_size = max(_max_chunk_size, 4 * avg_size)
+
+    min_size = int(min_size)
+    max_size = int(max_size)
+
+    if min_size < 0 or avg_size <= min_size or max_size < avg_size:
+        raise ValueError(
+            "Invalid chunk sizes: must have 0 <= min_size (%d) < "
+            "avg_size (%d) <= max_size (%d)" % (min_size, avg_size, max_size))
+
+    # a boundary is found, on average, every 2**bits bytes after min_size
+    bits = max(1, (avg_size - min_size).bit_length() - 1)
+    mask = ((1 << bits) - 1) << (64 - bits)
+
+    if filename is not None:
+        FILE = open(filename, "rb")
+        buffer = b""
+        eof = False
+    elif data is not None:
+        FILE = None
+        buffer = memoryview(data).cast("B")
+        eof = True
+    else:
+        return
+
+    try:
+        # chunks are read from a view of the buffer at a moving offset,
+        # so that the buffer is only copied when it is refilled
+        view = memoryview(buffer)
+        offset = 0
+
+        while True:
+            if not eof and len(buffer) - offset < max_size:
+                block = FILE.read(max(_read_size, max_size))
+
+                if len(block) == 0:
+                    eof = True
+                else:
+                    buffer = b"".join([view[offset:], block])
+                    view = memoryview(buffer)
+                    offset = 0
+                    continue
+
+            if offset >= len(buffer):
+                return
+
+            size = _cut_point(view[offset:], min_size, max_size, mask)
+
+            yield bytes(view[offset:offset+size])
+
+            offset += size
+    finally:
+        if FILE is not None:
+            FILE.close()
@@ -1,6 +1,16 @@
 
 __all__ = ["ChunkUploader"]
 
+# whether or not to upload chunks as the raw body of a binary frame,
+# rather than as base64-encoded strings within the json arguments
+_use_binary_transfer = True
+
+# the default size (in bytes) of each chunk uploaded by 'upload_file'
+_default_chunk_size = 8 * 1024 * 1024
+
+# the maximum number of chunk hashes sent in each call to 'dedup_chunks'
+_max_dedup_batch_size = 1000
+
 
 class ChunkUploader:
     """This class is used to control the chunked uploading
@@ -15,6 +25,11 @@ class ChunkUploader:
         self._drive_uid = None
         self._file_uid = None
         self._chunk_idx = None
+        self._uploaded_chunks = set()
+        self._num_chunks = None
+        self._chunk_size = None
+        self._chunking = None
+        self._compression_type = None
         self._service = None
 
         if drive_uid is not None:
@@ -31,7 +46,13 @@ class ChunkUploader:
     def __del__(self):
         """Make sure that we close the file before deleting this object"""
         if self.is_open():
-            self.close()
+            try:
+                self.close()
+            except:
+                # the upload is incomplete, so cannot be closed. It is
+                # left open so that it can be resumed, and is discarded
+                # by the service if it expires before it is closed
+                pass
 
     def is_null(self):
         """Return whether or not this is null"""
@@ -45,66 +66,379 @@ class ChunkUploader:
         """Return the service that created this uploader"""
         return self._service
 
-    def upload(self, chunk):
-        """Upload the next chunk of the file"""
-        if self.is_null():
-            raise PermissionError("Cannot upload a chunk to a null uploader!")
+    def compression_type(self):
+        """Return the compression type used to compress each chunk"""
+        if self._compression_type is None:
+            from Acquire.Client import get_default_compression_type \
+                as _get_default_compression_type
+            return _get_default_compression_type()
+        else:
+            return self._compression_type
 
+    def set_compression_type(self, compression_type):
+        """Set the compression type used to compress each chunk. This
+           must be one of 'get_compression_types()'
+        """
+        from Acquire.Client._compression import _get_codec
+        self._compression_type = _get_codec(compression_type).name
+
+    def _upload_chunk(self, index, chunk, chunk_hash=None):
+        """Compress and upload 'chunk' as the chunk at 'index'. This
+           returns 'index' once the service has acknowledged the
+           chunk. If 'chunk_hash' is passed then the chunk is
+           stored in the service's de-duplicated chunk store under
+           this (content) hash. This does not change the state of
+           the uploader, so can be called from several threads at once
+        """
         service = self.service()
 
         if service is None:
             raise PermissionError("Cannot upload a chunk to a null service!")
 
         # first, compress the chunk
-        from Acquire.ObjectStore import bytes_to_string as _bytes_to_string
         from Acquire.Crypto import Hash as _Hash
-        import bz2 as _bz2
+        from Acquire.Client._compression import _get_codec
 
         if isinstance(chunk, str):
             chunk = chunk.encode("utf-8")
 
-        chunk = _bz2.compress(chunk)
+        compression_type = self.compression_type()
+        chunk = _get_codec(compression_type).compress(chunk)
         md5 = _Hash.md5(chunk)
-        chunk = _bytes_to_string(chunk)
-
-        if self._chunk_idx is None:
-            self._chunk_idx = 0
-        else:
-            self._chunk_idx = self._chunk_idx + 1
 
         secret = _Hash.multi_md5(self._secret,
                                  "%s%s%d" % (self._drive_uid,
                                              self._file_uid,
-                                             self._chunk_idx))
+                                             index))
 
         args = {}
         args["drive_uid"] = self._drive_uid
         args["file_uid"] = self._file_uid
-        args["chunk_index"] = self._chunk_idx
+        args["chunk_index"] = index
         args["secret"] = secret
-        args["data"] = chunk
         args["checksum"] = md5
+        args["compression"] = compression_type
+
+        if chunk_hash is not None:
+            args["chunk_hash"] = chunk_hash
+
+        if _use_binary_transfer:
+            service.call_function(function="upload_chunk", args=args,
+                                  body=chunk)
+        else:
+            from Acquire.ObjectStore import bytes_to_string \
+                as _bytes_to_string
+            args["data"] = _bytes_to_string(chunk)
+            service.call_function(function="upload_chunk", args=args)
+
+        return index
+
+    def _acknowledge(self, index):
+        """Record that the chunk at 'index' has been uploaded"""
+        self._uploaded_chunks.add(index)
+
+        if self._chunk_idx is None or index > self._chunk_idx:
+            self._chunk_idx = index
+
+    def upload(self, chunk):
+        """Upload the next chunk of the file"""
+        if self.is_null():
+            raise PermissionError("Cannot upload a chunk to a null uploader!")
+
+        if self._num_chunks is not None:
+            raise PermissionError(
+                "Cannot upload individual chunks to an uploader that is "
+                "uploading a whole file!")
+
+        if self._chunk_idx is None:
+            index = 0
+        else:
+            index = self._chunk_idx + 1
+
+        self._acknowledge(self._upload_chunk(index, chunk))
+
+    def uploaded_chunks(self):
+        """Return the sorted list of the indicies of all chunks that
+           have been acknowledged by the service
+        """
+        return sorted(self._uploaded_chunks)
+
+    def missing_chunks(self):
+        """Return the sorted list of the indicies of the chunks that
+           must still be uploaded before the uploader can be closed.
+           This is every chunk of the file being uploaded by
+           'upload_file' that has not been acknowledged or, for
+           chunks uploaded individually, any gaps before the last
+           acknowledged chunk
+        """
+        if self._num_chunks is not None:
+            num_chunks = self._num_chunks
+        elif self._chunk_idx is not None:
+            num_chunks = self._chunk_idx + 1
+        else:
+            return []
+
+        return [i for i in range(0, num_chunks)
+                if i not in self._uploaded_chunks]
+
+    def _dedup_chunks(self, chunk_hashes):
+        """Ask the service to de-duplicate the chunks whose (content)
+           hashes are in the dictionary 'chunk_hashes' (indexed by
+           chunk index). Chunks that are already held by the service
+           are acknowledged, and the sorted list of indicies of the
+           chunks that must still be uploaded is returned
+        """
+        service = self.service()
+
+        if service is None:
+            raise PermissionError("Cannot upload a chunk to a null service!")
+
+        indicies = sorted(chunk_hashes.keys())
+        missing = []
+
+        for i in range(0, len(indicies), _max_dedup_batch_size):
+            batch = indicies[i:i+_max_dedup_batch_size]
+
+            args = {"drive_uid": self._drive_uid,
+                    "file_uid": self._file_uid,
+                    "secret": self._secret,
+                    "chunk_hashes": {str(index): chunk_hashes[index]
+                                     for index in batch}}
+
+            response = service.call_function(function="dedup_chunks",
+                                             args=args)
+
+            batch_missing = set(int(index) for index in response["missing"])
+
+            for index in batch:
+                if index in batch_missing:
+                    missing.append(index)
+                else:
+                    self._acknowledge(index)
+
+        return missing
+
+    def upload_file(self, filename, chunk_size=None, parallel=None,
+                    deduplicate=False):
+        """Upload the whole of the file 'filename' in chunks of
+           'chunk_size' bytes, with up to 'parallel' chunks being
+           compressed and uploaded at once. Chunks that have already
+           been acknowledged by the service are skipped, so if the
+           upload is interrupted then calling this again (with the
+           same chunk size) will restart from the first missing
+           chunk. Note that this does not close the uploader.
+
+           If 'deduplicate' is True then the file is split into
+           content-defined chunks (of average size 'chunk_size'), and
+           only the chunks that are not already held by the service
+           (e.g. from a previous version of the file) are uploaded
+        """
+        if self.is_null():
+            raise PermissionError("Cannot upload a chunk to a null uploader!")
+
+        if deduplicate:
+            chunking = "content"
+        else:
+            chunking = "fixed"
+
+        if chunk_size is None:
+            if self._chunk_size is not None:
+                chunk_size = self._chunk_size
+            elif deduplicate:
+                from Acquire.Client._chunker import _avg_chunk_size
+                chunk_size = _avg_chunk_size
+            else:
+                chunk_size = _default_chunk_size
+
+        chunk_size = int(chunk_size)
+
+        if chunk_size <= 0:
+            raise ValueError("The chunk size must be greater than zero")
+
+        if self._chunk_size is None:
+            if len(self._uploaded_chunks) > 0:
+                raise PermissionError(
+                    "Cannot upload a file to an uploader that has already "
+                    "uploaded individual chunks!")
+
+            self._chunk_size = chunk_size
+            self._chunking = chunking
+        elif self._chunk_size != chunk_size:
+            raise ValueError(
+                "You cannot change the chunk size (from %d to %d) when "
+                "resuming an upload" % (self._chunk_size, chunk_size))
+        elif self._chunking != chunking:
+            raise ValueError(
+                "You cannot change whether or not to deduplicate when "
+                "resuming an upload")
+
+        if parallel is None:
+            parallel = 1
+        else:
+            parallel = max(1, int(parallel))
+
+        if deduplicate:
+            from Acquire.Client import content_defined_chunks \
+                as _content_defined_chunks
+            from hashlib import sha256 as _sha256
+
+            extents = []
+            chunk_hashes = []
+            offset = 0
+
+            for chunk in _content_defined_chunks(filename=filename,
+                                                 avg_size=chunk_size):
+                extents.append((offset, len(chunk)))
+                chunk_hashes.append(_sha256(chunk).hexdigest())
+                offset += len(chunk)
+
+            if len(extents) == 0:
+                # an empty file is uploaded as a single empty chunk
+                extents.append((0, 0))
+                chunk_hashes.append(_sha256(b"").hexdigest())
+
+            self._num_chunks = len(extents)
+
+            missing = self._dedup_chunks(
+                        {i: chunk_hashes[i] for i in range(0, len(extents))
+                         if i not in self._uploaded_chunks})
+        else:
+            import os as _os
+            filesize = _os.path.getsize(filename)
+
+            # an empty file is uploaded as a single empty chunk
+            num_chunks = max(1, (filesize + chunk_size - 1) // chunk_size)
+
+            extents = [(i * chunk_size, chunk_size)
+                       for i in range(0, num_chunks)]
+            chunk_hashes = None
+
+            self._num_chunks = num_chunks
+
+            missing = [i for i in range(0, num_chunks)
+                       if i not in self._uploaded_chunks]
+
+        def _upload(index):
+            (offset, size) = extents[index]
+
+            with open(filename, "rb") as FILE:
+                FILE.seek(offset)
+                chunk = FILE.read(size)
+
+            if chunk_hashes is None:
+                return self._upload_chunk(index, chunk)
+            else:
+                return self._upload_chunk(index, chunk,
+                                          chunk_hash=chunk_hashes[index])
+
+        if parallel == 1:
+            for index in missing:
+                self._acknowledge(_upload(index))
+
+            return
+
+        from concurrent.futures import ThreadPoolExecutor \
+            as _ThreadPoolExecutor
+        from concurrent.futures import wait as _wait
+        from concurrent.futures import FIRST_COMPLETED as _FIRST_COMPLETED
 
-        service.call_function(function="upload_chunk", args=args)
+        missing = iter(missing)
+        pending = set()
+
+        try:
+            with _ThreadPoolExecutor(max_workers=parallel) as pool:
+                try:
+                    while True:
+                        # only keep 'parallel' chunks in memory at once
+                        for index in missing:
+                            pending.add(pool.submit(_upload, index))
+
+                            if len(pending) >= parallel:
+                                break
+
+                        if len(pending) == 0:
+                            break
+
+                        (done, pending) = _wait(pending,
+                                                return_when=_FIRST_COMPLETED)
+
+                        for future in done:
+                            if future.exception() is None:
+                                self._acknowledge(future.result())
+
+                        for future in done:
+                            future.result()
+                except:
+                    for future in pending:
+                        future.cancel()
+                    raise
+        finally:
+            # record any chunks that finished before a failure
+            for future in pending:
+                if future.done() and not future.cancelled() and \
+                        future.exception() is None:
+                    self._acknowledge(future.result())
 
     def is_open(self):
         """Return whether or not the file is open (has been written to)"""
         return self._chunk_idx is not None
 
     def close(self):
-        """Close the uploader - this will finalise the file"""
+        """Close the uploader - this will finalise the file. This
+           raises a PermissionError if any chunks of the file have
+           not yet been uploaded (see 'missing_chunks')
+        """
         if self.is_open():
+            missing = self.missing_chunks()
+
+            if len(missing) > 0:
+                raise PermissionError(
+                    "Cannot close the uploader as %d chunk(s) have not been "
+                    "uploaded, e.g. chunk %d. Upload these before closing."
+                    % (len(missing), missing[0]))
+
+            if self._num_chunks is not None:
+                num_chunks = self._num_chunks
+            else:
+                num_chunks = self._chunk_idx + 1
+
             args = {"drive_uid": self._drive_uid,
                     "file_uid": self._file_uid,
-                    "secret": self._secret}
+                    "secret": self._secret,
+                    "num_chunks": num_chunks}
 
             self.service().call_function(function="close_uploader",
                                          args=args)
 
-            self._chunk_idx = None
-            self._secret = None
-            self._drive_uid = None
-            self._file_uid = None
+            self._clear()
+
+    def abort(self):
+        """Abort the upload - this discards all of the chunks that
+           have been uploaded, so that the file will need to be
+           uploaded again
+        """
+        if self.is_null() or self._secret is None:
+            return
+
+        args = {"drive_uid": self._drive_uid,
+                "file_uid": self._file_uid,
+                "secret": self._secret}
+
+        self.service().call_function(function="abort_uploader", args=args)
+
+        self._clear()
+
+    def _clear(self):
+        """Clear this uploader once it has been closed or aborted"""
+        self._chunk_idx = None
+        self._uploaded_chunks = set()
+        self._num_chunks = None
+        self._chunk_size = None
+        self._chunking = None
+        self._compression_type = None
+        self._secret = None
+        self._drive_uid = None
+        self._file_uid = None
 
     def to_data(self, pubkey=None):
         """Return a json-serialisable dictionary of the object. If
@@ -120,6 +454,19 @@ class ChunkUploader:
         data["file_uid"] = self._file_uid
         data["secret"] = self._secret
 
+        if len(self._uploaded_chunks) > 0:
+            data["uploaded_chunks"] = self.uploaded_chunks()
+
+        if self._num_chunks is not None:
+            data["num_chunks"] = self._num_chunks
+
+        if self._chunk_size is not None:
+            data["chunk_size"] = self._chunk_size
+            data["chunking"] = self._chunking
+
+        if self._compression_type is not None:
+            data["compression_type"] = self._compression_type
+
         if pubkey is not None:
             from Acquire.Crypto import PublicKey as _PublicKey
             from Acquire.ObjectStore import bytes_to_string \
@@ -171,4 +518,18 @@ class ChunkUploader:
         c._secret = data["secret"]
         c._service = service
 
+        if "uploaded_chunks" in data:
+            for index in data["uploaded_chunks"]:
+                c._acknowledge(int(index))
+
+        if "num_chunks" in data:
+            c._num_chunks = int(data["num_chunks"])
+
+        if "chunk_size" in data:
+            c._chunk_size = int(data["chunk_size"])
+            c._chunking = data.get("chunking", "fixed")
+
+        if "compression_type" in data:
+            c._compression_type = str(data["compression_type"])
+
         return c
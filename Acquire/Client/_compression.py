@@ -0,0 +1,190 @@
+
+__all__ = ["register_compression_type", "get_compression_types",
+           "get_default_compression_type", "set_default_compression_type"]
+
+# the compression type used for new uploads. zlib is much faster than
+# bz2 (for a small loss in ratio) and, as it is part of the standard
+# library, can always be decompressed by any client. Set this to
+# "zstd" or "lz4" if all clients have these libraries installed
+_default_compression_type = "zlib"
+
+# the compression level used by each of the built-in codecs
+_compression_levels = {"bz2": 9, "zlib": 6, "lzma": 1, "zstd": 3}
+
+# the registry of all codecs, indexed by compression type
+_codecs = {}
+
+
+class _Codec:
+    """Holds the functions used to compress and decompress data
+       using a single compression type. 'compress' and 'decompress'
+       act on whole blocks of data, while 'compressor' and
+       'decompressor' return new streaming (de)compression objects
+       that provide the same interface as zlib.compressobj and
+       zlib.decompressobj
+    """
+    def __init__(self, name, compress, decompress,
+                 compressor, decompressor):
+        self.name = name
+        self.compress = compress
+        self.decompress = decompress
+        self.compressor = compressor
+        self.decompressor = decompressor
+
+
+def register_compression_type(name, compress, decompress,
+                              compressor=None, decompressor=None):
+    """Register a new compression type called 'name'. 'compress'
+       and 'decompress' should be functions that compress and
+       decompress a whole block of bytes. 'compressor' and
+       'decompressor' are optional functions that return objects
+       with 'compress'/'flush' and 'decompress' functions that are
+       used to stream large files. If these are not supplied then
+       files are (de)compressed in memory
+
+       Args:
+            name (str): Name of the compression type
+            compress (function): Function to compress bytes
+            decompress (function): Function to decompress bytes
+            compressor (function, default=None): Function returning a
+            streaming compression object
+            decompressor (function, default=None): Function returning a
+            streaming decompression object
+       Returns:
+            None
+    """
+    _codecs[str(name)] = _Codec(name=str(name), compress=compress,
+                                decompress=decompress,
+                                compressor=compressor,
+                                decompressor=decompressor)
+
+
+def get_compression_types():
+    """Return the sorted list of all of the compression types that
+       are available on this system
+
+       Returns:
+            list: Names of the available compression types
+    """
+    return sorted(_codecs.keys())
+
+
+def get_default_compression_type():
+    """Return the compression type used by default for new uploads
+
+       Returns:
+            str: Name of the default compression type
+    """
+    return _default_compression_type
+
+
+def set_default_compression_type(compression_type):
+    """Set the compression type used by default for new uploads
+
+       Args:
+            compression_type (str): Name of the compression type
+       Returns:
+            None
+    """
+    _get_codec(compression_type)
+
+    global _default_compression_type
+    _default_compression_type = str(compression_type)
+
+
+def _get_codec(compression_type=None):
+    """Return the codec for the passed compression type (or the
+       default compression type if this is None). This raises a
+       ValueError if this compression type is not available
+    """
+    if compression_type is None:
+        compression_type = _default_compression_type
+
+    try:
+        return _codecs[compression_type]
+    except KeyError:
+        pass
+
+    raise ValueError(
+        "Unrecognised compression type '%s'. Available types are %s" %
+        (compression_type, get_compression_types()))
+
+
+def _register_builtin_codecs():
+    """Register the codecs from the standard library, plus zstd
+       and lz4 if the 'zstandard' or 'lz4' modules are installed
+    """
+    import bz2 as _bz2
+    import lzma as _lzma
+    import zlib as _zlib
+
+    level = _compression_levels["bz2"]
+    register_compression_type(
+        "bz2",
+        compress=lambda data: _bz2.compress(data, compresslevel=level),
+        decompress=_bz2.decompress,
+        compressor=lambda: _bz2.BZ2Compressor(level),
+        decompressor=_bz2.BZ2Decompressor)
+
+    zlib_level = _compression_levels["zlib"]
+    register_compression_type(
+        "zlib",
+        compress=lambda data: _zlib.compress(data, zlib_level),
+        decompress=_zlib.decompress,
+        compressor=lambda: _zlib.compressobj(zlib_level),
+        decompressor=_zlib.decompressobj)
+
+    lzma_level = _compression_levels["lzma"]
+    register_compression_type(
+        "lzma",
+        compress=lambda data: _lzma.compress(data, preset=lzma_level),
+        decompress=_lzma.decompress,
+        compressor=lambda: _lzma.LZMACompressor(preset=lzma_level),
+        decompressor=_lzma.LZMADecompressor)
+
+    try:
+        import zstandard as _zstd
+    except:
+        _zstd = None
+
+    if _zstd is not None:
+        zstd_level = _compression_levels["zstd"]
+        register_compression_type(
+            "zstd",
+            compress=lambda data: _zstd.ZstdCompressor(
+                                        level=zstd_level).compress(data),
+            decompress=lambda data: _zstd.ZstdDecompressor().decompressobj(
+                                        ).decompress(data),
+            compressor=lambda: _zstd.ZstdCompressor(
+                                        level=zstd_level).compressobj(),
+            decompressor=lambda: _zstd.ZstdDecompressor().decompressobj())
+
+    try:
+        import lz4.frame as _lz4
+    except:
+        _lz4 = None
+
+    if _lz4 is not None:
+        class _LZ4Compressor:
+            """Adapt LZ4FrameCompressor to the zlib.compressobj interface"""
+            def __init__(self):
+                self._compressor = _lz4.LZ4FrameCompressor()
+                self._header = self._compressor.begin()
+
+            def compress(self, data):
+                data = self._header + self._compressor.compress(data)
+                self._header = b""
+                return data
+
+            def flush(self):
+                return self._header + self._compressor.flush()
+
+        register_compression_type(
+            "lz4",
+            compress=_lz4.compress,
+            decompress=_lz4.decompress,
+            compressor=_LZ4Compressor,
+            decompressor=_lz4.LZ4FrameDecompressor)
+
+
+_register_builtin_codecs()
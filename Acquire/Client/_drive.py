@@ -171,7 +171,8 @@ class Drive:
         else:
             return self._creds.storage_service()
 
-    def chunk_upload(self, filename, dir=None, aclrules=None):
+    def chunk_upload(self, filename, dir=None, aclrules=None,
+                     compression_type=None):
         """Start a chunked upload of a file called 'filename' (just the
            filename - not the full path - if you want to specify a certain
            directory in the Drive then specify that in 'dir').
@@ -182,6 +183,8 @@ class Drive:
            ACL rules used to grant access to this file via 'aclrules'.
            If this is not set, then the rules will be derived from either
            the last version of the file, or inherited from the drive.
+           Chunks are compressed using 'compression_type' (or the
+           default compression type if this is not set).
 
            This will return a ChunkUploader which can be used to actually
            upload the file
@@ -196,10 +199,11 @@ class Drive:
         filemeta = _FileMeta(filename=filename)
         filemeta._set_drive_metadata(self._metadata, self._creds)
 
-        return filemeta.open().chunk_upload(aclrules=aclrules)
+        return filemeta.open().chunk_upload(aclrules=aclrules,
+                                            compression_type=compression_type)
 
     def upload(self, filename, dir=None, uploaded_name=None, aclrules=None,
-               force_par=False):
+               force_par=False, compression_type=None):
         """Upload the file at 'filename' to this drive, assuming we have
            write access to this drive (or all files in the directory
            at 'filename' if this is really a directory).
@@ -215,6 +219,9 @@ class Drive:
            ACL rules used to grant access to this file via 'aclrules'.
            If this is not set, then the rules will be derived from either
            the last version of the file, or inherited from the drive.
+           The file is compressed for transport and storage using
+           'compression_type' (or the default compression type if this
+           is not set).
         """
         if self.is_null():
             raise PermissionError("Cannot upload a file to a null drive!")
@@ -234,7 +241,8 @@ class Drive:
                 self.upload(filename="%s/%s" % (filename, f),
                             uploaded_name="%s/%s" % (uploaded_name, f),
                             dir=None, aclrules=aclrules,
-                            force_par=force_par)
+                            force_par=force_par,
+                            compression_type=compression_type)
 
             from Acquire.Client import DirMeta as _DirMeta
             dirmeta = _DirMeta(name=uploaded_name)
@@ -248,7 +256,8 @@ class Drive:
 
             return filemeta.open().upload(filename=filename,
                                           force_par=force_par,
-                                          aclrules=aclrules)
+                                          aclrules=aclrules,
+                                          compression_type=compression_type)
 
     def chunk_download(self, filename, dir=None, download_name=None,
                        version=None):
@@ -350,11 +359,14 @@ class Drive:
             return Drive._list_drives(drive_uid=self._metadata.uid(),
                                       creds=self._creds)
 
-    def list_files(self, dir=None, filename=None, include_metadata=False):
+    def list_files(self, dir=None, filename=None, include_metadata=False,
+                   max_results=None):
         """Return a list of the FileMetas of all of the files contained
            in this drive. If 'dir' is specified then list only the
            files that are contained in 'dir'. If 'filename' is specified
-           then return only the files that match the passed filename
+           then return only the files that match the passed filename.
+           If 'max_results' is specified then return only (up to)
+           this number of files
         """
         if self.is_null():
             return []
@@ -376,6 +388,9 @@ class Drive:
         if filename is not None:
             args["filename"] = str(filename)
 
+        if max_results is not None:
+            args["max_results"] = int(max_results)
+
         if self._creds.is_user():
             from Acquire.Client import Authorisation as _Authorisation
             authorisation = _Authorisation(resource="list_files",
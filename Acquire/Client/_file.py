@@ -76,10 +76,11 @@ class File:
         else:
             return "File(name='%s')" % self._metadata.name()
 
-    def chunk_upload(self, aclrules=None):
+    def chunk_upload(self, aclrules=None, compression_type=None):
         """Start a chunk-upload of a new version of this file. This
            will return a chunk-uploader that can be used to upload
-           a file chunk-by-chunk
+           a file chunk-by-chunk, compressing each chunk using
+           'compression_type' (or the default compression type)
         """
         if self.is_null():
             raise PermissionError("Cannot download a null File!")
@@ -138,12 +139,20 @@ class File:
         self._metadata = filemeta
 
         from Acquire.Client import ChunkUploader as _ChunkUploader
-        return _ChunkUploader.from_data(response["uploader"],
-                                        privkey=privkey,
-                                        service=storage_service)
+        uploader = _ChunkUploader.from_data(response["uploader"],
+                                            privkey=privkey,
+                                            service=storage_service)
 
-    def upload(self, filename, force_par=False, aclrules=None):
-        """Upload 'filename' as the new version of this file"""
+        if compression_type is not None:
+            uploader.set_compression_type(compression_type)
+
+        return uploader
+
+    def upload(self, filename, force_par=False, aclrules=None,
+               compression_type=None):
+        """Upload 'filename' as the new version of this file, compressed
+           using 'compression_type' (or the default compression type)
+        """
         if self.is_null():
             raise PermissionError("Cannot download a null File!")
 
@@ -168,7 +177,8 @@ class File:
                                  remote_filename=uploaded_name,
                                  drive_uid=drive_uid,
                                  aclrules=aclrules,
-                                 local_cutoff=local_cutoff)
+                                 local_cutoff=local_cutoff,
+                                 compression_type=compression_type)
 
         try:
             args = {"filehandle": filehandle.to_data()}
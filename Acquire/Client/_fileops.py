@@ -2,8 +2,58 @@
 __all__ = ["create_new_file", "compress", "uncompress"]
 
 
+def _stream_file(inputfile, outputfile, convert, flush=None):
+    """Stream the data from 'inputfile' through 'convert' (and then
+       'flush') into a tmpfile, which is then moved to 'outputfile'.
+       The name of the resulting file is returned
+    """
+    import os as _os
+
+    block_size = 1048576
+    IFILE = open(inputfile, "rb")
+
+    # convert to a tmpfile and then move to outputfile later...
+    import tempfile as _tempfile
+    (fd, tmpfile) = _tempfile.mkstemp(dir=".")
+    _os.close(fd)
+
+    try:
+        OFILE = open(tmpfile, "wb")
+
+        # convert data in MB blocks
+        data = IFILE.read(block_size)
+
+        while data:
+            OFILE.write(convert(data))
+            data = IFILE.read(block_size)
+
+        if flush is not None:
+            OFILE.write(flush())
+
+        IFILE.close()
+        OFILE.close()
+    except Exception as e:
+        print(e)
+        # make sure we delete the temporary file
+        IFILE.close()
+        _os.unlink(tmpfile)
+        raise
+
+    if outputfile is None:
+        return tmpfile
+
+    try:
+        # move the tmpfile to the correct output name
+        _os.replace(tmpfile, outputfile)
+        return outputfile
+    except Exception as e:
+        print(e)
+        # we can't rename the file - just return the tmpfile name
+        return tmpfile
+
+
 def compress(inputfile=None, outputfile=None,
-             inputdata=None, compression_type="bz2"):
+             inputdata=None, compression_type=None):
     """Compress either the passed filename or filedata using the
        specified compression type. This will compress either to the
        file called 'outputfile', or to a tmpfile. The name of the
@@ -14,65 +64,35 @@ def compress(inputfile=None, outputfile=None,
             inputfile (str, default=None): Name of file to compress
             outputfile (str, default=None): Name of compressed file
             inputdata (str, default=None): Data to be compressed
-            compression_type (str, default="bz2"): Compression type,
-            currently only bz2 supported
+            compression_type (str, default=None): Compression type,
+            one of 'get_compression_types()' (default is
+            'get_default_compression_type()')
        Returns:
             bytes: Compressed data
     """
-    import os as _os
+    from Acquire.Client._compression import _get_codec
+    codec = _get_codec(compression_type)
 
-    if compression_type == "bz2":
-        import bz2 as _bz2
-
-        block_size = 1048576
-        if inputfile is not None:
-            IFILE = open(inputfile, "rb")
-
-            # compress to a tmpfile and then move to outputfile later...
-            import tempfile as _tempfile
-            (fd, bz2file) = _tempfile.mkstemp(dir=".")
-            _os.close(fd)
-
-            try:
-                OFILE = _bz2.BZ2File(bz2file, "wb", compresslevel=9)
-
-                # compress data in MB blocks
-                data = IFILE.read(block_size)
-
-                while data:
-                    OFILE.write(data)
-                    data = IFILE.read(block_size)
-
-                IFILE.close()
-                OFILE.close()
-            except Exception as e:
-                print(e)
-                # make sure we delete the temporary bz2file
-                _os.unlink(bz2file)
-                raise
-
-            if outputfile is None:
-                return bz2file
-
-            try:
-                # move the bz2file to the correct output name
-                _os.rename(bz2file, outputfile)
-                return outputfile
-            except Exception as e:
-                print(e)
-                # we can't rename the file - just return the bz2 name
-                return bz2file
-
-        elif inputdata is not None:
-            # compress the passed data and return
-            return _bz2.compress(inputdata)
-    else:
-        raise ValueError("Unrecognised compression type '%s'" %
-                         compression_type)
+    if inputfile is not None:
+        if codec.compressor is None:
+            with open(inputfile, "rb") as FILE:
+                data = codec.compress(FILE.read())
+
+            return _stream_file(inputfile=inputfile, outputfile=outputfile,
+                                convert=lambda _: b"", flush=lambda: data)
+
+        compressor = codec.compressor()
+        return _stream_file(inputfile=inputfile, outputfile=outputfile,
+                            convert=compressor.compress,
+                            flush=compressor.flush)
+
+    elif inputdata is not None:
+        # compress the passed data and return
+        return codec.compress(inputdata)
 
 
 def uncompress(inputfile=None, outputfile=None,
-               inputdata=None, compression_type="bz2"):
+               inputdata=None, compression_type=None):
     """Uncompress either the passed filename or filedata using the
        specified compression type. This will uncompress either to the
        file called 'outputfile', or to a tmpfile. The name of the
@@ -83,61 +103,47 @@ def uncompress(inputfile=None, outputfile=None,
             inputfile (str, default=None): Name of file to decompress
             outputfile (str, default=None): Name of decompressed file
             inputdata (str, default=None): Data to be decompressed
-            compression_type (str, default="bz2"): Compression type,
-            currently only bz2 supported
+            compression_type (str, default=None): Compression type,
+            one of 'get_compression_types()' (default is
+            'get_default_compression_type()')
        Returns:
             bytes: Decompressed data
     """
-    import os as _os
+    from Acquire.Client._compression import _get_codec
+    codec = _get_codec(compression_type)
 
-    if compression_type == "bz2":
-        import bz2 as _bz2
-
-        block_size = 1048576
-        if inputfile is not None:
-            IFILE = _bz2.BZ2File(inputfile, "rb")
-
-            # compress to a tmpfile and then move to outputfile later...
-            import tempfile as _tempfile
-            (fd, bz2file) = _tempfile.mkstemp(dir=".")
-            _os.close(fd)
-
-            try:
-                OFILE = open(bz2file, "wb")
-
-                # compress data in MB blocks
-                data = IFILE.read(block_size)
-
-                while data:
-                    OFILE.write(data)
-                    data = IFILE.read(block_size)
-
-                IFILE.close()
-                OFILE.close()
-            except Exception as e:
-                print(e)
-                # make sure we delete the temporary bz2file
-                _os.unlink(bz2file)
-                raise
-
-            if outputfile is None:
-                return bz2file
-
-            try:
-                # move the bz2file to the correct output name
-                _os.rename(bz2file, outputfile)
-                return outputfile
-            except Exception as e:
-                print(e)
-                # we can't rename the file - just return the bz2 name
-                return bz2file
-
-        elif inputdata is not None:
-            # compress the passed data and return
-            return _bz2.decompress(inputdata)
-    else:
-        raise ValueError("Unrecognised compression type '%s'" %
-                         compression_type)
+    if inputfile is not None:
+        if codec.decompressor is None:
+            with open(inputfile, "rb") as FILE:
+                data = codec.decompress(FILE.read())
+
+            return _stream_file(inputfile=inputfile, outputfile=outputfile,
+                                convert=lambda _: b"", flush=lambda: data)
+
+        decompressor = [codec.decompressor()]
+
+        def _decompress(data):
+            output = []
+
+            while data:
+                output.append(decompressor[0].decompress(data))
+
+                # start a new decompressor if there are several
+                # compressed streams concatenated together
+                if getattr(decompressor[0], "eof", False):
+                    data = decompressor[0].unused_data
+                    decompressor[0] = codec.decompressor()
+                else:
+                    data = None
+
+            return b"".join(output)
+
+        return _stream_file(inputfile=inputfile, outputfile=outputfile,
+                            convert=_decompress)
+
+    elif inputdata is not None:
+        # uncompress the passed data and return
+        return codec.decompress(inputdata)
 
 
 def create_new_file(filename, dir=None):
@@ -1,4 +1,6 @@
 
+__all__ = ["PAR"]
+
 
 class PAR:
     """This class holds a pre-authenticated request to access
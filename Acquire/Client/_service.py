@@ -271,14 +271,15 @@ class Service:
         self._fail()
         return None
 
-    def call_function(self, function, args=None):
+    def call_function(self, function, args=None, body=None):
         """Call the function 'func' on this service, optionally passing
            in the arguments 'args'. This is a simple wrapper around
            Acquire.Service.call_function which automatically
            gets the correct URL, encrypts the arguments using the
            service's public key, and supplies a key to encrypt
            the response (and automatically then decrypts the
-           response)
+           response). Any binary data in 'body' is sent as the
+           raw body of a binary frame
         """
         self._fail()
         return {}
@@ -288,7 +289,7 @@ class Service:
         self._fail()
         return None
 
-    def verify(self, signature, message):
+    def verify(self, signature, message, cache_time=None):
         """Verify that this service signed the message"""
         self._fail()
         return None
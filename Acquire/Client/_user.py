@@ -141,7 +141,12 @@ class User:
     def __del__(self):
         """Make sure that we log out before deleting this object"""
         if self._auto_logout:
-            self.logout()
+            try:
+                self.logout()
+            except:
+                # this can fail if python is shutting down, as the
+                # functions needed to log out cannot be imported
+                pass
 
     def _set_status(self, status):
         """Internal function used to set the status from the
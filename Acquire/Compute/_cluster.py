@@ -414,8 +414,11 @@ class Cluster:
             return self.get_job(uid=uid, start_state="pending",
                                 end_state="submitting")
 
-    def get_pending_job_uids(self, passphrase=None):
-        """Return the UIDs of all of the jobs that need to be submitted"""
+    def get_pending_job_uids(self, passphrase=None, max_results=None):
+        """Return the UIDs of all of the jobs that need to be submitted.
+           If 'max_results' is set then only (up to) this number
+           of UIDs are returned
+        """
         if self.is_null():
             return []
 
@@ -430,14 +433,22 @@ class Cluster:
             bucket = _get_service_account_bucket()
             prefix = "compute/pending/"
 
-            uids = _ObjectStore.get_all_object_names(bucket=bucket,
-                                                     prefix=prefix,
-                                                     without_prefix=True)
+            names = _ObjectStore.iter_object_names(bucket=bucket,
+                                                   prefix=prefix,
+                                                   without_prefix=True)
+
+            if max_results is None:
+                return list(names)
 
-            return uids
+            from itertools import islice as _islice
+            return list(_islice(names, int(max_results)))
         else:
             passphrase = self.passphrase(resource="get_pending_job_uids")
             args = {"passphrase": passphrase}
+
+            if max_results is not None:
+                args["max_results"] = int(max_results)
+
             result = self.compute_service().call_function(
                             function="get_pending_job_uids", args=args)
 
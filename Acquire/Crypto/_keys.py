@@ -15,8 +15,52 @@ _hashes = _lazy_import.lazy_module("cryptography.hazmat.primitives.hashes")
 _padding = _lazy_import.lazy_module(
             "cryptography.hazmat.primitives.asymmetric.padding")
 _fernet = _lazy_import.lazy_module("cryptography.fernet")
-
-__all__ = ["PrivateKey", "PublicKey", "SymmetricKey", "get_private_key"]
+_aead = _lazy_import.lazy_module(
+            "cryptography.hazmat.primitives.ciphers.aead")
+_hkdf = _lazy_import.lazy_module("cryptography.hazmat.primitives.kdf.hkdf")
+
+__all__ = ["PrivateKey", "PublicKey", "SymmetricKey", "get_private_key",
+           "enable_session_keys", "disable_session_keys"]
+
+# the number of bytes of padding added by RSA-OAEP using SHA256, which
+# limits the size of a message that can be encrypted directly
+_oaep_overhead = 2 * 32 + 2
+
+# the number of seconds for which a symmetric session key is re-used
+# to encrypt long messages to the same public key (None if a new
+# symmetric key is generated and RSA-encrypted for every message).
+# This is off by default - call 'enable_session_keys' to turn it on
+_session_key_lifetime = None
+
+# the maximum number of session keys held by the sender and receiver
+_max_session_keys = 1024
+
+# the session keys used to encrypt messages to each public key
+# (indexed by the public key modulus), and the session keys that
+# have been decrypted by each private key (indexed by the private key
+# modulus and the RSA-encrypted session key)
+_sender_session_keys = None
+_receiver_session_keys = None
+_session_keys_lock = None
+
+# the signatures that have been verified by PublicKey.verify when
+# passed a 'cache_time', indexed by the key fingerprint and the
+# digests of the message and signature, and the maximum number of
+# signatures held in this cache
+_verified_signatures = None
+_max_verified_signatures = 16384
+
+# the header that starts every stream encrypted by
+# SymmetricKey.encrypt_stream, which is followed by the 4-byte segment
+# size and the random salt used to derive the key for this stream
+_stream_magic = b"AQS1"
+_stream_salt_size = 16
+_stream_header_size = len(_stream_magic) + 4 + _stream_salt_size
+
+# the default number of bytes of plaintext in each encrypted segment,
+# and the number of bytes of the AES-GCM tag added to each segment
+_stream_segment_size = 1024 * 1024
+_stream_tag_size = 16
 
 
 def _bytes_to_string(b):
@@ -88,6 +132,141 @@ def _generate_symmetric_key():
     return _fernet.Fernet.generate_key()
 
 
+def _read_exactly(input, size):
+    """Read and return 'size' bytes from the file-like object 'input',
+       returning fewer bytes only if the end of the input is reached
+    """
+    data = input.read(size)
+
+    if data is None:
+        data = b""
+
+    while len(data) < size:
+        more = input.read(size - len(data))
+
+        if not more:
+            break
+
+        data += more
+
+    return data
+
+
+def _segment_nonce(index, is_last):
+    """Return the AES-GCM nonce for the segment at 'index' in an
+       encrypted stream. The final byte marks the last segment, so that
+       a stream that has been truncated cannot be decrypted
+    """
+    if is_last:
+        return index.to_bytes(11, "big") + b"\x01"
+    else:
+        return index.to_bytes(11, "big") + b"\x00"
+
+
+def _get_session_keys():
+    """Return the sender and receiver session key caches, and the
+       lock that protects them (and the verified signature cache)
+    """
+    global _sender_session_keys, _receiver_session_keys, _session_keys_lock
+    global _verified_signatures
+
+    if _session_keys_lock is None:
+        import threading as _threading
+        from collections import OrderedDict as _OrderedDict
+        _sender_session_keys = _OrderedDict()
+        _receiver_session_keys = _OrderedDict()
+        _verified_signatures = _OrderedDict()
+        _session_keys_lock = _threading.Lock()
+
+    return (_sender_session_keys, _receiver_session_keys, _session_keys_lock)
+
+
+def _get_verified_signatures():
+    """Return the cache of verified signatures"""
+    _get_session_keys()
+    return _verified_signatures
+
+
+def _get_cached(cache, key):
+    """Return the unexpired value for 'key' in the passed cache,
+       or None if there is no such value
+    """
+    import time as _time
+    (_, _, lock) = _get_session_keys()
+
+    with lock:
+        try:
+            (value, expires) = cache[key]
+        except KeyError:
+            return None
+
+        if expires < _time.monotonic():
+            del cache[key]
+            return None
+
+        cache.move_to_end(key)
+        return value
+
+
+def _set_cached(cache, key, value, lifetime=None, max_size=None):
+    """Set the value for 'key' in the passed cache, expiring after
+       'lifetime' seconds (default the session key lifetime), and
+       removing the least recently used values if there are more
+       than 'max_size' (default the maximum number of session keys)
+    """
+    import time as _time
+    (_, _, lock) = _get_session_keys()
+
+    if lifetime is None:
+        lifetime = _session_key_lifetime
+
+    if max_size is None:
+        max_size = _max_session_keys
+
+    with lock:
+        cache[key] = (value, _time.monotonic() + lifetime)
+        cache.move_to_end(key)
+
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+
+def enable_session_keys(lifetime=300):
+    """Enable the re-use of symmetric session keys for 'lifetime'
+       seconds. When enabled, long messages encrypted to the same
+       public key re-use the same (RSA-encrypted) symmetric key, and
+       the receiver caches the decrypted symmetric key, so that
+       repeated messages between two keys only need symmetric
+       encryption. Each message still contains the RSA-encrypted
+       symmetric key, so can be decrypted by any holder of the
+       private key. This clears all cached session keys
+    """
+    global _session_key_lifetime
+    _session_key_lifetime = float(lifetime)
+    _clear_session_keys()
+
+
+def disable_session_keys():
+    """Disable the re-use of symmetric session keys, so that a new
+       symmetric key is generated (and RSA-encrypted) for every
+       long message. This clears all cached session keys
+    """
+    global _session_key_lifetime
+    _session_key_lifetime = None
+    _clear_session_keys()
+
+
+def _clear_session_keys():
+    """Clear all cached sender and receiver session keys (verified
+       signatures are not affected)
+    """
+    (sender, receiver, lock) = _get_session_keys()
+
+    with lock:
+        sender.clear()
+        receiver.clear()
+
+
 _key_database = {}
 
 
@@ -167,26 +346,81 @@ class PublicKey:
 
     def fingerprint(self):
         """Return the fingerprint of this key - this is useful to help
-           work out which key to use to decrypt data
+           work out which key to use to decrypt data. This is
+           calculated once and then memoised
         """
+        try:
+            (pubkey, fingerprint) = self._fingerprint
+
+            if pubkey is self._pubkey:
+                return fingerprint
+        except:
+            pass
+
         from hashlib import md5 as _md5
         md5 = _md5()
         md5.update(self.bytes())
         h = md5.hexdigest()
         # return this signature as "AA:BB:CC:DD:EE:etc."
-        return ":".join([h[i:i+2] for i in range(0, len(h), 2)])
+        fingerprint = ":".join([h[i:i+2] for i in range(0, len(h), 2)])
+
+        self._fingerprint = (self._pubkey, fingerprint)
+        return fingerprint
+
+    def key_size_in_bytes(self):
+        """Return the number of bytes in this key"""
+        if self._pubkey is None:
+            return 0
+        else:
+            return int(self._pubkey.key_size / 8)
+
+    def _session_key(self):
+        """Return the symmetric session key (as a Fernet object), and
+           the session key encrypted using this public key, used
+           to encrypt long messages to this key. This is a new key
+           for every message unless session keys are enabled
+        """
+        # read once, as session keys can be enabled or disabled
+        # by another thread while this is running
+        lifetime = _session_key_lifetime
+
+        if lifetime:
+            (cache, _, _) = _get_session_keys()
+            cache_key = self._pubkey.public_numbers().n
+            session = _get_cached(cache, cache_key)
+
+            if session is not None:
+                return session
+
+        key = _fernet.Fernet.generate_key()
+
+        encrypted_key = self._pubkey.encrypt(
+                            key,
+                            _padding.OAEP(
+                                mgf=_padding.MGF1(algorithm=_hashes.SHA256()),
+                                algorithm=_hashes.SHA256(),
+                                label=None)
+                            )
+
+        session = (_fernet.Fernet(key), encrypted_key)
+
+        if lifetime:
+            _set_cached(cache, cache_key, session, lifetime=lifetime)
+
+        return session
 
     def encrypt(self, message):
         """Encrypt and return the passed message. For short messages this
            will use the private key directly. For longer messages,
-           this will generate a random
-           symmetric key, will encrypt the message using that, and will then
-           encrypt the symmetric key. This returns some bytes
+           this will use a random symmetric key (re-used for
+           a short time if session keys are enabled) to encrypt
+           the message, and will then encrypt the symmetric key.
+           This returns some bytes
         """
         if isinstance(message, str):
             message = message.encode("utf-8")
 
-        try:
+        if len(message) <= self.key_size_in_bytes() - _oaep_overhead:
             return self._pubkey.encrypt(
                         message,
                         _padding.OAEP(
@@ -194,29 +428,23 @@ class PublicKey:
                             algorithm=_hashes.SHA256(),
                             label=None)
                         )
-        except:
-            pass
 
         # this is a longer message that cannot be encoded using
         # an asymmetric key - need to use a symmetric key
-        key = _fernet.Fernet.generate_key()
-        f = _fernet.Fernet(key)
+        (f, encrypted_key) = self._session_key()
         token = f.encrypt(message)
 
-        encrypted_key = self._pubkey.encrypt(
-                            key,
-                            _padding.OAEP(
-                                mgf=_padding.MGF1(algorithm=_hashes.SHA256()),
-                                algorithm=_hashes.SHA256(),
-                                label=None)
-                            )
-
         # the first 256 bytes are the encrypted key - the rest
         # is the token, because we are using 2048 bit (256 byte) keys
         return encrypted_key + token
 
-    def verify(self, signature, message):
-        """Verify that the message has been correctly signed"""
+    def verify(self, signature, message, cache_time=None):
+        """Verify that the message has been correctly signed. If
+           'cache_time' is passed then a successful verification is
+           cached (process-wide) for this number of seconds, so that
+           verifying the same signature of the same message with
+           this key again does not repeat the RSA verification
+        """
         if self._pubkey is None:
             from Acquire.Crypto import KeyManipulationError
             raise KeyManipulationError("You cannot verify a message using "
@@ -225,6 +453,15 @@ class PublicKey:
         if isinstance(message, str):
             message = message.encode("utf-8")
 
+        if cache_time:
+            from hashlib import sha256 as _sha256
+            cache = _get_verified_signatures()
+            cache_key = (self.fingerprint(), _sha256(message).digest(),
+                         _sha256(signature).digest())
+
+            if _get_cached(cache, cache_key):
+                return
+
         try:
             self._pubkey.verify(
                           signature,
@@ -239,6 +476,10 @@ class PublicKey:
                        "Error validating the signature "
                        "for the passed message: %s" % str(e))
 
+        if cache_time:
+            _set_cached(cache, cache_key, True, lifetime=cache_time,
+                        max_size=_max_verified_signatures)
+
     def to_data(self):
         """Return this public key as a json-serialisable dictionary"""
         data = {}
@@ -417,17 +658,29 @@ class PrivateKey:
 
     def fingerprint(self):
         """Return the fingerprint of this key - this is useful to help
-           work out which key to use to decrypt data
+           work out which key to use to decrypt data. This is
+           calculated once and then memoised
         """
-        return self.public_key().fingerprint()
+        try:
+            (privkey, fingerprint) = self._fingerprint
+
+            if privkey is self._privkey:
+                return fingerprint
+        except:
+            pass
+
+        fingerprint = self.public_key().fingerprint()
+        self._fingerprint = (self._privkey, fingerprint)
+        return fingerprint
 
     def encrypt(self, message):
         """Encrypt and return the passed message"""
         return self.public_key().encrypt(message)
 
-    def verify(self, signature, message):
+    def verify(self, signature, message, cache_time=None):
         """Verify the passed signature is correct for the passed message"""
-        return self.public_key().verify(signature, message)
+        return self.public_key().verify(signature, message,
+                                        cache_time=cache_time)
 
     def decrypt(self, message):
         """Decrypt and return the passed message"""
@@ -438,27 +691,68 @@ class PrivateKey:
             raise DecryptionError("You cannot decrypt a message "
                                   "with a null key!")
 
-        # try standard decryption
-        try:
-            message = self._privkey.decrypt(
-                message,
-                _padding.OAEP(
-                    mgf=_padding.MGF1(algorithm=_hashes.SHA256()),
-                    algorithm=_hashes.SHA256(),
-                    label=None))
+        if len(message) <= key_size:
+            # this is a short message encrypted directly using RSA
+            try:
+                message = self._privkey.decrypt(
+                    message,
+                    _padding.OAEP(
+                        mgf=_padding.MGF1(algorithm=_hashes.SHA256()),
+                        algorithm=_hashes.SHA256(),
+                        label=None))
+            except Exception as e:
+                from Acquire.Crypto import DecryptionError
+                raise DecryptionError(
+                    "Cannot decrypt the message: %s" % str(e))
 
             try:
                 return message.decode("utf-8")
             except:
                 return message
-        except:
-            pass
 
         # it is a larger message, so need to decrypt the secret symmetric
         # key, and then use that to decrypt the rest of the token
+        f = self._session_key(message[0:key_size])
+
+        try:
+            try:
+                message = f.decrypt(message[key_size:])
+            except:
+                message = f.decrypt(message[key_size:].encode("utf-8"))
+        except Exception as e:
+            from Acquire.Crypto import DecryptionError
+            raise DecryptionError(
+                    "Cannot decrypt the long message using the "
+                    "symmetric key: %s" % str(e))
+
+        try:
+            return message.decode("utf-8")
+        except:
+            return message
+
+    def _session_key(self, encrypted_key):
+        """Return the symmetric key (as a Fernet object) from the
+           passed RSA-encrypted key. If session keys are enabled
+           then this is cached, so that repeated messages that use
+           the same session key do not need to decrypt it again
+        """
+        # read once, as session keys can be enabled or disabled
+        # by another thread while this is running
+        lifetime = _session_key_lifetime
+
+        if lifetime:
+            from hashlib import sha256 as _sha256
+            (_, cache, _) = _get_session_keys()
+            cache_key = (self._privkey.public_key().public_numbers().n,
+                         _sha256(encrypted_key).digest())
+            f = _get_cached(cache, cache_key)
+
+            if f is not None:
+                return f
+
         try:
             symkey = self._privkey.decrypt(
-                        message[0:key_size],
+                        encrypted_key,
                         _padding.OAEP(
                             mgf=_padding.MGF1(algorithm=_hashes.SHA256()),
                             algorithm=_hashes.SHA256(),
@@ -468,28 +762,17 @@ class PrivateKey:
             raise DecryptionError(
                 "Cannot decrypt the symmetric key used "
                 "to encrypt the long message '%s' (%s): %s" %
-                (message[0:key_size], key_size, str(e)))
+                (encrypted_key, len(encrypted_key), str(e)))
 
         try:
             f = _fernet.Fernet(symkey)
         except:
             f = _fernet.Fernet(symkey.decode("utf-8"))
 
-        try:
-            try:
-                message = f.decrypt(message[key_size:])
-            except:
-                message = f.decrypt(message[key_size:].encode("utf-8"))
-        except Exception as e:
-            from Acquire.Crypto import DecryptionError
-            raise DecryptionError(
-                    "Cannot decrypt the long message using the "
-                    "symmetric key: %s" % str(e))
+        if lifetime:
+            _set_cached(cache, cache_key, f, lifetime=lifetime)
 
-        try:
-            return message.decode("utf-8")
-        except:
-            return message
+        return f
 
     def sign(self, message):
         """Return the signature for the passed message"""
@@ -724,6 +1007,177 @@ class SymmetricKey:
         except:
             return message
 
+    def _stream_cipher(self, salt):
+        """Return the AES-GCM cipher for the stream with the passed
+           'salt'. A new key is derived from this key for every stream,
+           so that the segment nonces can safely be a simple counter
+        """
+        if self._symkey is None:
+            from Acquire.Crypto import DecryptionError
+            raise DecryptionError("You cannot decrypt a message "
+                                  "with a null key!")
+
+        key = _hkdf.HKDF(algorithm=_hashes.SHA256(), length=32, salt=salt,
+                         info=b"Acquire.SymmetricKey.stream",
+                         backend=_default_backend()).derive(
+                            _base64.urlsafe_b64decode(self._symkey))
+
+        return _aead.AESGCM(key)
+
+    @staticmethod
+    def read_stream_header(header):
+        """Return the segment size and salt from the passed header of
+           a stream encrypted using 'encrypt_stream'. The header is
+           the first 'SymmetricKey.stream_header_size()' bytes of
+           the stream
+        """
+        if len(header) != _stream_header_size or \
+                not header.startswith(_stream_magic):
+            from Acquire.Crypto import DecryptionError
+            raise DecryptionError(
+                "The data is not a stream encrypted by a SymmetricKey")
+
+        start = len(_stream_magic)
+        segment_size = int.from_bytes(header[start:start+4], "big")
+        salt = header[start+4:]
+
+        return (segment_size, salt)
+
+    @staticmethod
+    def stream_header_size():
+        """Return the size of the header of an encrypted stream. The
+           encrypted segments follow the header, with each segment
+           (apart from the last) being the segment size plus
+           'SymmetricKey.stream_tag_size()' bytes
+        """
+        return _stream_header_size
+
+    @staticmethod
+    def stream_tag_size():
+        """Return the number of bytes added to each encrypted segment"""
+        return _stream_tag_size
+
+    def encrypt_stream(self, input, output, segment_size=None):
+        """Encrypt the data read from the file-like object 'input',
+           writing the encrypted data to the file-like object 'output'.
+           The data is encrypted in segments of 'segment_size' bytes
+           using AES-GCM, so that data of any size can be encrypted
+           without holding it all in memory, and so that each segment
+           is authenticated and can be decrypted independently
+           (e.g. in parallel) using 'decrypt_segment'
+
+           Args:
+                input (file): File-like object to read from
+                output (file): File-like object to write to
+                segment_size (int, default=None): Bytes of data per segment
+           Returns:
+                int: Number of bytes written to 'output'
+        """
+        if self._symkey is None:
+            self._symkey = _generate_symmetric_key()
+
+        if segment_size is None:
+            segment_size = _stream_segment_size
+        else:
+            segment_size = int(segment_size)
+
+        if segment_size <= 0 or segment_size >= 2**32:
+            raise ValueError("Invalid segment size: %s" % segment_size)
+
+        salt = _os.urandom(_stream_salt_size)
+        header = _stream_magic + segment_size.to_bytes(4, "big") + salt
+        cipher = self._stream_cipher(salt)
+
+        output.write(header)
+        written = len(header)
+
+        index = 0
+        segment = _read_exactly(input, segment_size)
+
+        while True:
+            next_segment = _read_exactly(input, segment_size)
+            is_last = (len(next_segment) == 0)
+
+            data = cipher.encrypt(_segment_nonce(index, is_last),
+                                  segment, header)
+            output.write(data)
+            written += len(data)
+
+            if is_last:
+                return written
+
+            segment = next_segment
+            index += 1
+
+    def decrypt_segment(self, header, index, segment, is_last):
+        """Decrypt and return the encrypted 'segment' at 'index' of
+           the stream with the passed 'header'. 'is_last' must be True
+           only for the final segment of the stream. This raises a
+           DecryptionError if the segment has been modified
+
+           Args:
+                header (bytes): Header of the encrypted stream
+                index (int): Index of the segment in the stream
+                segment (bytes): Encrypted segment
+                is_last (bool): Whether this is the last segment
+           Returns:
+                bytes: Decrypted segment
+        """
+        (_, salt) = SymmetricKey.read_stream_header(header)
+
+        try:
+            return self._stream_cipher(salt).decrypt(
+                        _segment_nonce(index, is_last), bytes(segment),
+                        bytes(header))
+        except Exception as e:
+            from Acquire.Crypto import DecryptionError
+            raise DecryptionError(
+                "Cannot decrypt segment %d of the stream using the "
+                "symmetric key: %s" % (index, str(e)))
+
+    def decrypt_stream(self, input, output):
+        """Decrypt the stream (encrypted using 'encrypt_stream') read
+           from the file-like object 'input', writing the decrypted
+           data to the file-like object 'output'. This raises a
+           DecryptionError if the stream has been modified or truncated
+
+           Args:
+                input (file): File-like object to read from
+                output (file): File-like object to write to
+           Returns:
+                int: Number of bytes written to 'output'
+        """
+        header = _read_exactly(input, _stream_header_size)
+        (segment_size, salt) = SymmetricKey.read_stream_header(header)
+        cipher = self._stream_cipher(salt)
+
+        encrypted_size = segment_size + _stream_tag_size
+        written = 0
+        index = 0
+        segment = _read_exactly(input, encrypted_size)
+
+        while True:
+            next_segment = _read_exactly(input, encrypted_size)
+            is_last = (len(next_segment) == 0)
+
+            try:
+                data = cipher.decrypt(_segment_nonce(index, is_last),
+                                      segment, header)
+            except Exception as e:
+                from Acquire.Crypto import DecryptionError
+                raise DecryptionError(
+                    "Cannot decrypt segment %d of the stream using the "
+                    "symmetric key: %s" % (index, str(e)))
+
+            output.write(data)
+            written += len(data)
+
+            if is_last:
+                return written
+
+            segment = next_segment
+            index += 1
+
     def to_data(self, passphrase, mangleFunction=None):
         """Return the json-serialisable data for this key"""
         data = {}
@@ -1,6 +1,65 @@
 
 __all__ = ["Authorisation"]
 
+# the session information (public certificate, user UID and logout time)
+# fetched from identity services when verifying authorisations, indexed
+# by the identity service, session, scope and permissions. This is
+# shared by all Authorisation objects, so that repeated authorisations
+# from the same session do not need to fetch the certificate again
+_session_info_cache = None
+_session_info_lock = None
+
+# the maximum number of sessions held in the above cache
+_max_session_info_cache_size = 4096
+
+
+def _get_cached_session_info(key):
+    """Return the cached session info for 'key', or None if there is
+       no unexpired info for this session
+    """
+    global _session_info_cache, _session_info_lock
+
+    if _session_info_lock is None:
+        import threading as _threading
+        from collections import OrderedDict as _OrderedDict
+        _session_info_cache = _OrderedDict()
+        _session_info_lock = _threading.Lock()
+
+    import time as _time
+
+    with _session_info_lock:
+        try:
+            (info, expires) = _session_info_cache[key]
+        except KeyError:
+            return None
+
+        if expires < _time.monotonic():
+            del _session_info_cache[key]
+            return None
+
+        return info
+
+
+def _set_cached_session_info(key, info, lifetime):
+    """Cache the session info for 'key' for 'lifetime' seconds"""
+    _get_cached_session_info(key)
+
+    import time as _time
+
+    with _session_info_lock:
+        _session_info_cache[key] = (info, _time.monotonic() + lifetime)
+
+        while len(_session_info_cache) > _max_session_info_cache_size:
+            _session_info_cache.popitem(last=False)
+
+
+def _clear_session_info_cache():
+    """Clear the cache of session info"""
+    _get_cached_session_info(None)
+
+    with _session_info_lock:
+        _session_info_cache.clear()
+
 
 class Authorisation:
     """This class holds the information needed to show that a user
@@ -280,12 +339,15 @@ class Authorisation:
             leeway_seconds = 30
             return (self._auth_datetime - now).seconds > leeway_seconds
 
-    def _get_user_public_cert(self, scope=None, permissions=None):
+    def _get_user_public_cert(self, scope=None, permissions=None,
+                              refresh_time=None):
         """Internal function that returns the public certificate
            of the user who signed this authorisation. This will
            check that the authorisation was not signed after the
            user logged out, as well as validating the services
-           that provide the user session keys etc.
+           that provide the user session keys etc. If 'refresh_time'
+           is passed then the session info from the identity service
+           is cached (process-wide) for this number of seconds
         """
         must_fetch = False
 
@@ -315,11 +377,54 @@ class Authorisation:
 
             return testing_key
 
+        cache_key = (self._identity_url, self._identity_uid,
+                     self._session_uid, str(scope), str(permissions))
+
+        if refresh_time:
+            info = _get_cached_session_info(cache_key)
+        else:
+            info = None
+
+        if info is None:
+            info = self._get_session_info(scope=scope,
+                                          permissions=permissions)
+
+            if refresh_time:
+                _set_cached_session_info(cache_key, info, refresh_time)
+
+        (pubcert, user_uid, logout_datetime) = info
+
+        if self._user_uid != user_uid:
+            raise PermissionError(
+                "Cannot verify the authorisation as there is "
+                "disagreement over the UID of the user who signed "
+                "the authorisation. %s versus %s" %
+                (self._user_uid, user_uid))
+
+        if logout_datetime:
+            # the user has logged out from this session - ensure that
+            # the authorisation was created before the user logged out
+            if logout_datetime < self.signature_time():
+                raise PermissionError(
+                    "This authorisation was signed after the user logged "
+                    "out. This means that the authorisation is not valid. "
+                    "Please log in again and create a new authorisation.")
+
+        self._pubcert = pubcert
+        self._scope = scope
+        self._permissions = permissions
+        return pubcert
+
+    def _get_session_info(self, scope=None, permissions=None):
+        """Internal function that fetches the info about the session
+           that signed this authorisation from the identity service.
+           This returns the public certificate of the session, the
+           UID of the user, and the datetime the user logged out
+           (or None if they are still logged in)
+        """
         # we need to get the public signing key for this session
         from Acquire.Service import get_trusted_service \
             as _get_trusted_service
-        from Acquire.ObjectStore import get_datetime_now \
-            as _get_datetime_now
 
         try:
             identity_service = _get_trusted_service(self._identity_url)
@@ -348,14 +453,7 @@ class Authorisation:
         try:
             user_uid = response["user_uid"]
         except:
-            pass
-
-        if self._user_uid != user_uid:
-            raise PermissionError(
-                "Cannot verify the authorisation as there is "
-                "disagreement over the UID of the user who signed "
-                "the authorisation. %s versus %s" %
-                (self._user_uid, user_uid))
+            user_uid = None
 
         try:
             logout_datetime = _string_to_datetime(
@@ -363,22 +461,10 @@ class Authorisation:
         except:
             logout_datetime = None
 
-        if logout_datetime:
-            # the user has logged out from this session - ensure that
-            # the authorisation was created before the user logged out
-            if logout_datetime < self.signature_time():
-                raise PermissionError(
-                    "This authorisation was signed after the user logged "
-                    "out. This means that the authorisation is not valid. "
-                    "Please log in again and create a new authorisation.")
-
         from Acquire.Crypto import PublicKey as _PublicKey
         pubcert = _PublicKey.from_data(response["public_cert"])
 
-        self._pubcert = pubcert
-        self._scope = scope
-        self._permissions = permissions
-        return pubcert
+        return (pubcert, user_uid, logout_datetime)
 
     def assert_once(self, stale_time=7200, scope=None,
                     permissions=None):
@@ -548,15 +634,27 @@ class Authorisation:
                     else:
                         return
 
-        # Now validate that the signature of the UID is correct
+        # Now validate that the signature of the UID is correct. Both
+        # the certificate and the result of the verification are cached
+        # for 'refresh_time', so that verifying the same authorisation
+        # again (e.g. after it is re-loaded) does not repeat the work
+        refresh_time = self._fix_integer(refresh_time, 24*3600)
+
+        if force:
+            cache_time = None
+        else:
+            cache_time = refresh_time
+
         public_cert = self._get_user_public_cert(scope=scope,
-                                                 permissions=permissions)
+                                                 permissions=permissions,
+                                                 refresh_time=cache_time)
 
         message = self._get_message(resource=resource,
                                     matched_resource=matched_resource)
 
         try:
-            public_cert.verify(self._signature, message)
+            public_cert.verify(self._signature, message,
+                               cache_time=cache_time)
         except:
             raise PermissionError(
                 "Cannot verify the authorisation as the signature "
@@ -0,0 +1,401 @@
+
+import threading as _threading
+import time as _time
+
+__all__ = ["Cached_ObjectStore"]
+
+# default maximum number of bytes of object data held in the cache
+_default_max_bytes = 32 * 1024 * 1024
+
+# default number of seconds an object will be held in the cache
+_default_ttl = 60
+
+
+def _bucket_id(backend, bucket):
+    """Return a hashable identifier for the passed bucket. Testing
+       buckets are just directory names, while cloud buckets are
+       dictionaries that hold (amongst other things) the
+       namespace and name of the bucket
+    """
+    if isinstance(bucket, str):
+        return bucket
+
+    try:
+        return (str(bucket.get("namespace", None)),
+                str(bucket["bucket_name"]))
+    except:
+        return backend.get_bucket_name(bucket)
+
+
+class Cached_ObjectStore:
+    """This is an in-process, read-through, least-recently-used cache
+       that wraps any other object store backend. Objects read via
+       'get_object' are held (as immutable bytes) for up to 'ttl'
+       seconds, with the least recently used objects evicted once
+       the total cached data exceeds 'max_bytes'. Any set, delete
+       or take of an object through this backend invalidates the
+       cached copy, and stops any read of that object that is in
+       progress from caching what it read. Note that writes that bypass this process (e.g.
+       uploads via a OSPar, or writes by other services) are only
+       seen once the cached copy expires, so only use this for
+       data that can tolerate being up to 'ttl' seconds stale.
+
+       Any function of the wrapped backend that is not cached
+       is forwarded directly to that backend
+    """
+    def __init__(self, backend, max_bytes=None, ttl=None):
+        if max_bytes is None:
+            max_bytes = _default_max_bytes
+
+        if ttl is None:
+            ttl = _default_ttl
+
+        from collections import OrderedDict as _OrderedDict
+
+        self._backend = backend
+        self._max_bytes = int(max_bytes)
+        self._ttl = float(ttl)
+        self._lock = _threading.RLock()
+        self._objects = _OrderedDict()
+        self._generations = {}
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def __str__(self):
+        return "Cached_ObjectStore(%s, max_bytes=%d, ttl=%s)" % (
+            self._backend, self._max_bytes, self._ttl)
+
+    def __getattr__(self, name):
+        """Forward any un-cached function to the wrapped backend"""
+        return getattr(self._backend, name)
+
+    def backend(self):
+        """Return the backend that is wrapped by this cache"""
+        return self._backend
+
+    def statistics(self):
+        """Return a dictionary of the hit, miss and eviction counts
+           of this cache, plus its current size
+        """
+        with self._lock:
+            return {"hits": self._hits,
+                    "misses": self._misses,
+                    "evictions": self._evictions,
+                    "num_objects": len(self._objects),
+                    "size_bytes": self._size,
+                    "max_bytes": self._max_bytes}
+
+    def reset_statistics(self):
+        """Reset the hit, miss and eviction counters to zero"""
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def clear(self):
+        """Remove all objects from this cache"""
+        with self._lock:
+            self._objects.clear()
+            self._size = 0
+
+    def _lookup(self, bucket_id, key):
+        """Return the cached data for 'key' in the bucket with
+           'bucket_id', or None if this is not cached (or has expired)
+        """
+        cache_key = (bucket_id, key)
+
+        with self._lock:
+            try:
+                (data, expires) = self._objects[cache_key]
+            except KeyError:
+                self._misses += 1
+                return None
+
+            if expires < _time.monotonic():
+                del self._objects[cache_key]
+                self._size -= len(data)
+                self._misses += 1
+                return None
+
+            self._objects.move_to_end(cache_key)
+            self._hits += 1
+            return data
+
+    def _start_read(self, bucket_id, keys):
+        """Record that 'keys' in the bucket with 'bucket_id' are about
+           to be read from the wrapped backend, returning the current
+           generation of each key. This must be matched by a call to
+           '_end_read' once the read has finished
+        """
+        generations = {}
+
+        with self._lock:
+            for key in keys:
+                cache_key = (bucket_id, key)
+
+                try:
+                    generation = self._generations[cache_key]
+                except KeyError:
+                    generation = [0, 0]
+                    self._generations[cache_key] = generation
+
+                # [generation, number of reads in progress]
+                generation[1] += 1
+                generations[key] = generation[0]
+
+        return generations
+
+    def _end_read(self, bucket_id, keys):
+        """Record that the reads of 'keys' started by '_start_read'
+           have finished. Generations are only held while a key is
+           being read, so that they don't grow without bound
+        """
+        with self._lock:
+            for key in keys:
+                cache_key = (bucket_id, key)
+                generation = self._generations[cache_key]
+                generation[1] -= 1
+
+                if generation[1] == 0:
+                    del self._generations[cache_key]
+
+    def _bump_generation(self, cache_key):
+        """Bump the generation of 'cache_key' (if it is being read),
+           so that any read in progress does not cache what it has
+           read. This must be called with the lock held
+        """
+        try:
+            self._generations[cache_key][0] += 1
+        except KeyError:
+            pass
+
+    def _store(self, bucket_id, key, data, generation=None):
+        """Store 'data' for 'key' in the bucket with 'bucket_id',
+           evicting the least recently used objects as needed. Objects
+           that are larger than an eighth of the cache are not stored.
+           If 'generation' is passed then the data is only stored if
+           the key has not been invalidated since this generation was
+           returned by '_start_read' (as otherwise the data may be
+           older than the latest write)
+        """
+        if data is None:
+            return None
+
+        data = bytes(data)
+        size = len(data)
+
+        if size > self._max_bytes // 8:
+            return data
+
+        cache_key = (bucket_id, key)
+
+        with self._lock:
+            if generation is not None:
+                try:
+                    current = self._generations[cache_key][0]
+                except KeyError:
+                    current = None
+
+                if current != generation:
+                    return data
+
+            old = self._objects.pop(cache_key, None)
+
+            if old is not None:
+                self._size -= len(old[0])
+
+            self._objects[cache_key] = (data, _time.monotonic() + self._ttl)
+            self._size += size
+
+            while self._size > self._max_bytes:
+                (_, (old_data, _)) = self._objects.popitem(last=False)
+                self._size -= len(old_data)
+                self._evictions += 1
+
+        return data
+
+    def _invalidate(self, bucket_id, keys):
+        """Remove the cached copies of all of 'keys' in the bucket
+           with 'bucket_id'
+        """
+        with self._lock:
+            for key in keys:
+                cache_key = (bucket_id, key)
+                self._bump_generation(cache_key)
+                old = self._objects.pop(cache_key, None)
+
+                if old is not None:
+                    self._size -= len(old[0])
+
+    def _invalidate_prefix(self, bucket_id, prefix=None):
+        """Remove the cached copies of all keys in the bucket with
+           'bucket_id' that start with 'prefix' (or all keys if
+           'prefix' is None)
+        """
+        with self._lock:
+            for cache_key in list(self._generations.keys()):
+                if cache_key[0] != bucket_id:
+                    continue
+
+                if prefix is None or cache_key[1].startswith(prefix):
+                    self._bump_generation(cache_key)
+
+            for cache_key in list(self._objects.keys()):
+                if cache_key[0] != bucket_id:
+                    continue
+
+                if prefix is None or cache_key[1].startswith(prefix):
+                    old = self._objects.pop(cache_key)
+                    self._size -= len(old[0])
+
+    def get_object(self, bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, reading from the cache if possible
+        """
+        bucket_id = _bucket_id(self._backend, bucket)
+        data = self._lookup(bucket_id, key)
+
+        if data is None:
+            # the generation is recorded before reading, so that this
+            # doesn't cache an old value if the key is written while
+            # it is being read
+            generations = self._start_read(bucket_id, [key])
+
+            try:
+                data = self._store(bucket_id, key,
+                                   self._backend.get_object(bucket, key),
+                                   generations[key])
+            finally:
+                self._end_read(bucket_id, [key])
+
+        return data
+
+    def get_objects(self, bucket, keys):
+        """Return a dictionary of the binary data contained in each
+           of the keys in 'keys' in the passed bucket. Only keys that
+           are not cached are read from the wrapped backend
+        """
+        bucket_id = _bucket_id(self._backend, bucket)
+
+        objects = {}
+        missing = []
+
+        for key in keys:
+            data = self._lookup(bucket_id, key)
+
+            if data is None:
+                missing.append(key)
+            else:
+                objects[key] = data
+
+        if len(missing) > 0:
+            generations = self._start_read(bucket_id, missing)
+
+            try:
+                fetched = self._backend.get_objects(bucket, missing)
+
+                for (key, data) in fetched.items():
+                    objects[key] = self._store(bucket_id, key, data,
+                                               generations[key])
+            finally:
+                self._end_read(bucket_id, missing)
+
+        return objects
+
+    def take_object(self, bucket, key):
+        """Take (delete) the object from the object store, returning
+           the object
+        """
+        bucket_id = _bucket_id(self._backend, bucket)
+        self._invalidate(bucket_id, [key])
+
+        try:
+            return self._backend.take_object(bucket, key)
+        finally:
+            self._invalidate(bucket_id, [key])
+
+    def set_object(self, bucket, key, data):
+        """Set the value of 'key' in 'bucket' to binary 'data'"""
+        bucket_id = _bucket_id(self._backend, bucket)
+        self._invalidate(bucket_id, [key])
+
+        try:
+            self._backend.set_object(bucket, key, data)
+        finally:
+            self._invalidate(bucket_id, [key])
+
+    def set_object_if(self, bucket, key, data, expected_etag=None):
+        """Conditionally set the value of 'key' in 'bucket' to
+           binary 'data'
+        """
+        bucket_id = _bucket_id(self._backend, bucket)
+
+        try:
+            return self._backend.set_object_if(bucket, key, data,
+                                               expected_etag)
+        finally:
+            self._invalidate(bucket_id, [key])
+
+    def set_objects(self, bucket, objects):
+        """Set the value of each key in the dictionary 'objects' in
+           'bucket' to its binary data
+        """
+        bucket_id = _bucket_id(self._backend, bucket)
+        keys = list(objects.keys())
+        self._invalidate(bucket_id, keys)
+
+        try:
+            self._backend.set_objects(bucket, objects)
+        finally:
+            self._invalidate(bucket_id, keys)
+
+    def delete_object(self, bucket, key):
+        """Removes the object at 'key'"""
+        bucket_id = _bucket_id(self._backend, bucket)
+
+        try:
+            self._backend.delete_object(bucket, key)
+        finally:
+            self._invalidate(bucket_id, [key])
+
+    def delete_object_if(self, bucket, key, expected_etag):
+        """Conditionally remove the object at 'key'"""
+        bucket_id = _bucket_id(self._backend, bucket)
+
+        try:
+            return self._backend.delete_object_if(bucket, key,
+                                                  expected_etag)
+        finally:
+            self._invalidate(bucket_id, [key])
+
+    def delete_objects(self, bucket, keys):
+        """Removes the objects at all of the passed 'keys'"""
+        bucket_id = _bucket_id(self._backend, bucket)
+        keys = list(keys)
+
+        try:
+            self._backend.delete_objects(bucket, keys)
+        finally:
+            self._invalidate(bucket_id, keys)
+
+    def delete_all_objects(self, bucket, prefix=None):
+        """Deletes all objects (that start with 'prefix')..."""
+        bucket_id = _bucket_id(self._backend, bucket)
+
+        try:
+            self._backend.delete_all_objects(bucket, prefix)
+        finally:
+            self._invalidate_prefix(bucket_id, prefix)
+
+    def delete_bucket(self, bucket, force=False):
+        """Delete the passed bucket, removing all of its objects
+           from the cache
+        """
+        bucket_id = _bucket_id(self._backend, bucket)
+
+        try:
+            return self._backend.delete_bucket(bucket, force)
+        finally:
+            self._invalidate_prefix(bucket_id)
@@ -8,6 +8,9 @@ import copy as _copy
 
 __all__ = ["GCP_ObjectStore"]
 
+# the number of names to request per page when listing blobs
+_default_page_size = 1000
+
 
 def _sanitise_bucket_name(bucket_name, unique_prefix):
     """This function sanitises the passed bucket name. It will always
@@ -428,6 +431,61 @@ class GCP_ObjectStore:
 
         return data
 
+    @staticmethod
+    def get_object_and_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag (the object
+           generation), which can be passed to 'set_object_if' to
+           conditionally update the object
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+           Returns:
+                tuple: Binary data and etag
+        """
+        key = _clean_key(key)
+
+        try:
+            blob = bucket["bucket"].get_blob(key)
+            data = blob.download_as_bytes(if_generation_match=blob.generation)
+        except:
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError("No data at key '%s'" % key)
+
+        return (data, str(blob.generation))
+
+    @staticmethod
+    def get_objects(bucket, keys):
+        """Return a dictionary of the binary data contained in each
+           of the keys in 'keys' in the passed bucket. The objects
+           are fetched in parallel using a bounded pool of threads
+
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data in bucket
+           Returns:
+                dict: Binary data for each key that contains an object
+        """
+        from Acquire.ObjectStore._threadpool import _parallel_map
+
+        def _get(key):
+            try:
+                return GCP_ObjectStore.get_object(bucket, key)
+            except:
+                return None
+
+        keys = list(keys)
+        results = _parallel_map(_get, keys)
+
+        objects = {}
+
+        for (key, data) in zip(keys, results):
+            if data is not None:
+                objects[key] = data
+
+        return objects
+
     @staticmethod
     def take_object(bucket, key):
         """Take (delete) the object from the object store, returning
@@ -451,34 +509,43 @@ class GCP_ObjectStore:
         return data
 
     @staticmethod
-    def get_all_object_names(bucket, prefix=None, without_prefix=False):
-        """Returns the names of all objects in the passed bucket
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket.
+           The names are listed lazily, one page at a time, so that
+           the caller can stop once it has enough names
 
            Args:
                 bucket (dict): Bucket containing data
                 prefix (str): Prefix for data
-                without_prefix (str): Whether or not to include the prefix
-                                      in the object name
+                start_after (str): Only return names that sort after this
+                page_size (int): Number of names to request per page
+                without_prefix (bool): Whether or not to remove the
+                                       prefix from the object name
            Returns:
-                list: List of all objects in bucket
-
+                generator: Names of the objects in the bucket
         """
         if prefix is not None:
             prefix = _clean_key(prefix)
+            prefix_len = len(prefix)
+        else:
+            prefix_len = 0
 
-        blobs = bucket["bucket"].list_blobs(prefix=prefix)
-
-        names = []
+        if page_size is None:
+            page_size = _default_page_size
 
-        if without_prefix:
-            prefix_len = len(prefix)
+        blobs = bucket["bucket"].list_blobs(prefix=prefix,
+                                            start_offset=start_after,
+                                            page_size=page_size)
 
         for obj in blobs:
-            if prefix:
-                if obj.name.startswith(prefix):
-                    name = obj.name
-            else:
-                name = obj.name
+            name = obj.name
+
+            if start_after is not None and name <= start_after:
+                continue
+
+            if prefix and not name.startswith(prefix):
+                continue
 
             while name.endswith("/"):
                 name = name[0:-1]
@@ -493,9 +560,24 @@ class GCP_ObjectStore:
                     name = name[1:]
 
             if len(name) > 0:
-                names.append(name)
+                yield name
 
-        return names
+    @staticmethod
+    def get_all_object_names(bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket
+
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str): Prefix for data
+                without_prefix (str): Whether or not to include the prefix
+                                      in the object name
+           Returns:
+                list: List of all objects in bucket
+
+        """
+        return list(GCP_ObjectStore.iter_object_names(
+                                bucket=bucket, prefix=prefix,
+                                without_prefix=without_prefix))
 
     @staticmethod
     def set_object(bucket, key, data):
@@ -520,6 +602,86 @@ class GCP_ObjectStore:
         blob = bucket["bucket"].blob(key)
         blob.upload_from_string(data)
 
+    @staticmethod
+    def set_object_if(bucket, key, data, expected_etag=None):
+        """Set the value of 'key' in 'bucket' to binary 'data' if (and
+           only if) the object currently has etag (generation)
+           'expected_etag', or, if 'expected_etag' is None, if there is
+           no object at this key. This uses the native generation
+           preconditions of the object store, so is atomic
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                data (bytes): Binary data to store in bucket
+                expected_etag (str): Etag the object must currently have
+           Returns:
+                str: The new etag, or None if the condition was not met
+        """
+        from google.api_core.exceptions import PreconditionFailed \
+            as _PreconditionFailed
+
+        if data is None:
+            data = b'0'
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        if expected_etag is None:
+            generation = 0
+        else:
+            generation = int(expected_etag)
+
+        key = _clean_key(key)
+
+        blob = bucket["bucket"].blob(key)
+
+        try:
+            blob.upload_from_string(data, if_generation_match=generation)
+        except _PreconditionFailed:
+            return None
+
+        return str(blob.generation)
+
+    @staticmethod
+    def set_objects(bucket, objects):
+        """Set the value of each key in the dictionary 'objects' in
+           'bucket' to its binary data. The objects are written in
+           parallel using a bounded pool of threads
+
+           Args:
+                bucket (dict): Bucket containing data
+                objects (dict): Binary data to store for each key
+
+           Returns:
+                None
+        """
+        from Acquire.ObjectStore._threadpool import _parallel_map
+
+        def _set(item):
+            GCP_ObjectStore.set_object(bucket, item[0], item[1])
+
+        _parallel_map(_set, list(objects.items()))
+
+    @staticmethod
+    def delete_objects(bucket, keys):
+        """Removes the objects at all of the passed 'keys'. The
+           objects are deleted in parallel using a bounded pool
+           of threads
+
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data
+           Returns:
+                None
+        """
+        from Acquire.ObjectStore._threadpool import _parallel_map
+
+        def _delete(key):
+            GCP_ObjectStore.delete_object(bucket, key)
+
+        _parallel_map(_delete, list(keys))
+
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
         """Deletes all objects...
@@ -536,6 +698,32 @@ class GCP_ObjectStore:
         for blob in blobs:
             blob.delete()
 
+    @staticmethod
+    def delete_object_if(bucket, key, expected_etag):
+        """Removes the object at 'key' if (and only if) it currently
+           has etag (generation) 'expected_etag'
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data
+                expected_etag (str): Etag the object must currently have
+           Returns:
+                bool: Whether or not the object was removed
+        """
+        from google.api_core.exceptions import PreconditionFailed \
+            as _PreconditionFailed
+        from google.api_core.exceptions import NotFound as _NotFound
+
+        key = _clean_key(key)
+
+        try:
+            bucket["bucket"].blob(key).delete(
+                                if_generation_match=int(expected_etag))
+        except (_PreconditionFailed, _NotFound):
+            return False
+
+        return True
+
     @staticmethod
     def delete_object(bucket, key):
         """Removes the object at 'key'
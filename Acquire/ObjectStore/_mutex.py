@@ -9,9 +9,9 @@ __all__ = ["Mutex"]
 class Mutex:
     """This class implements a mutex that sits in the object store.
        The mutex is associated with a key. A thread holds this mutex
-       if it has successfully written its secret to this key. If
-       not, then another thread must hold the mutex, and we have
-       to wait...
+       if it has successfully written its secret to this key using
+       a compare-and-swap (ObjectStore.set_object_if). If not, then
+       another thread must hold the mutex, and we have to wait...
     """
     def __init__(self, key=None, timeout=10, lease_time=10, bucket=None):
         """Create the mutex. The immediately tries to lock the mutex
@@ -38,6 +38,7 @@ class Mutex:
         self._bucket = bucket
         self._key = key
         self._secret = str(uuid.uuid4())
+        self._etag = None
         self._is_locked = 0
         self.lock(timeout, lease_time)
 
@@ -123,16 +124,16 @@ class Mutex:
         from Acquire.ObjectStore import ObjectStore as _ObjectStore
         from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
 
+        # only delete the key if we still hold the mutex, i.e. it
+        # has not been taken by someone else since our lease expired
         try:
-            holder = _ObjectStore.get_string_object(self._bucket, self._key)
+            _ObjectStore.delete_object_if(self._bucket, self._key,
+                                          self._etag)
         except:
-            holder = None
-
-        if holder == self._lockstring:
-            # we hold the mutex - delete the key
-            _ObjectStore.delete_object(self._bucket, self._key)
+            pass
 
         self._lockstring = None
+        self._etag = None
         self._is_locked = 0
 
         if self._end_lease < _get_datetime_now():
@@ -201,15 +202,27 @@ class Mutex:
             if (now > self._end_lease) or (now - self._end_lease).seconds < 1:
                 self.fully_unlock()
                 self.lock(timeout, lease_time)
-            else:
-                self._end_lease = now + _datetime.timedelta(seconds=lease_time)
+                return
 
-                self._lockstring = "%s{}%s" % (
-                    self._secret, _datetime_to_string(self._end_lease))
+            end_lease = now + _datetime.timedelta(seconds=lease_time)
+            lockstring = "%s{}%s" % (self._secret,
+                                     _datetime_to_string(end_lease))
 
-                _ObjectStore.set_string_object(self._bucket, self._key,
-                                               self._lockstring)
+            etag = _ObjectStore.set_object_if(self._bucket, self._key,
+                                              lockstring.encode("utf-8"),
+                                              self._etag)
 
+            if etag is None:
+                # someone else has taken the mutex from us, so we
+                # have to lock again from scratch
+                self._lockstring = None
+                self._etag = None
+                self._is_locked = 0
+                self.lock(timeout, lease_time)
+            else:
+                self._end_lease = end_lease
+                self._lockstring = lockstring
+                self._etag = etag
                 self._is_locked += 1
 
             return
@@ -217,65 +230,65 @@ class Mutex:
         now = _get_datetime_now()
         endtime = now + _datetime.timedelta(seconds=timeout)
 
-        # This is the first time we are trying to get a lock
-        while now < endtime:
-            # does anyone else hold the lock?
+        # start by polling quickly, backing off to 4 times a second
+        wait = 0.01
+
+        # This is the first time we are trying to get a lock. Try to
+        # create the key first, as this is a single call if no-one
+        # else holds the mutex
+        expected_etag = None
+        can_take = True
+
+        while True:
+            if can_take:
+                end_lease = now + _datetime.timedelta(seconds=lease_time)
+                lockstring = "%s{}%s" % (self._secret,
+                                         _datetime_to_string(end_lease))
+
+                etag = _ObjectStore.set_object_if(self._bucket, self._key,
+                                                  lockstring.encode("utf-8"),
+                                                  expected_etag)
+
+                if etag is not None:
+                    # the compare-and-swap succeeded - we hold the mutex
+                    self._end_lease = end_lease
+                    self._lockstring = lockstring
+                    self._etag = etag
+                    self._is_locked = 1
+                    return
+
+            # someone else holds the mutex - can we take it from them
+            # because their lease has expired?
             try:
-                holder = _ObjectStore.get_string_object(self._bucket,
-                                                        self._key)
+                (holder, expected_etag) = _ObjectStore.get_object_and_etag(
+                                                    self._bucket, self._key)
+                holder = holder.decode("utf-8")
             except:
+                # the holder unlocked the mutex after we tried
                 holder = None
+                expected_etag = None
 
-            is_held = True
+            now = _get_datetime_now()
 
             if holder is None:
-                is_held = False
+                can_take = True
             else:
-                end_lease = _string_to_datetime(holder.split("{}")[-1])
-                if now > end_lease:
-                    # the lease from the other holder has expired :-)
-                    is_held = False
-
-            if not is_held:
-                # no-one holds this mutex - try to hold it now
-                self._end_lease = now + _datetime.timedelta(seconds=lease_time)
-
-                self._lockstring = "%s{}%s" % (
-                    self._secret, _datetime_to_string(self._end_lease))
-
-                _ObjectStore.set_string_object(self._bucket, self._key,
-                                               self._lockstring)
-
-                holder = _ObjectStore.get_string_object(self._bucket,
-                                                        self._key)
-            else:
-                self._lockstring = None
-
-            if holder == self._lockstring:
-                # it looks like we are the holder - read and write again
-                # just to make sure
-                holder = _ObjectStore.get_string_object(self._bucket,
-                                                        self._key)
-
-                if holder == self._lockstring:
-                    # write again just to make sure
-                    _ObjectStore.set_string_object(self._bucket, self._key,
-                                                   self._lockstring)
-
-                    holder = _ObjectStore.get_string_object(self._bucket,
-                                                            self._key)
-
-            if holder == self._lockstring:
-                # we have read and written our secret to the object store
-                # three times. While a race condition is still possible,
-                # I'd hope it is now highly unlikely - we now hold the mutex
-                self._is_locked = 1
-                return
-
-            # only try the lock 4 times a second
-            _time.sleep(0.25)
-
-            now = _get_datetime_now()
+                try:
+                    end_lease = _string_to_datetime(holder.split("{}")[-1])
+                except:
+                    # the lockstring is corrupted, so it can be taken
+                    end_lease = now
+
+                can_take = (now >= end_lease)
+
+            if now >= endtime:
+                break
+
+            if not can_take:
+                # the mutex is held - wait before trying again
+                _time.sleep(wait)
+                wait = min(2.0 * wait, 0.25)
+                now = _get_datetime_now()
 
         from Acquire.ObjectStore import MutexTimeoutError
         raise MutexTimeoutError("Cannot acquire a mutex lock on the "
@@ -5,13 +5,21 @@ import uuid as _uuid
 import json as _json
 import os as _os
 
+from ._tracing import trace_span as _trace_span
+
 __all__ = ["ObjectStore", "set_object_store_backend",
            "use_testing_object_store_backend",
            "use_oci_object_store_backend",
-           "use_gcp_object_store_backend"]
+           "use_gcp_object_store_backend",
+           "enable_object_store_cache", "disable_object_store_cache",
+           "get_object_store_cache"]
 
 _objstore_backend = None
 
+# the (max_bytes, ttl) settings of the cache used to wrap the backend,
+# or None if the backend should not be cached
+_cache_settings = None
+
 
 def use_testing_object_store_backend(backend):
     from ._testing_objstore import Testing_ObjectStore as _Testing_ObjectStore
@@ -116,7 +124,52 @@ class ObjectStore:
     def get_object(bucket, key):
         """Return the binary data contained in the key 'key' in the
            passed bucket"""
-        return _objstore_backend.get_object(bucket, key)
+        with _trace_span("objstore/get_object"):
+            return _objstore_backend.get_object(bucket, key)
+
+    @staticmethod
+    def get_object_and_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag. The etag can be
+           passed to 'set_object_if' to update the object only if
+           it has not been changed since it was read
+        """
+        with _trace_span("objstore/get_object_and_etag"):
+            return _objstore_backend.get_object_and_etag(bucket, key)
+
+    @staticmethod
+    def get_objects(bucket, keys):
+        """Return a dictionary of the binary data contained in each
+           of the keys in 'keys' in the passed bucket, fetched in
+           a single bulk operation. Keys that do not contain an object
+           are not included in the returned dictionary
+        """
+        keys = list(keys)
+
+        if len(keys) == 0:
+            return {}
+
+        with _trace_span("objstore/get_objects"):
+            return _objstore_backend.get_objects(bucket, keys)
+
+    @staticmethod
+    def get_objects_from_json(bucket, keys):
+        """Return a dictionary of the objects constructed from the json
+           stored at each of the keys in 'keys' in the passed bucket.
+           Keys that do not contain valid json are not included
+        """
+        objects = ObjectStore.get_objects(bucket, keys)
+
+        names = list(objects.keys())
+
+        for name in names:
+            try:
+                s = objects[name].decode("utf-8")
+                objects[name] = _json.loads(s)
+            except:
+                del objects[name]
+
+        return objects
 
     @staticmethod
     def get_object_as_file(bucket, key, filename):
@@ -147,7 +200,8 @@ class ObjectStore:
         """Take (delete) the object from the object store, returning
            the object
         """
-        return _objstore_backend.take_object(bucket, key)
+        with _trace_span("objstore/take_object"):
+            return _objstore_backend.take_object(bucket, key)
 
     @staticmethod
     def take_string_object(bucket, key):
@@ -179,37 +233,40 @@ class ObjectStore:
     @staticmethod
     def get_all_object_names(bucket, prefix=None, without_prefix=False):
         """Returns the names of all objects in the passed bucket"""
-        return _objstore_backend.get_all_object_names(bucket, prefix,
-                                                      without_prefix)
+        with _trace_span("objstore/get_all_object_names"):
+            return _objstore_backend.get_all_object_names(bucket, prefix,
+                                                          without_prefix)
+
+    @staticmethod
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket
+           that start with 'prefix'. The names are listed lazily from
+           the object store, 'page_size' at a time, so you can stop
+           iterating once you have enough names. If 'start_after' is
+           passed, then only names (including the prefix) that sort
+           after this are returned, so you can resume a listing
+           from the last name returned
+        """
+        return _objstore_backend.iter_object_names(
+                                    bucket, prefix=prefix,
+                                    start_after=start_after,
+                                    page_size=page_size,
+                                    without_prefix=without_prefix)
 
     @staticmethod
     def get_all_objects(bucket, prefix=None):
         """Return all of the objects in the passed bucket"""
-        objects = {}
         names = ObjectStore.get_all_object_names(bucket, prefix)
-
-        for name in names:
-            objects[name] = ObjectStore.get_object(bucket, name)
-
-        return objects
+        return ObjectStore.get_objects(bucket, names)
 
     @staticmethod
     def get_all_objects_from_json(bucket, prefix=None):
         """Return all of the objects in the passed bucket as
            json-deserialised objects
         """
-        objects = ObjectStore.get_all_objects(bucket, prefix)
-
-        names = list(objects.keys())
-
-        for name in names:
-            try:
-                s = objects[name].decode("utf-8")
-                objects[name] = _json.loads(s)
-            except:
-                del objects[name]
-
-        return objects
+        names = ObjectStore.get_all_object_names(bucket, prefix)
+        return ObjectStore.get_objects_from_json(bucket, names)
 
     @staticmethod
     def get_all_strings(bucket, prefix=None):
@@ -230,7 +287,32 @@ class ObjectStore:
     @staticmethod
     def set_object(bucket, key, data):
         """Set the value of 'key' in 'bucket' to binary 'data'"""
-        _objstore_backend.set_object(bucket, key, data)
+        with _trace_span("objstore/set_object"):
+            _objstore_backend.set_object(bucket, key, data)
+
+    @staticmethod
+    def set_object_if(bucket, key, data, expected_etag=None):
+        """Compare-and-swap the value of 'key' in 'bucket'. This sets
+           the object to binary 'data' if (and only if) its current
+           etag equals 'expected_etag', or, if 'expected_etag' is None,
+           if there is currently no object at this key. This is atomic,
+           and returns the new etag of the object, or None if the
+           condition was not met (and so nothing was written)
+        """
+        with _trace_span("objstore/set_object_if"):
+            return _objstore_backend.set_object_if(bucket, key, data,
+                                                   expected_etag)
+
+    @staticmethod
+    def set_objects(bucket, objects):
+        """Set the value of each key in the dictionary 'objects' in
+           'bucket' to its binary data, in a single bulk operation
+        """
+        if len(objects) == 0:
+            return
+
+        with _trace_span("objstore/set_objects"):
+            _objstore_backend.set_objects(bucket, objects)
 
     @staticmethod
     def set_object_from_file(bucket, key, filename):
@@ -311,12 +393,38 @@ class ObjectStore:
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
         """Deletes all objects..."""
-        _objstore_backend.delete_all_objects(bucket, prefix)
+        with _trace_span("objstore/delete_all_objects"):
+            _objstore_backend.delete_all_objects(bucket, prefix)
 
     @staticmethod
     def delete_object(bucket, key):
         """Removes the object at 'key'"""
-        _objstore_backend.delete_object(bucket, key)
+        with _trace_span("objstore/delete_object"):
+            _objstore_backend.delete_object(bucket, key)
+
+    @staticmethod
+    def delete_object_if(bucket, key, expected_etag):
+        """Removes the object at 'key' if (and only if) its current
+           etag equals 'expected_etag'. This is atomic, and returns
+           whether or not the object was removed
+        """
+        with _trace_span("objstore/delete_object_if"):
+            return _objstore_backend.delete_object_if(bucket, key,
+                                                      expected_etag)
+
+    @staticmethod
+    def delete_objects(bucket, keys):
+        """Removes the objects at all of the passed 'keys', in a
+           single bulk operation. Keys that do not contain an
+           object are ignored
+        """
+        keys = list(keys)
+
+        if len(keys) == 0:
+            return
+
+        with _trace_span("objstore/delete_objects"):
+            _objstore_backend.delete_objects(bucket, keys)
 
     @staticmethod
     def clear_all_except(bucket, keys):
@@ -325,23 +433,28 @@ class ObjectStore:
         """
         names = ObjectStore.get_all_object_names(bucket)
 
+        remove = []
+
         for name in names:
-            remove = True
+            keep = False
 
             for key in keys:
                 if name.startswith(key):
-                    remove = False
+                    keep = True
                     break
 
-            if remove:
-                ObjectStore.delete_object(bucket, key)
+            if not keep:
+                remove.append(name)
+
+        ObjectStore.delete_objects(bucket, remove)
 
     @staticmethod
     def get_size_and_checksum(bucket, key):
         """Return the object size (in bytes) and checksum of the
            object in the passed bucket at the specified key
         """
-        return _objstore_backend.get_size_and_checksum(bucket, key)
+        with _trace_span("objstore/get_size_and_checksum"):
+            return _objstore_backend.get_size_and_checksum(bucket, key)
 
 
 def set_object_store_backend(backend):
@@ -353,9 +466,76 @@ def set_object_store_backend(backend):
     if backend == _objstore_backend:
         return
 
+    from ._cached_objstore import Cached_ObjectStore as _Cached_ObjectStore
+
+    if isinstance(_objstore_backend, _Cached_ObjectStore):
+        if backend == _objstore_backend.backend():
+            return
+
     if _objstore_backend is not None:
         from Acquire.ObjectStore import ObjectStoreError
         raise ObjectStoreError("You cannot change the object store "
                                "backend once it has been already set!")
 
+    if _cache_settings is not None:
+        backend = _Cached_ObjectStore(backend,
+                                      max_bytes=_cache_settings[0],
+                                      ttl=_cache_settings[1])
+
     _objstore_backend = backend
+
+
+def enable_object_store_cache(max_bytes=None, ttl=None):
+    """Switch on the in-process read-through cache of objects
+       read from the object store. This holds up to 'max_bytes'
+       of object data, with each object cached for up to 'ttl'
+       seconds. This wraps the current backend if it has been set,
+       else it wraps the backend when it is set. This returns the
+       cache, which you can query for its hit and miss statistics
+    """
+    global _cache_settings
+    global _objstore_backend
+
+    from ._cached_objstore import Cached_ObjectStore as _Cached_ObjectStore
+
+    _cache_settings = (max_bytes, ttl)
+
+    if _objstore_backend is None:
+        return None
+
+    if isinstance(_objstore_backend, _Cached_ObjectStore):
+        backend = _objstore_backend.backend()
+    else:
+        backend = _objstore_backend
+
+    _objstore_backend = _Cached_ObjectStore(backend, max_bytes=max_bytes,
+                                            ttl=ttl)
+
+    return _objstore_backend
+
+
+def disable_object_store_cache():
+    """Switch off the in-process cache of objects, so that all reads
+       go directly to the object store backend
+    """
+    global _cache_settings
+    global _objstore_backend
+
+    from ._cached_objstore import Cached_ObjectStore as _Cached_ObjectStore
+
+    _cache_settings = None
+
+    if isinstance(_objstore_backend, _Cached_ObjectStore):
+        _objstore_backend = _objstore_backend.backend()
+
+
+def get_object_store_cache():
+    """Return the cache that wraps the object store backend, or None
+       if the object store is not being cached
+    """
+    from ._cached_objstore import Cached_ObjectStore as _Cached_ObjectStore
+
+    if isinstance(_objstore_backend, _Cached_ObjectStore):
+        return _objstore_backend
+    else:
+        return None
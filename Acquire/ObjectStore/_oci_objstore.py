@@ -9,6 +9,10 @@ import uuid as _uuid
 
 __all__ = ["OCI_ObjectStore"]
 
+# the number of names to request per call to list_objects
+# (this is the maximum allowed by OCI)
+_default_page_size = 1000
+
 
 def _sanitise_bucket_name(bucket_name):
     """This function sanitises the passed bucket name. It will always
@@ -588,6 +592,68 @@ class OCI_ObjectStore:
 
         return data
 
+    @staticmethod
+    def get_object_and_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag, which can be passed
+           to 'set_object_if' to conditionally update the object.
+           Note that this does not support chunked objects
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+           Returns:
+                tuple: Binary data and etag
+        """
+        key = _clean_key(key)
+
+        try:
+            response = bucket["client"].get_object(bucket["namespace"],
+                                                   bucket["bucket_name"],
+                                                   key)
+        except:
+            from Acquire.ObjectStore import ObjectStoreError
+            raise ObjectStoreError("No data at key '%s'" % key)
+
+        data = b''
+
+        for chunk in response.data.raw.stream(1024 * 1024,
+                                              decode_content=False):
+            data += chunk
+
+        return (data, response.headers["etag"])
+
+    @staticmethod
+    def get_objects(bucket, keys):
+        """Return a dictionary of the binary data contained in each
+           of the keys in 'keys' in the passed bucket. The objects
+           are fetched in parallel using a bounded pool of threads
+
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data in bucket
+           Returns:
+                dict: Binary data for each key that contains an object
+        """
+        from Acquire.ObjectStore._threadpool import _parallel_map
+
+        def _get(key):
+            try:
+                return OCI_ObjectStore.get_object(bucket, key)
+            except:
+                return None
+
+        keys = list(keys)
+        results = _parallel_map(_get, keys)
+
+        objects = {}
+
+        for (key, data) in zip(keys, results):
+            if data is not None:
+                objects[key] = data
+
+        return objects
+
     @staticmethod
     def take_object(bucket, key):
         """Take (delete) the object from the object store, returning
@@ -611,51 +677,84 @@ class OCI_ObjectStore:
         return data
 
     @staticmethod
-    def get_all_object_names(bucket, prefix=None, without_prefix=False):
-        """Returns the names of all objects in the passed bucket
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket.
+           The names are listed lazily, one page at a time, following
+           the 'next_start_with' marker returned by the object store
+           until all objects have been listed
 
            Args:
                 bucket (dict): Bucket containing data
                 prefix (str): Prefix for data
+                start_after (str): Only return names that sort after this
+                page_size (int): Number of names to request per page
+                without_prefix (bool): Whether or not to remove the
+                                       prefix from the object name
            Returns:
-                list: List of all objects in bucket
-
+                generator: Names of the objects in the bucket
         """
         if prefix is not None:
             prefix = _clean_key(prefix)
+            prefix_len = len(prefix)
+        else:
+            prefix_len = 0
 
-        objects = bucket["client"].list_objects(bucket["namespace"],
-                                                bucket["bucket_name"],
-                                                prefix=prefix).data
+        if page_size is None:
+            page_size = _default_page_size
 
-        names = []
+        start = start_after
 
-        if without_prefix:
-            prefix_len = len(prefix)
+        while True:
+            objects = bucket["client"].list_objects(bucket["namespace"],
+                                                    bucket["bucket_name"],
+                                                    prefix=prefix,
+                                                    start=start,
+                                                    limit=page_size).data
 
-        for obj in objects.objects:
-            if prefix:
-                if obj.name.startswith(prefix):
-                    name = obj.name
-            else:
+            for obj in objects.objects:
                 name = obj.name
 
-            while name.endswith("/"):
-                name = name[0:-1]
+                if start_after is not None and name <= start_after:
+                    continue
 
-            while name.startswith("/"):
-                name = name[1:]
+                if prefix and not name.startswith(prefix):
+                    continue
 
-            if without_prefix:
-                name = name[prefix_len:]
+                while name.endswith("/"):
+                    name = name[0:-1]
 
                 while name.startswith("/"):
                     name = name[1:]
 
-            if len(name) > 0:
-                names.append(name)
+                if without_prefix:
+                    name = name[prefix_len:]
 
-        return names
+                    while name.startswith("/"):
+                        name = name[1:]
+
+                if len(name) > 0:
+                    yield name
+
+            start = objects.next_start_with
+
+            if start is None:
+                return
+
+    @staticmethod
+    def get_all_object_names(bucket, prefix=None, without_prefix=False):
+        """Returns the names of all objects in the passed bucket
+
+           Args:
+                bucket (dict): Bucket containing data
+                prefix (str): Prefix for data
+           Returns:
+                list: List of all objects in bucket
+
+        """
+        return list(OCI_ObjectStore.iter_object_names(
+                                bucket=bucket, prefix=prefix,
+                                without_prefix=without_prefix))
 
     @staticmethod
     def set_object(bucket, key, data):
@@ -679,6 +778,87 @@ class OCI_ObjectStore:
                                     bucket["bucket_name"],
                                     key, f)
 
+    @staticmethod
+    def set_object_if(bucket, key, data, expected_etag=None):
+        """Set the value of 'key' in 'bucket' to binary 'data' if (and
+           only if) the object currently has etag 'expected_etag', or,
+           if 'expected_etag' is None, if there is no object at this
+           key. This uses the native if-match / if-none-match
+           preconditions of the object store, so is atomic
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data in bucket
+                data (bytes): Binary data to store in bucket
+                expected_etag (str): Etag the object must currently have
+           Returns:
+                str: The new etag, or None if the condition was not met
+        """
+        from oci.exceptions import ServiceError as _ServiceError
+
+        if data is None:
+            data = b'0'
+
+        f = _io.BytesIO(data)
+
+        key = _clean_key(key)
+
+        if expected_etag is None:
+            condition = {"if_none_match": "*"}
+        else:
+            condition = {"if_match": expected_etag}
+
+        try:
+            response = bucket["client"].put_object(bucket["namespace"],
+                                                   bucket["bucket_name"],
+                                                   key, f, **condition)
+        except _ServiceError as e:
+            if e.status in (404, 409, 412):
+                return None
+            else:
+                raise
+
+        return response.headers["etag"]
+
+    @staticmethod
+    def set_objects(bucket, objects):
+        """Set the value of each key in the dictionary 'objects' in
+           'bucket' to its binary data. The objects are written in
+           parallel using a bounded pool of threads
+
+           Args:
+                bucket (dict): Bucket containing data
+                objects (dict): Binary data to store for each key
+
+           Returns:
+                None
+        """
+        from Acquire.ObjectStore._threadpool import _parallel_map
+
+        def _set(item):
+            OCI_ObjectStore.set_object(bucket, item[0], item[1])
+
+        _parallel_map(_set, list(objects.items()))
+
+    @staticmethod
+    def delete_objects(bucket, keys):
+        """Removes the objects at all of the passed 'keys'. The
+           objects are deleted in parallel using a bounded pool
+           of threads
+
+           Args:
+                bucket (dict): Bucket containing data
+                keys (list): Keys for data
+           Returns:
+                None
+        """
+        from Acquire.ObjectStore._threadpool import _parallel_map
+
+        def _delete(key):
+            OCI_ObjectStore.delete_object(bucket, key)
+
+        _parallel_map(_delete, list(keys))
+
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
         """Deletes all objects...
@@ -696,6 +876,34 @@ class OCI_ObjectStore:
                                            bucket["bucket_name"],
                                            obj)
 
+    @staticmethod
+    def delete_object_if(bucket, key, expected_etag):
+        """Removes the object at 'key' if (and only if) it currently
+           has etag 'expected_etag'
+
+           Args:
+                bucket (dict): Bucket containing data
+                key (str): Key for data
+                expected_etag (str): Etag the object must currently have
+           Returns:
+                bool: Whether or not the object was removed
+        """
+        from oci.exceptions import ServiceError as _ServiceError
+
+        key = _clean_key(key)
+
+        try:
+            bucket["client"].delete_object(bucket["namespace"],
+                                           bucket["bucket_name"],
+                                           key, if_match=expected_etag)
+        except _ServiceError as e:
+            if e.status in (404, 409, 412):
+                return False
+            else:
+                raise
+
+        return True
+
     @staticmethod
     def delete_object(bucket, key):
         """Removes the object at 'key'
@@ -671,6 +671,11 @@ def _write_local(url, data):
             FILE.write(data)
             FILE.flush()
 
+    # make sure that the new object is seen by the key index
+    # of the testing object store
+    from ._testing_objstore import _record_local_write
+    _record_local_write(filename)
+
 
 def _write_remote(url, data):
     """Internal function used to write data to the passed remote URL
@@ -969,13 +974,21 @@ class ObjectReader:
         else:
             return _read_remote(url)
 
-    def get_object_as_file(self, filename):
+    def get_object_as_file(self, filename, symmetric_key=None):
         """Get the object contained in this OSPar and write this to
-           the file called 'filename'"""
+           the file called 'filename'. If 'symmetric_key' is passed
+           then the object is decrypted (segment by segment) using
+           this key, as it was encrypted by
+           'ObjectWriter.set_object_from_file'
+        """
         objdata = self.get_object()
 
         with open(filename, "wb") as FILE:
-            FILE.write(objdata)
+            if symmetric_key is None:
+                FILE.write(objdata)
+            else:
+                import io as _io
+                symmetric_key.decrypt_stream(_io.BytesIO(objdata), FILE)
 
     def get_string_object(self):
         """Return the object behind this OSPar as a string (raises exception
@@ -1037,11 +1050,21 @@ class ObjectWriter(ObjectReader):
         else:
             return _write_remote(url, data)
 
-    def set_object_from_file(self, filename):
+    def set_object_from_file(self, filename, symmetric_key=None):
         """Set the value of the object behind this OSPar to equal the contents
-           of the file located by 'filename'"""
+           of the file located by 'filename'. If 'symmetric_key' is
+           passed then the file is encrypted (segment by segment) using
+           this key, so that it can only be read by holders of the key
+        """
         with open(filename, "rb") as FILE:
-            data = FILE.read()
+            if symmetric_key is None:
+                data = FILE.read()
+            else:
+                import io as _io
+                output = _io.BytesIO()
+                symmetric_key.encrypt_stream(FILE, output)
+                data = output.getvalue()
+
             self.set_object(data)
 
     def set_string_object(self, string_data):
@@ -5,6 +5,7 @@ import datetime as _datetime
 import uuid as _uuid
 import json as _json
 import glob as _glob
+import bisect as _bisect
 import threading
 import uuid as _uuid
 
@@ -12,6 +13,435 @@ _rlock = threading.RLock()
 
 __all__ = ["Testing_ObjectStore"]
 
+# names of the files (hidden from glob and the "._data" filters)
+# that hold the sorted key index of each bucket
+_index_file = "._index"
+_journal_file = "._index_journal"
+
+# the number of journal entries that can be accumulated before the
+# journal is compacted into a new sorted index file
+_min_journal_compact = 1024
+
+# the default number of names returned per page by iter_object_names
+_default_page_size = 1000
+
+# the number of seconds after which a conditional-write lock file is
+# assumed to have been abandoned by a crashed process
+_stale_lock_time = 5
+
+# the in-process indexes, keyed by the normalised bucket path
+_indexes = {}
+
+
+def _normalise_key(key):
+    """Return 'key' in the form it is seen when it is read back
+       from the filesystem, i.e. with leading, trailing and
+       duplicate slashes removed
+    """
+    return "/".join([part for part in str(key).split("/") if len(part) > 0])
+
+
+def _walk_object_names(bucket, prefix=None, without_prefix=False):
+    """Return the names of all objects in the passed bucket by
+       walking the filesystem. This is slow for large buckets, so
+       is only used to (re)build the key index
+    """
+    root = bucket
+
+    if prefix is not None:
+        root = "%s/%s" % (bucket, prefix)
+
+    root_len = len(bucket) + 1
+
+    if without_prefix:
+        prefix_len = len(prefix)
+
+    subdir_names = _glob.glob("%s*" % root)
+
+    object_names = []
+
+    while True:
+        names = subdir_names
+        subdir_names = []
+
+        for name in names:
+            if name.endswith("._data"):
+                # remove the  ._data at the end
+                name = name[root_len:-6]
+                while name.endswith("/"):
+                    name = name[0:-1]
+
+                if without_prefix:
+                    name = name[prefix_len:]
+                    while name.startswith("/"):
+                        name = name[1:]
+
+                if len(name) > 0:
+                    object_names.append(name)
+            elif _os.path.isdir(name):
+                subdir_names += _glob.glob("%s/*" % name)
+
+        if len(subdir_names) == 0:
+            break
+
+    return object_names
+
+
+class _BucketIndex:
+    """This is the sorted index of all of the keys in a bucket. This
+       is held on disk as a sorted snapshot file plus an append-only
+       journal of additions and removals, which is compacted back
+       into the snapshot once it gets large. The journal means that
+       every set/delete is a single small append, while listing a
+       prefix is a bisection into the in-memory sorted key list.
+       Changes made by other processes are picked up by re-reading
+       any new journal entries before each use
+    """
+    def __init__(self, bucket):
+        self._bucket = bucket
+        self._index_path = _os.path.join(bucket, _index_file)
+        self._journal_path = _os.path.join(bucket, _journal_file)
+        self._keys = []
+        self._journal_pos = 0
+        self._journal_count = 0
+        self._index_stat = None
+        self._load()
+
+    def _build(self):
+        """Build the index from scratch by walking the bucket"""
+        keys = sorted(set(_walk_object_names(self._bucket)))
+
+        tmp_path = "%s.%s" % (self._index_path, _uuid.uuid4())
+
+        with open(tmp_path, "w") as FILE:
+            for key in keys:
+                FILE.write("%s\n" % key)
+
+        _os.replace(tmp_path, self._index_path)
+
+        try:
+            _os.remove(self._journal_path)
+        except FileNotFoundError:
+            pass
+
+    def _load(self):
+        """Load the sorted snapshot and then replay the journal"""
+        if not _os.path.exists(self._index_path):
+            self._build()
+
+        with open(self._index_path, "r") as FILE:
+            self._keys = FILE.read().splitlines()
+
+        self._index_stat = self._get_index_stat()
+        self._journal_pos = 0
+        self._journal_count = 0
+        self._replay()
+
+    def _get_index_stat(self):
+        """Return the identity of the current snapshot file, so that
+           we can tell if another process has compacted the index
+        """
+        try:
+            st = _os.stat(self._index_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _replay(self):
+        """Apply all journal entries that have not yet been seen"""
+        try:
+            with open(self._journal_path, "rb") as FILE:
+                FILE.seek(self._journal_pos)
+                data = FILE.read()
+        except FileNotFoundError:
+            return
+
+        # only apply complete lines - a partial line is still
+        # being written by someone else
+        end = data.rfind(b"\n")
+
+        if end == -1:
+            return
+
+        self._journal_pos += end + 1
+
+        for line in data[0:end].decode("utf-8").split("\n"):
+            if len(line) < 2:
+                continue
+
+            self._journal_count += 1
+            (op, key) = (line[0], line[1:])
+
+            if op == "+":
+                self._add(key)
+            elif op == "-":
+                self._remove(key)
+            elif op == "~":
+                self._remove_prefix(key)
+
+    def refresh(self):
+        """Make sure that this index includes any changes made
+           by other processes
+        """
+        if self._get_index_stat() != self._index_stat:
+            self._load()
+            return
+
+        try:
+            journal_size = _os.path.getsize(self._journal_path)
+        except FileNotFoundError:
+            journal_size = 0
+
+        if journal_size < self._journal_pos:
+            # the journal has been truncated by a compaction
+            self._load()
+        elif journal_size > self._journal_pos:
+            self._replay()
+
+    def _add(self, key):
+        i = _bisect.bisect_left(self._keys, key)
+        if i == len(self._keys) or self._keys[i] != key:
+            self._keys.insert(i, key)
+
+    def _remove(self, key):
+        i = _bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            del self._keys[i]
+
+    def _remove_prefix(self, prefix):
+        start = _bisect.bisect_left(self._keys, prefix)
+        end = start
+        while end < len(self._keys) and self._keys[end].startswith(prefix):
+            end += 1
+
+        del self._keys[start:end]
+
+    def _record(self, op, keys):
+        """Append the operation 'op' on each of 'keys' to the journal
+           and apply them (plus any other pending entries) to this index
+        """
+        if isinstance(keys, str):
+            keys = [keys]
+
+        if len(keys) == 0:
+            return
+
+        self.refresh()
+
+        lines = "".join(["%s%s\n" % (op, key) for key in keys])
+
+        with open(self._journal_path, "ab") as FILE:
+            FILE.write(lines.encode("utf-8"))
+
+        self._replay()
+
+        if self._journal_count > max(_min_journal_compact, len(self._keys)):
+            self._compact()
+
+    def _compact(self):
+        """Write the current keys as a new sorted snapshot and
+           reset the journal
+        """
+        tmp_path = "%s.%s" % (self._index_path, _uuid.uuid4())
+
+        with open(tmp_path, "w") as FILE:
+            for key in self._keys:
+                FILE.write("%s\n" % key)
+
+        _os.replace(tmp_path, self._index_path)
+
+        with open(self._journal_path, "w"):
+            pass
+
+        self._index_stat = self._get_index_stat()
+        self._journal_pos = 0
+        self._journal_count = 0
+
+    def add(self, key):
+        """Record that there is now an object at 'key'"""
+        key = _normalise_key(key)
+        if len(key) > 0:
+            self._record("+", key)
+
+    def remove(self, key):
+        """Record that there is no longer an object at 'key'"""
+        key = _normalise_key(key)
+        if len(key) > 0:
+            self._record("-", key)
+
+    def add_many(self, keys):
+        """Record that there are now objects at all of 'keys'"""
+        keys = [_normalise_key(key) for key in keys]
+        self._record("+", [key for key in keys if len(key) > 0])
+
+    def remove_many(self, keys):
+        """Record that there are no longer objects at any of 'keys'"""
+        keys = [_normalise_key(key) for key in keys]
+        self._record("-", [key for key in keys if len(key) > 0])
+
+    def remove_prefix(self, prefix):
+        """Record that all objects below the directory 'prefix'
+           have been removed
+        """
+        prefix = _normalise_key(prefix)
+        if len(prefix) > 0:
+            self._record("~", "%s/" % prefix)
+
+    def names(self, prefix=None, without_prefix=False,
+              start_after=None, limit=None):
+        """Return the sorted names of all objects whose keys start with
+           'prefix'. This is a range scan over the sorted keys. If
+           'start_after' is passed then only keys that sort after this
+           are returned, and if 'limit' is passed then no more than
+           this number of names are returned
+        """
+        self.refresh()
+
+        keys = self._keys
+        search = _search_prefix(prefix)
+
+        start = _bisect.bisect_left(keys, search)
+
+        if start_after is not None:
+            start = max(start, _bisect.bisect_right(keys, start_after))
+
+        end = start
+        nkeys = len(keys)
+
+        if limit is not None:
+            nkeys = min(nkeys, start + limit)
+
+        while end < nkeys and keys[end].startswith(search):
+            end += 1
+
+        names = keys[start:end]
+
+        if without_prefix:
+            names = _strip_prefix(names, search)
+
+        return names
+
+
+def _search_prefix(prefix):
+    """Return the normalised form of 'prefix' to search for in the
+       index. The filesystem would ignore leading and repeated slashes
+       in the prefix, but keep a trailing slash (as this restricts the
+       match to objects within that directory)
+    """
+    if prefix is None or len(prefix) == 0:
+        return ""
+
+    search = _normalise_key(prefix)
+
+    if prefix.endswith("/") and len(search) > 0:
+        search = "%s/" % search
+
+    return search
+
+
+def _strip_prefix(names, search):
+    """Return the passed names with the (normalised) prefix 'search'
+       removed
+    """
+    if len(search) == 0:
+        return names
+
+    prefix_len = len(search)
+    names = [name[prefix_len:].lstrip("/") for name in names]
+    return [name for name in names if len(name) > 0]
+
+
+def _get_index(bucket):
+    """Return the key index for the passed bucket, loading or
+       building it if needed. This must be called with _rlock held
+    """
+    path = _os.path.normpath(bucket)
+
+    try:
+        return _indexes[path]
+    except KeyError:
+        pass
+
+    index = _BucketIndex(bucket)
+    _indexes[path] = index
+    return index
+
+
+def _find_indexed_bucket(filename):
+    """Return the bucket and key for the object file 'filename', if
+       this file is in a bucket that has a key index. This returns
+       (None, None) if not
+    """
+    filename = _os.path.normpath(filename)
+
+    if not filename.endswith("._data"):
+        return (None, None)
+
+    bucket = _os.path.dirname(filename)
+
+    while len(bucket) > 0:
+        if _os.path.normpath(bucket) in _indexes or \
+                _os.path.exists(_os.path.join(bucket, _index_file)):
+            key = filename[len(bucket)+1:-6]
+            return (bucket, key)
+
+        parent = _os.path.dirname(bucket)
+
+        if parent == bucket:
+            break
+
+        bucket = parent
+
+    return (None, None)
+
+
+def _record_local_write(filename):
+    """Record that the object file 'filename' has been written directly
+       (e.g. via a local OSPar), so that it is included in the key index
+       of its bucket
+    """
+    with _rlock:
+        (bucket, key) = _find_indexed_bucket(filename)
+
+        if bucket is not None:
+            _get_index(bucket).add(key)
+
+
+def _etag(data):
+    """Return the etag of the passed object data. This is the MD5
+       checksum of the data, so an object that is rewritten with
+       identical data keeps the same etag
+    """
+    import hashlib as _hashlib
+    return _hashlib.md5(data).hexdigest()
+
+
+def _lock_object_file(filename):
+    """Acquire the lock file that guards conditional writes to the
+       object file 'filename'. This is created using O_EXCL, so only
+       one process can hold it at a time. Lock files left behind by
+       crashed processes are broken after _stale_lock_time seconds
+    """
+    import time as _time
+    lockfile = "%s.lock" % filename
+
+    while True:
+        try:
+            fd = _os.open(lockfile, _os.O_CREAT | _os.O_EXCL | _os.O_WRONLY)
+            _os.close(fd)
+            return lockfile
+        except FileExistsError:
+            pass
+
+        try:
+            if _time.time() - _os.path.getmtime(lockfile) > _stale_lock_time:
+                _os.remove(lockfile)
+                continue
+        except FileNotFoundError:
+            continue
+
+        _time.sleep(0.001)
+
 
 def _get_driver_details_from_par(par):
     from Acquire.ObjectStore import datetime_to_string \
@@ -97,7 +527,11 @@ class Testing_ObjectStore:
     @staticmethod
     def is_bucket_empty(bucket):
         """Return whether or not the passed bucket is empty"""
-        return len(_os.listdir(bucket)) == 0
+        for name in _os.listdir(bucket):
+            if not name.startswith(_index_file):
+                return False
+
+        return True
 
     @staticmethod
     def delete_bucket(bucket, force=False):
@@ -117,8 +551,16 @@ class Testing_ObjectStore:
                     "You cannot delete the bucket %s as it is not empty" %
                     Testing_ObjectStore.get_bucket_name(bucket=bucket))
 
-        # the bucket is empty - delete it
-        _os.rmdir(bucket)
+        # the bucket is empty - delete it (and its key index)
+        with _rlock:
+            _indexes.pop(_os.path.normpath(bucket), None)
+
+            if _os.path.exists(bucket):
+                for name in _os.listdir(bucket):
+                    if name.startswith(_index_file):
+                        _os.remove(_os.path.join(bucket, name))
+
+                _os.rmdir(bucket)
 
     @staticmethod
     def create_par(bucket, encrypt_key, key=None, readable=True,
@@ -232,6 +674,42 @@ class Testing_ObjectStore:
                 from Acquire.ObjectStore import ObjectStoreError
                 raise ObjectStoreError("No object at key '%s'" % key)
 
+    @staticmethod
+    def get_object_and_etag(bucket, key):
+        """Return the binary data contained in the key 'key' in the
+           passed bucket, together with its etag, which can be passed
+           to 'set_object_if' to conditionally update the object
+        """
+        filepath = "%s/%s._data" % (bucket, key)
+
+        with _rlock:
+            try:
+                with open(filepath, "rb") as FILE:
+                    data = FILE.read()
+            except (FileNotFoundError, IsADirectoryError):
+                from Acquire.ObjectStore import ObjectStoreError
+                raise ObjectStoreError("No object at key '%s'" % key)
+
+        return (data, _etag(data))
+
+    @staticmethod
+    def get_objects(bucket, keys):
+        """Return a dictionary of the binary data contained in each
+           of the keys in 'keys' in the passed bucket. Keys that
+           do not contain an object are not included
+        """
+        objects = {}
+
+        with _rlock:
+            for key in keys:
+                try:
+                    with open("%s/%s._data" % (bucket, key), "rb") as FILE:
+                        objects[key] = FILE.read()
+                except (FileNotFoundError, IsADirectoryError):
+                    pass
+
+        return objects
+
     @staticmethod
     def take_object(bucket, key):
         """Take (delete) the object from the object store, returning
@@ -242,6 +720,7 @@ class Testing_ObjectStore:
             if _os.path.exists(filepath):
                 data = open(filepath, "rb").read()
                 _os.remove(filepath)
+                _get_index(bucket).remove(key)
                 return data
             else:
                 from Acquire.ObjectStore import ObjectStoreError
@@ -250,46 +729,46 @@ class Testing_ObjectStore:
     @staticmethod
     def get_all_object_names(bucket, prefix=None, without_prefix=False):
         """Returns the names of all objects in the passed bucket"""
+        with _rlock:
+            return _get_index(bucket).names(prefix=prefix,
+                                            without_prefix=without_prefix)
 
-        root = bucket
-
-        if prefix is not None:
-            root = "%s/%s" % (bucket, prefix)
-
-        root_len = len(bucket) + 1
-
-        if without_prefix:
-            prefix_len = len(prefix)
-
-        subdir_names = _glob.glob("%s*" % root)
+    @staticmethod
+    def iter_object_names(bucket, prefix=None, start_after=None,
+                          page_size=None, without_prefix=False):
+        """Iterate over the names of all objects in the passed bucket
+           that start with 'prefix', in sorted order. If 'start_after'
+           is passed then only names (including the prefix) that
+           sort after this are returned. Names are read from the
+           index 'page_size' at a time, so the lock is not held
+           while the caller processes each page
+        """
+        if page_size is None:
+            page_size = _default_page_size
 
-        object_names = []
+        page_size = max(1, int(page_size))
+        search = _search_prefix(prefix)
 
         while True:
-            names = subdir_names
-            subdir_names = []
+            with _rlock:
+                page = _get_index(bucket).names(prefix=prefix,
+                                                start_after=start_after,
+                                                limit=page_size)
 
-            for name in names:
-                if name.endswith("._data"):
-                    # remove the  ._data at the end
-                    name = name[root_len:-6]
-                    while name.endswith("/"):
-                        name = name[0:-1]
+            if len(page) == 0:
+                return
 
-                    if without_prefix:
-                        name = name[prefix_len:]
-                        while name.startswith("/"):
-                            name = name[1:]
+            start_after = page[-1]
+            is_last_page = len(page) < page_size
 
-                    if len(name) > 0:
-                        object_names.append(name)
-                elif _os.path.isdir(name):
-                    subdir_names += _glob.glob("%s/*" % name)
+            if without_prefix:
+                page = _strip_prefix(page, search)
 
-            if len(subdir_names) == 0:
-                break
+            for name in page:
+                yield name
 
-        return object_names
+            if is_last_page:
+                return
 
     @staticmethod
     def set_object(bucket, key, data):
@@ -311,21 +790,158 @@ class Testing_ObjectStore:
                         FILE.write(data)
                     FILE.flush()
 
+            _get_index(bucket).add(key)
+
+    @staticmethod
+    def set_object_if(bucket, key, data, expected_etag=None):
+        """Set the value of 'key' in 'bucket' to binary 'data' if (and
+           only if) the object currently has etag 'expected_etag', or,
+           if 'expected_etag' is None, if there is no object at this
+           key. The data is written to a temporary file which is then
+           atomically linked (for a new object) or renamed (under the
+           O_EXCL lock file for this object) into place. This returns
+           the new etag, or None if the condition was not met
+        """
+        if data is None:
+            data = b''
+
+        filename = "%s/%s._data" % (bucket, key)
+        tmpname = "%s.%s.tmp" % (filename, _uuid.uuid4().hex)
+
+        with _rlock:
+            dir = "/".join(filename.split("/")[0:-1])
+            _os.makedirs(dir, exist_ok=True)
+
+            with open(tmpname, "wb") as FILE:
+                FILE.write(data)
+
+            try:
+                if expected_etag is None:
+                    try:
+                        _os.link(tmpname, filename)
+                    except FileExistsError:
+                        return None
+                else:
+                    lockfile = _lock_object_file(filename)
+
+                    try:
+                        try:
+                            with open(filename, "rb") as FILE:
+                                current = FILE.read()
+                        except FileNotFoundError:
+                            return None
+
+                        if _etag(current) != expected_etag:
+                            return None
+
+                        _os.replace(tmpname, filename)
+                    finally:
+                        _os.remove(lockfile)
+            finally:
+                try:
+                    _os.remove(tmpname)
+                except FileNotFoundError:
+                    pass
+
+            _get_index(bucket).add(key)
+
+        return _etag(data)
+
+    @staticmethod
+    def set_objects(bucket, objects):
+        """Set the value of each key in the passed dictionary 'objects'
+           in 'bucket' to its binary data. The key index is updated
+           once for all of the objects
+        """
+        made_dirs = set()
+
+        with _rlock:
+            for (key, data) in objects.items():
+                filename = "%s/%s._data" % (bucket, key)
+                dir = "/".join(filename.split("/")[0:-1])
+
+                if dir not in made_dirs:
+                    _os.makedirs(dir, exist_ok=True)
+                    made_dirs.add(dir)
+
+                with open(filename, 'wb') as FILE:
+                    if data is not None:
+                        FILE.write(data)
+
+            _get_index(bucket).add_many(list(objects.keys()))
+
+    @staticmethod
+    def delete_objects(bucket, keys):
+        """Removes the objects at all of the passed 'keys'. The key
+           index is updated once for all of the objects
+        """
+        removed = []
+
+        with _rlock:
+            for key in keys:
+                try:
+                    _os.remove("%s/%s._data" % (bucket, key))
+                    removed.append(key)
+                except:
+                    pass
+
+            _get_index(bucket).remove_many(removed)
+
     @staticmethod
     def delete_all_objects(bucket, prefix=None):
         """Deletes all objects..."""
-        if prefix:
-            _shutil.rmtree("%s/%s" % (bucket, prefix), ignore_errors=True)
-        else:
-            _shutil.rmtree(bucket, ignore_errors=True)
+        with _rlock:
+            if prefix:
+                _shutil.rmtree("%s/%s" % (bucket, prefix),
+                               ignore_errors=True)
+                _get_index(bucket).remove_prefix(prefix)
+            else:
+                _shutil.rmtree(bucket, ignore_errors=True)
+                _indexes.pop(_os.path.normpath(bucket), None)
+
+    @staticmethod
+    def delete_object_if(bucket, key, expected_etag):
+        """Removes the object at 'key' if (and only if) it currently
+           has etag 'expected_etag'. This returns whether or not the
+           object was removed
+        """
+        filename = "%s/%s._data" % (bucket, key)
+
+        with _rlock:
+            try:
+                lockfile = _lock_object_file(filename)
+            except FileNotFoundError:
+                # the directory does not exist, so neither does the object
+                return False
+
+            try:
+                try:
+                    with open(filename, "rb") as FILE:
+                        current = FILE.read()
+                except FileNotFoundError:
+                    return False
+
+                if _etag(current) != expected_etag:
+                    return False
+
+                _os.remove(filename)
+            finally:
+                _os.remove(lockfile)
+
+            _get_index(bucket).remove(key)
+
+        return True
 
     @staticmethod
     def delete_object(bucket, key):
         """Removes the object at 'key'"""
-        try:
-            _os.remove("%s/%s._data" % (bucket, key))
-        except:
-            pass
+        with _rlock:
+            try:
+                _os.remove("%s/%s._data" % (bucket, key))
+            except:
+                return
+
+            _get_index(bucket).remove(key)
 
     @staticmethod
     def get_size_and_checksum(bucket, key):
@@ -0,0 +1,29 @@
+
+__all__ = []
+
+# the maximum number of threads used by the object store backends
+# to perform bulk operations in parallel
+_max_threads = 16
+
+
+def _parallel_map(function, items, max_threads=None):
+    """Return the list of results of calling 'function' on each of
+       the passed 'items', in the same order as 'items'. The calls
+       are made in parallel using a bounded pool of threads. Any
+       exception raised by 'function' is re-raised
+    """
+    items = list(items)
+
+    if len(items) == 0:
+        return []
+    elif len(items) == 1:
+        return [function(items[0])]
+
+    if max_threads is None:
+        max_threads = _max_threads
+
+    from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+
+    with _ThreadPoolExecutor(max_workers=min(max_threads,
+                                             len(items))) as pool:
+        return list(pool.map(function, items))
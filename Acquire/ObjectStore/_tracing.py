@@ -0,0 +1,262 @@
+
+import threading as _threading
+import time as _time
+
+__all__ = ["start_trace", "end_trace", "trace_span", "get_current_span",
+           "get_metrics", "reset_metrics"]
+
+
+class _ThreadLocalVar:
+    """A minimal stand-in for contextvars.ContextVar (which needs
+       Python 3.7), that holds a separate value for each thread
+    """
+    def __init__(self, name, default=None):
+        self._name = name
+        self._default = default
+        self._local = _threading.local()
+
+    def get(self):
+        """Return the value for the current thread"""
+        return getattr(self._local, "value", self._default)
+
+    def set(self, value):
+        """Set the value for the current thread, returning a token
+           that can be passed to 'reset' to restore the old value
+        """
+        token = self.get()
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        """Restore the value that was replaced when 'token' was set"""
+        self._local.value = token
+
+
+def _create_context_var(name):
+    """Return a context variable called 'name' (default None), or a
+       thread-local variable if contextvars is not available
+    """
+    try:
+        import contextvars as _contextvars
+    except ImportError:
+        return _ThreadLocalVar(name, default=None)
+
+    return _contextvars.ContextVar(name, default=None)
+
+
+# the span that is currently being timed in this context (thread or
+# asyncio task, or just thread on Python 3.6), or None if nothing
+# is being traced
+_current_span = _create_context_var("acquire_current_span")
+
+# the upper bounds (in milliseconds) of the buckets of the latency
+# histograms. These increase by a factor of two from 0.125 ms to
+# around 2 minutes, with a final bucket for anything slower
+_bucket_bounds = [0.125 * (2**i) for i in range(0, 21)]
+
+# the latency histograms for each function and each phase (span name)
+_histograms = {"functions": {}, "phases": {}}
+_histograms_lock = _threading.Lock()
+
+
+class _LatencyHistogram:
+    """A histogram of latencies, using log-spaced buckets so that
+       it has a small fixed size whatever the number of samples
+    """
+    def __init__(self):
+        self._counts = [0] * (len(_bucket_bounds) + 1)
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def add(self, ms):
+        """Add a latency of 'ms' milliseconds to this histogram"""
+        import bisect as _bisect
+        self._counts[_bisect.bisect_left(_bucket_bounds, ms)] += 1
+        self._count += 1
+        self._total += ms
+
+        if ms > self._max:
+            self._max = ms
+
+    def percentile(self, p):
+        """Return an estimate of the 'p'th percentile latency (the upper
+           bound of the bucket that contains this percentile)
+        """
+        if self._count == 0:
+            return 0.0
+
+        target = p * self._count / 100.0
+        total = 0
+
+        for (i, count) in enumerate(self._counts):
+            total += count
+
+            if total >= target:
+                if i < len(_bucket_bounds):
+                    return min(_bucket_bounds[i], self._max)
+                else:
+                    return self._max
+
+        return self._max
+
+    def to_data(self):
+        """Return a json-serialisable summary of this histogram"""
+        if self._count == 0:
+            mean = 0.0
+        else:
+            mean = self._total / self._count
+
+        return {"count": self._count,
+                "mean_ms": mean,
+                "max_ms": self._max,
+                "p50_ms": self.percentile(50),
+                "p90_ms": self.percentile(90),
+                "p99_ms": self.percentile(99),
+                "buckets": {str(bound): count for (bound, count) in
+                            zip(_bucket_bounds + ["inf"], self._counts)
+                            if count > 0}}
+
+
+def _record(kind, name, ms):
+    """Record a latency of 'ms' milliseconds for the function or
+       phase called 'name'
+    """
+    with _histograms_lock:
+        histograms = _histograms[kind]
+
+        try:
+            histogram = histograms[name]
+        except KeyError:
+            histogram = _LatencyHistogram()
+            histograms[name] = histogram
+
+        histogram.add(ms)
+
+
+class _Span:
+    """A timed span of work within a traced request. Spans form a tree,
+       with the root span covering the whole request
+    """
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        self.start = _time.perf_counter()
+        self.end = None
+
+        if parent is not None:
+            parent.children.append(self)
+
+    def duration(self):
+        """Return the duration of this span in milliseconds"""
+        if self.end is None:
+            end = _time.perf_counter()
+        else:
+            end = self.end
+
+        return 1000.0 * (end - self.start)
+
+    def to_data(self):
+        """Return a json-serialisable tree of this span and its children"""
+        data = {"name": self.name, "ms": self.duration()}
+
+        if len(self.children) > 0:
+            data["children"] = [child.to_data() for child in self.children]
+
+        return data
+
+
+def get_current_span():
+    """Return the span that is currently being timed, or None if this
+       request is not being traced
+    """
+    return _current_span.get()
+
+
+def start_trace(name="request"):
+    """Start tracing a request, returning the root span. This must
+       be passed to 'end_trace' when the request has finished
+    """
+    span = _Span(name)
+    span._token = _current_span.set(span)
+    return span
+
+
+def end_trace(span, function=None):
+    """Finish tracing the request whose root span is 'span'. The
+       latency of the request is recorded in the histogram for
+       'function', and the latency of each phase of the request is
+       recorded in the histogram for that phase. This returns the
+       json-serialisable span tree
+    """
+    span.end = _time.perf_counter()
+
+    try:
+        _current_span.reset(span._token)
+    except:
+        _current_span.set(None)
+
+    _record("functions", str(function), span.duration())
+
+    phases = {}
+    spans = list(span.children)
+
+    while len(spans) > 0:
+        child = spans.pop()
+        phases[child.name] = phases.get(child.name, 0.0) + child.duration()
+        spans += child.children
+
+    for (phase, ms) in phases.items():
+        _record("phases", phase, ms)
+
+    return span.to_data()
+
+
+class trace_span:
+    """Context manager that times the enclosed code as a span called
+       'name', e.g.
+
+       with trace_span("decrypt"):
+           data = key.decrypt(data)
+
+       This does nothing (and is very cheap) if the current request
+       is not being traced
+    """
+    def __init__(self, name):
+        self._name = name
+        self._span = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+
+        if parent is not None:
+            self._span = _Span(self._name, parent)
+            self._token = _current_span.set(self._span)
+
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._span is not None:
+            self._span.end = _time.perf_counter()
+            _current_span.reset(self._token)
+            self._span = None
+
+        return False
+
+
+def get_metrics():
+    """Return the json-serialisable latency histograms of all of the
+       functions and phases that have been traced by this process
+    """
+    with _histograms_lock:
+        return {kind: {name: histogram.to_data()
+                       for (name, histogram) in histograms.items()}
+                for (kind, histograms) in _histograms.items()}
+
+
+def reset_metrics():
+    """Clear all of the latency histograms"""
+    with _histograms_lock:
+        for histograms in _histograms.values():
+            histograms.clear()
@@ -5,33 +5,22 @@ This module provides the base classes and functions used to define
 the services used in the system. It is not likely to be user-facing
 """
 
-from ._function import *
-from ._get_session_info import *
-from ._get_services import *
-from ._get_service_account_bucket import *
-from ._service_account import *
-from ._service import *
-from ._profile import *
-from ._errors import *
-from ._cache_management import *
-from ._trust_service import *
+_submodules = ["_function", "_frame", "_get_session_info", "_get_services",
+               "_get_service_account_bucket", "_service_account", "_service",
+               "_profile", "_errors", "_cache_management", "_trust_service"]
 
-try:
-    if __IPYTHON__:
-        def _set_printer(C):
-            """Function to tell ipython to use __str__ if available"""
-            get_ipython().display_formatter.formatters['text/plain'].for_type(
-                C,
-                lambda obj, p, cycle: p.text(str(obj) if not cycle else '...')
-                )
+# the request tracing lives in Acquire.ObjectStore (so that the object
+# store can time its operations without depending on this module), but
+# is used mostly by services
+_attributes = {"start_trace": "Acquire.ObjectStore",
+               "end_trace": "Acquire.ObjectStore",
+               "trace_span": "Acquire.ObjectStore",
+               "get_current_span": "Acquire.ObjectStore",
+               "get_metrics": "Acquire.ObjectStore",
+               "reset_metrics": "Acquire.ObjectStore"}
 
-        import sys as _sys
-        import inspect as _inspect
+# the objects in this module are only imported when they are first
+# used, so that importing this module is fast
+from Acquire.Stubs import lazy_package as _lazy_package
 
-        _clsmembers = _inspect.getmembers(_sys.modules[__name__],
-                                          _inspect.isclass)
-
-        for _clsmember in _clsmembers:
-            _set_printer(_clsmember[1])
-except:
-    pass
+__getattr__, __dir__ = _lazy_package(__name__, _submodules, _attributes)
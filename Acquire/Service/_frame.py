@@ -0,0 +1,119 @@
+
+import struct as _struct
+
+__all__ = ["pack_frame", "unpack_frame", "is_frame"]
+
+# the magic bytes that start every binary frame
+_frame_magic = b"ACQF"
+
+# the format of the lengths that prefix the header and body
+_header_length = _struct.Struct(">I")
+_body_length = _struct.Struct(">Q")
+
+# the number of bytes of the random nonce used to encrypt a frame body
+_nonce_size = 12
+
+
+def is_frame(data):
+    """Return whether or not the passed data is a binary frame
+       created by 'pack_frame'
+    """
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        return False
+
+    return bytes(data[0:len(_frame_magic)]) == _frame_magic
+
+
+def pack_frame(header, body):
+    """Pack the passed (json-encoded) 'header' and raw binary 'body'
+       into a single binary frame. The frame is
+
+       b"ACQF" | header length (4 bytes) | header |
+       body length (8 bytes) | body
+
+       This allows binary data to be sent without first base64
+       encoding it and embedding it into the json of the header
+    """
+    if isinstance(header, str):
+        header = header.encode("utf-8")
+
+    if body is None:
+        body = b''
+
+    return b"".join([_frame_magic,
+                     _header_length.pack(len(header)), header,
+                     _body_length.pack(len(body)), body])
+
+
+def unpack_frame(data):
+    """Unpack the passed binary frame, returning the tuple of
+       (header, body), where 'header' is the json-encoded header
+       and 'body' is a memoryview of the raw binary body (so no
+       copy of the body is made)
+    """
+    from Acquire.Service import UnpackingError
+
+    if not is_frame(data):
+        raise UnpackingError("The passed data is not a binary frame")
+
+    data = memoryview(data)
+    start = len(_frame_magic)
+
+    try:
+        (header_size,) = _header_length.unpack_from(data, start)
+        start += _header_length.size
+        header = bytes(data[start:start+header_size])
+        start += header_size
+
+        (body_size,) = _body_length.unpack_from(data, start)
+        start += _body_length.size
+        body = data[start:start+body_size]
+    except Exception as e:
+        raise UnpackingError("Corrupted binary frame: %s" % str(e))
+
+    if len(header) != header_size or len(body) != body_size:
+        raise UnpackingError(
+            "Truncated binary frame: expected a %d byte header and %d "
+            "byte body, but got %d and %d bytes" %
+            (header_size, body_size, len(header), len(body)))
+
+    return (header.decode("utf-8"), body)
+
+
+def _encrypt_body(body):
+    """Encrypt the passed frame body using a new random AES-GCM key.
+       This returns the tuple of (key, encrypted_body), where 'key'
+       is the string-encoded key, which should be sent in the
+       (encrypted) header of the frame. The encrypted body is
+       the nonce followed by the ciphertext and tag, so is only
+       28 bytes larger than the body
+    """
+    import os as _os
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM as _AESGCM
+    from Acquire.ObjectStore import bytes_to_string as _bytes_to_string
+
+    key = _AESGCM.generate_key(bit_length=256)
+    nonce = _os.urandom(_nonce_size)
+
+    encrypted = _AESGCM(key).encrypt(nonce, bytes(body), None)
+
+    return (_bytes_to_string(key), nonce + encrypted)
+
+
+def _decrypt_body(key, body):
+    """Decrypt the passed frame body that was encrypted using
+       '_encrypt_body' with the string-encoded 'key'
+    """
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM as _AESGCM
+    from Acquire.ObjectStore import string_to_bytes as _string_to_bytes
+
+    body = memoryview(body)
+
+    try:
+        return _AESGCM(_string_to_bytes(key)).decrypt(
+                    bytes(body[0:_nonce_size]), bytes(body[_nonce_size:]),
+                    None)
+    except Exception as e:
+        from Acquire.Service import UnpackingError
+        raise UnpackingError("Cannot decrypt the body of the binary "
+                             "frame: %s" % str(e))
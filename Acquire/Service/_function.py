@@ -1,11 +1,93 @@
 
 import json as _json
+import threading as _threading
 from io import BytesIO as _BytesIO
 
-__all__ = ["call_function", "pack_arguments", "unpack_arguments",
+from Acquire.ObjectStore._tracing import trace_span as _trace_span
+
+__all__ = ["call_function", "call_functions", "async_call_function",
+           "pack_arguments", "unpack_arguments",
            "create_return_value", "pack_return_value", "unpack_return_value",
            "exception_to_safe_exception", "exception_to_string"]
 
+# the timeout (in seconds) of a call to a remote function
+_call_timeout = 60.0
+
+# the maximum number of connections kept open in the pool to
+# each service
+_max_pool_connections = 16
+
+# the maximum number of remote functions that can be called
+# concurrently via async_call_function
+_max_async_calls = 16
+
+# the pooled requests sessions, one per service URL
+_sessions = {}
+_sessions_requests = None
+_sessions_lock = _threading.Lock()
+
+_async_executor = None
+
+# the number of seconds for which a verified signature of the data
+# returned by a service is cached, so that identical signed data
+# (e.g. repeated responses or re-unpacked data) is only verified once
+_signature_cache_time = 3600
+
+
+def _get_session(service_url):
+    """Return the requests session used to call functions on the
+       service at 'service_url'. There is one session per service,
+       so that the connection (including the TLS handshake) is
+       reused across calls
+    """
+    global _sessions_requests
+
+    from Acquire.Stubs import requests as _requests
+
+    with _sessions_lock:
+        if _sessions_requests is not _requests:
+            # the requests module has been changed (e.g. mocked), so
+            # the existing sessions are no longer valid
+            _sessions.clear()
+            _sessions_requests = _requests
+
+        try:
+            return _sessions[service_url]
+        except KeyError:
+            pass
+
+        session = _requests.Session()
+
+        try:
+            adapter = _requests.adapters.HTTPAdapter(
+                                pool_connections=1,
+                                pool_maxsize=_max_pool_connections)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        except:
+            pass
+
+        _sessions[service_url] = session
+
+        return session
+
+
+def _get_async_executor():
+    """Return the pool of threads used to run remote function calls
+       for async_call_function
+    """
+    global _async_executor
+
+    with _sessions_lock:
+        if _async_executor is None:
+            from concurrent.futures import ThreadPoolExecutor \
+                as _ThreadPoolExecutor
+            _async_executor = _ThreadPoolExecutor(
+                                max_workers=_max_async_calls,
+                                thread_name_prefix="call_function")
+
+        return _async_executor
+
 
 def _get_signing_certificate(fingerprint=None, private_cert=None):
     """Return the signing certificate for this service"""
@@ -147,13 +229,16 @@ def pack_return_value(function=None, payload=None, key=None,
     else:
         response = {}
 
-        result_data = key.encrypt(_json.dumps(result).encode("utf-8"))
+        with _trace_span("encrypt"):
+            result_data = key.encrypt(_json.dumps(result).encode("utf-8"))
 
         if sign_result:
             # sign using the signing certificate for this service
-            signature = _get_signing_certificate(
-                            fingerprint=sign_result,
-                            private_cert=private_cert).sign(result_data)
+            with _trace_span("sign"):
+                signature = _get_signing_certificate(
+                                fingerprint=sign_result,
+                                private_cert=private_cert).sign(result_data)
+
             response["signature"] = _bytes_to_string(signature)
 
         response["data"] = _bytes_to_string(result_data)
@@ -308,7 +393,9 @@ def unpack_arguments(args, key=None, public_cert=None, is_return_value=False,
 
         if public_cert:
             try:
-                public_cert.verify(signature, encrypted_data)
+                with _trace_span("verify"):
+                    public_cert.verify(signature, encrypted_data,
+                                       cache_time=_signature_cache_time)
             except Exception as e:
                 raise UnpackingError(
                     "The signature of the returned data "
@@ -316,7 +403,10 @@ def unpack_arguments(args, key=None, public_cert=None, is_return_value=False,
                     "is incorrect and does not match what we "
                     "know! %s" % (function, service, str(e)))
 
-        decrypted_data = _get_key(key, fingerprint).decrypt(encrypted_data)
+        with _trace_span("decrypt"):
+            decrypted_data = _get_key(key, fingerprint).decrypt(
+                                                            encrypted_data)
+
         return unpack_arguments(decrypted_data,
                                 is_return_value=is_return_value,
                                 function=function, service=service)
@@ -415,7 +505,7 @@ def exception_to_string(e):
 
 
 def call_function(service_url, function=None, args=None, args_key=None,
-                  response_key=None, public_cert=None):
+                  response_key=None, public_cert=None, body=None):
     """Call the remote function called 'function' at 'service_url' passing
        in named function arguments in 'kwargs'. If 'args_key' is supplied,
        then encrypt the arguments using 'args'. If 'response_key'
@@ -424,7 +514,14 @@ def call_function(service_url, function=None, args=None, args_key=None,
        decrypt it in the response. If 'public_cert' is supplied then
        we will ask the service to sign their response using their
        service signing certificate, and we will validate the
-       signature using 'public_cert'
+       signature using 'public_cert'.
+
+       If binary data is passed as 'body' then this is sent as the
+       raw body of a binary frame (see pack_frame), rather than being
+       encoded into the json arguments. The function will receive this
+       as args["body"]. Similarly, if the function returns binary data
+       as "body" then this will be returned as raw bytes in the
+       "body" of the returned dictionary
     """
     if args is None:
         args = {}
@@ -444,12 +541,23 @@ def call_function(service_url, function=None, args=None, args_key=None,
 
         if service is not None:
             if service.canonical_url() == service_url:
+                if body is not None:
+                    args = args.copy()
+                    args["body"] = body
+
                 result = service._call_local_function(function=function,
                                                       args=args)
                 return unpack_return_value(return_value=result)
 
     response_key = _get_key(response_key)
 
+    if body is not None:
+        # encrypt the body with a new key that is sent (encrypted)
+        # as part of the arguments
+        from ._frame import _encrypt_body
+        args = args.copy()
+        (args["body_key"], body) = _encrypt_body(body)
+
     if response_key:
         args_json = pack_arguments(function=function,
                                    args=args, key=args_key,
@@ -459,10 +567,18 @@ def call_function(service_url, function=None, args=None, args_key=None,
         args_json = pack_arguments(function=function,
                                    args=args, key=args_key)
 
+    if body is not None:
+        from ._frame import pack_frame as _pack_frame
+        args_json = _pack_frame(args_json, body)
+        body = None
+
     response = None
     try:
-        from Acquire.Stubs import requests as _requests
-        response = _requests.post(service_url, data=args_json, timeout=60.0)
+        session = _get_session(service_url)
+
+        with _trace_span("call_function"):
+            response = session.post(service_url, data=args_json,
+                                    timeout=_call_timeout)
     except Exception as e:
         from Acquire.Service import RemoteFunctionCallError
         raise RemoteFunctionCallError(
@@ -482,6 +598,30 @@ def call_function(service_url, function=None, args=None, args_key=None,
             (function, service_url,
              response.status_code, str(response.content)))
 
+    from ._frame import is_frame as _is_frame
+
+    if _is_frame(response.content):
+        from ._frame import unpack_frame as _unpack_frame
+        from ._frame import _decrypt_body
+
+        (result, body) = _unpack_frame(response.content)
+
+        result = unpack_return_value(return_value=result, key=response_key,
+                                     public_cert=public_cert,
+                                     function=function, service=service_url)
+
+        try:
+            body_key = result.pop("body_key")
+        except:
+            from Acquire.Service import RemoteFunctionCallError
+            raise RemoteFunctionCallError(
+                "Calling remote function '%s' on '%s' returned a binary "
+                "frame without the key to decrypt it" %
+                (function, service_url))
+
+        result["body"] = _decrypt_body(body_key, body)
+        return result
+
     if response.encoding == "utf-8" or response.encoding is None:
         result = response.content.decode("utf-8")
     else:
@@ -495,3 +635,129 @@ def call_function(service_url, function=None, args=None, args_key=None,
     return unpack_return_value(return_value=result, key=response_key,
                                public_cert=public_cert,
                                function=function, service=service_url)
+
+
+def _pack_batch_arguments(calls):
+    """Return the arguments used to call the batch of
+       (function, args) calls in 'calls'
+    """
+    batch = []
+
+    for call in calls:
+        (function, args) = call
+
+        if args is None:
+            args = {}
+
+        batch.append({"function": function, "args": args})
+
+    return {"calls": batch}
+
+
+def _unpack_batch_result(result, function=None, service=None):
+    """Unpack and return the value returned by calling 'function' as
+       part of a batch. This raises the exception that was raised
+       by the function if it failed
+    """
+    if result is None:
+        return None
+
+    status = result.get("status", -1)
+
+    if status != 0:
+        if "exception" in result:
+            _unpack_and_raise(function, service, result["exception"])
+        else:
+            from Acquire.Service import RemoteFunctionCallError
+            raise RemoteFunctionCallError(
+                "Calling %s on %s exited with status %d: %s" %
+                (function, service, status, result))
+
+    try:
+        return result["return"]
+    except:
+        # no return value from this function
+        return None
+
+
+def _unpack_batch_results(calls, response, service=None):
+    """Unpack the list of values returned by calling the batch of
+       (function, args) calls in 'calls'. Each value is either the
+       return value of the function, or the exception it raised
+    """
+    try:
+        results = response["results"]
+    except:
+        results = None
+
+    if results is None or len(results) != len(calls):
+        from Acquire.Service import RemoteFunctionCallError
+        raise RemoteFunctionCallError(
+            "Calling a batch of %d functions on %s returned an invalid "
+            "response: %s" % (len(calls), service, response))
+
+    values = []
+
+    for (call, result) in zip(calls, results):
+        try:
+            values.append(_unpack_batch_result(result, function=call[0],
+                                               service=service))
+        except Exception as e:
+            values.append(e)
+
+    return values
+
+
+def call_functions(service_url, calls, args_key=None, response_key=None,
+                   public_cert=None):
+    """Call the batch of remote functions in 'calls' at 'service_url'.
+       'calls' is a list of (function, args) tuples. All of the
+       calls are packed (and optionally encrypted using 'args_key')
+       into a single request, and so are made in a single round trip.
+       This returns the list of return values, in the same order as
+       'calls'. If a function raised an exception, then that
+       exception is returned in its place (it is not raised), so that
+       one failure does not lose the results of the other calls
+    """
+    calls = list(calls)
+
+    if len(calls) == 0:
+        return []
+
+    response = call_function(service_url=service_url,
+                             function="admin/batch",
+                             args=_pack_batch_arguments(calls),
+                             args_key=args_key,
+                             response_key=response_key,
+                             public_cert=public_cert)
+
+    return _unpack_batch_results(calls, response, service=service_url)
+
+
+async def async_call_function(service_url, function=None, args=None,
+                              args_key=None, response_key=None,
+                              public_cert=None):
+    """Asynchronous version of call_function, which can be awaited
+       from within an asyncio event loop. This lets you call several
+       independent remote functions concurrently, e.g.
+
+       results = await asyncio.gather(
+                    async_call_function(storage_url, "list_files", args),
+                    async_call_function(accounting_url, "get_info", args))
+
+       The calls are run in a bounded pool of threads, and use
+       the same pooled connections to each service as call_function
+    """
+    import asyncio as _asyncio
+    from functools import partial as _partial
+
+    # get_event_loop returns the running loop when called from a
+    # coroutine, and (unlike get_running_loop) works on Python 3.6
+    loop = _asyncio.get_event_loop()
+
+    return await loop.run_in_executor(
+                    _get_async_executor(),
+                    _partial(call_function, service_url=service_url,
+                             function=function, args=args,
+                             args_key=args_key, response_key=response_key,
+                             public_cert=public_cert))
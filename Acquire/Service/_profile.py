@@ -1,33 +1,61 @@
 
 import os as _os
 
-if _os.getenv("PROFILE") == "1":
-    profiling_code = True
-
-    def start_profile():
-        import cProfile as _cProfile
-        pr = _cProfile.Profile()
-        pr.enable()
-        return pr
-
-    def end_profile(pr, results):
-        pr.disable()
-        import tempfile as _tempfile
-        from Acquire.ObjectStore import bytes_to_string as _bytes_to_string
-        t = _tempfile.mktemp()
-        pr.dump_stats(t)
-        with open(t, "rb") as FILE:
-            data = FILE.read()
-        _os.unlink(t)
-        results["profile_data"] = _bytes_to_string(data)
+__all__ = ["start_profile", "end_profile"]
+
+# whether or not requests can be profiled (set PROFILE=1 to enable). When
+# enabled, a request is profiled if it asks to be (by passing
+# "profile": True in its arguments), or at random for the fraction
+# PROFILE_SAMPLE_RATE of all requests
+profiling_code = (_os.getenv("PROFILE") == "1")
+
+try:
+    _profile_sample_rate = float(_os.getenv("PROFILE_SAMPLE_RATE", "0"))
+except:
+    _profile_sample_rate = 0.0
 
-else:
-    profiling_code = False
 
-    def start_profile():
+def start_profile(args=None):
+    """Start profiling the request with arguments 'args' if profiling
+       is enabled and this request has either asked to be profiled, or
+       has been sampled. This returns the profiler, or None if this
+       request is not being profiled
+    """
+    requested = False
+
+    if isinstance(args, dict):
+        requested = bool(args.pop("profile", False))
+
+    if not profiling_code:
         return None
 
-    def end_profile(profiler, results):
+    if not requested:
+        if _profile_sample_rate <= 0:
+            return None
+
+        import random as _random
+        if _random.random() >= _profile_sample_rate:
+            return None
+
+    import cProfile as _cProfile
+    pr = _cProfile.Profile()
+    pr.enable()
+    return pr
+
+
+def end_profile(pr, results):
+    """Stop the profiler 'pr' (if not None), adding the pstats data
+       from the profile to 'results' as "profile_data"
+    """
+    if pr is None:
         return results
 
-__all__ = ["start_profile", "end_profile"]
+    pr.disable()
+    pr.create_stats()
+
+    if isinstance(results, dict):
+        import marshal as _marshal
+        from Acquire.ObjectStore import bytes_to_string as _bytes_to_string
+        results["profile_data"] = _bytes_to_string(_marshal.dumps(pr.stats))
+
+    return results
@@ -502,6 +502,7 @@ class Service:
             # can verify data signed using the old private certificate
             self._lastkey = self._privkey
             self._lastcert = self._privcert
+            self._key_index = None
 
             # now generate a new key and certificate
             from Acquire.Crypto import PrivateKey as _PrivateKey
@@ -824,14 +825,15 @@ class Service:
         else:
             return self._lastcert
 
-    def call_function(self, function, args=None):
+    def call_function(self, function, args=None, body=None):
         """Call the function 'func' on this service, optionally passing
            in the arguments 'args'. This is a simple wrapper around
            Acquire.Service.call_function which automatically
            gets the correct URL, encrypts the arguments using the
            service's public key, and supplies a key to encrypt
            the response (and automatically then decrypts the
-           response)
+           response). Any binary data in 'body' is sent as the
+           raw body of a binary frame
         """
         if self.is_null():
             from Acquire.Service import RemoteFunctionCallError
@@ -853,7 +855,8 @@ class Service:
                                   args=args,
                                   args_key=self.public_key(),
                                   public_cert=self.public_certificate(),
-                                  response_key=_get_private_key("function"))
+                                  response_key=_get_private_key("function"),
+                                  body=body)
 
         except ServiceAccountMissingKeyError:
             # the service's keys have changed and we can no longer
@@ -873,7 +876,48 @@ class Service:
                               args=args,
                               args_key=self.public_key(),
                               public_cert=self.public_certificate(),
-                              response_key=_get_private_key("function"))
+                              response_key=_get_private_key("function"),
+                              body=body)
+
+    def call_functions(self, calls):
+        """Call the batch of functions in 'calls' on this service,
+           where 'calls' is a list of (function, args) tuples. All
+           of the calls are packed into a single request, so are made
+           using a single round trip and a single encryption of the
+           arguments. This returns the list of return values, in the
+           same order as 'calls', with the exception raised by any
+           failed function returned in its place
+        """
+        from ._function import _pack_batch_arguments, _unpack_batch_results
+
+        calls = list(calls)
+
+        if len(calls) == 0:
+            return []
+
+        response = self.call_function(function="admin/batch",
+                                      args=_pack_batch_arguments(calls))
+
+        return _unpack_batch_results(calls, response,
+                                     service=self.service_url())
+
+    async def async_call_function(self, function, args=None):
+        """Asynchronous version of 'call_function', which can be
+           awaited from within an asyncio event loop, so that you
+           can call functions on several services concurrently
+        """
+        import asyncio as _asyncio
+        from functools import partial as _partial
+        from ._function import _get_async_executor
+
+        # get_event_loop returns the running loop when called from a
+        # coroutine, and (unlike get_running_loop) works on Python 3.6
+        loop = _asyncio.get_event_loop()
+
+        return await loop.run_in_executor(
+                        _get_async_executor(),
+                        _partial(self.call_function, function=function,
+                                 args=args))
 
     def sign(self, message):
         """Sign the specified message"""
@@ -882,12 +926,13 @@ class Service:
 
         return self.private_certificate().sign(message)
 
-    def verify(self, signature, message):
+    def verify(self, signature, message, cache_time=None):
         """Verify that this service signed the message"""
         if self.is_null():
             raise PermissionError("You cannot verify using a null service!")
 
-        self.public_certificate().verify(signature, message)
+        self.public_certificate().verify(signature, message,
+                                         cache_time=cache_time)
 
     def encrypt(self, message):
         """Encrypt the passed message"""
@@ -1118,38 +1163,51 @@ class Service:
 
         return result
 
-    def get_key(self, fingerprint):
-        """Return the key matching the passed fingerprint"""
-        if self.is_null():
-            return None
+    def _get_key_index(self):
+        """Return the index of the in-memory keys and certificates of
+           this service (the current and last keys and certificates),
+           indexed by their fingerprints. This is built once, and
+           is rebuilt only after the keys are refreshed
+        """
+        try:
+            index = self._key_index
+        except:
+            index = None
 
-        if self.is_unlocked():
-            if self._privkey.fingerprint() == fingerprint:
-                return self._privkey
-            elif self._privcert.fingerprint() == fingerprint:
-                return self._privcert
+        if index is not None:
+            return index
 
-            try:
-                if self._lastkey.fingerprint() == fingerprint:
-                    return self._lastkey
-                elif self._lastcert.fingerprint() == fingerprint:
-                    return self._lastcert
-            except:
-                pass
+        index = {}
+
+        if self.is_unlocked():
+            keys = [self._lastkey, self._lastcert,
+                    self._privkey, self._privcert]
         else:
-            if self._pubkey.fingerprint() == fingerprint:
-                return self._pubkey
-            elif self._pubcert.fingerprint() == fingerprint:
-                return self._pubcert
-            else:
+            keys = [self._lastkey, self._lastcert,
+                    self._pubkey, self._pubcert]
+
+        for key in keys:
+            if key is not None:
                 try:
-                    if self._lastkey.fingerprint() == fingerprint:
-                        key = self._lastkey
-                    elif self._lastcert.fingerprint() == fingerprint:
-                        key = self._lastcert
+                    index[key.fingerprint()] = key
                 except:
                     pass
 
+        self._key_index = index
+        return index
+
+    def get_key(self, fingerprint):
+        """Return the key matching the passed fingerprint"""
+        if self.is_null():
+            return None
+
+        index = self._get_key_index()
+
+        try:
+            return index[fingerprint]
+        except KeyError:
+            pass
+
         # we need to load the key from objstore
         unlocked = self.is_unlocked()
         from Acquire.Service import load_service_key_from_objstore \
@@ -1183,6 +1241,7 @@ class Service:
                     "Unable to load the public key or certificate with "
                     "fingerprint '%s'" % fingerprint)
 
+        index[fingerprint] = key
         return key
 
     def is_evolution_of(self, other):
@@ -1,18 +1,36 @@
 
 import os as _os
 import json as _json
+import threading as _threading
 
 from cachetools import cached as _cached
 from cachetools import LRUCache as _LRUCache
 
 # The cache can hold a maximum of 5 objects, and will replace the least
-# recently used items first
+# recently used items first. The caches are shared by all threads that
+# handle requests (e.g. in the long-lived server), so are locked
+_cache_lock = _threading.RLock()
 _cache_serviceinfo_data = _LRUCache(maxsize=5)
 _cache_service_info = _LRUCache(maxsize=5)
 _cache_adminusers = _LRUCache(maxsize=5)
 _cache_serviceuser = _LRUCache(maxsize=5)
 _cache_service_account_uid = _LRUCache(maxsize=5)
 
+# The old keys and certificates of services that have been loaded from
+# the object store, indexed by the service UID and key fingerprint.
+# Old keys never change, so these never need to be reloaded
+_old_service_keys = _LRUCache(maxsize=64)
+
+# The decrypted identity (private keys and certificates) of each service
+# run by this process, indexed by service UID and held together with the
+# identity version that was current when it was decrypted. Decrypting
+# the identity with the service password is slow, so this survives
+# 'clear_serviceinfo_cache', and is only replaced when the identity
+# version in the object store is changed (i.e. when the keys are
+# refreshed or the service is set up again)
+_service_identities = _LRUCache(maxsize=16)
+_service_identity_stats = {"hits": 0, "decrypts": 0}
+
 
 __all__ = ["push_is_running_service", "pop_is_running_service",
            "is_running_service", "assert_running_service",
@@ -23,13 +41,16 @@ __all__ = ["push_is_running_service", "pop_is_running_service",
            "get_service_private_certificate", "get_service_public_key",
            "get_service_public_certificate",
            "refresh_service_keys_and_certs",
-           "clear_serviceinfo_cache",
+           "clear_serviceinfo_cache", "get_service_identity_stats",
            "get_service_user_account_uid", "create_service_user_account"]
 
 
 # The key in the object store for the service object
 _service_key = "_service_key"
 
+# The key in the object store for the version of the service identity
+_identity_version_key = "%s/identity_version" % _service_key
+
 _is_running_service = 0
 
 
@@ -39,7 +60,9 @@ def push_is_running_service():
        as part of a running service
     """
     global _is_running_service
-    _is_running_service += 1
+
+    with _cache_lock:
+        _is_running_service += 1
 
 
 def pop_is_running_service():
@@ -48,10 +71,12 @@ def pop_is_running_service():
        as part of a running service
     """
     global _is_running_service
-    _is_running_service -= 1
 
-    if _is_running_service < 0:
-        _is_running_service = 0
+    with _cache_lock:
+        _is_running_service -= 1
+
+        if _is_running_service < 0:
+            _is_running_service = 0
 
 
 def is_running_service():
@@ -73,16 +98,104 @@ def clear_serviceinfo_cache():
     """Clear the caches used to accelerate loading the service info
        and admin user objects
     """
-    _cache_adminusers.clear()
-    _cache_service_info.clear()
-    _cache_serviceinfo_data.clear()
-    _cache_serviceuser.clear()
-    _cache_service_account_uid.clear()
+    with _cache_lock:
+        _cache_adminusers.clear()
+        _cache_service_info.clear()
+        _cache_serviceinfo_data.clear()
+        _cache_serviceuser.clear()
+        _cache_service_account_uid.clear()
+
+
+def get_service_identity_stats():
+    """Return the number of times that the decrypted identity of
+       this service was reused from the cache ("hits"), and the number
+       of times it had to be decrypted using the service password
+       ("decrypts")
+    """
+    with _cache_lock:
+        return dict(_service_identity_stats)
+
+
+def _get_identity_version(bucket):
+    """Internal function that returns the version of the service
+       identity that is in the object store, or None if this has
+       not been set
+    """
+    from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+    try:
+        return _ObjectStore.get_string_object(bucket, _identity_version_key)
+    except:
+        return None
+
+
+def _bump_identity_version(bucket):
+    """Internal function that sets a new version of the service
+       identity in the object store. This must be called whenever the
+       keys or certificates of the service are written, so that every
+       process stops using its cached copy of the old identity
+    """
+    from Acquire.ObjectStore import ObjectStore as _ObjectStore
+    from Acquire.ObjectStore import create_uid as _create_uid
+
+    version = _create_uid()
+    _ObjectStore.set_string_object(bucket, _identity_version_key, version)
+
+    return version
+
+
+def _get_service_identity(service_info, service_password):
+    """Internal function that returns the Service object, with private
+       access, that is encoded in 'service_info'. This is decrypted
+       using 'service_password' only if the identity version in the
+       object store has changed since it was last decrypted
+    """
+    from Acquire.Service import Service as _Service
+
+    service_uid = service_info.get("uid", "STAGE1")
+
+    if service_uid == "STAGE1":
+        return _Service.from_data(service_info, service_password)
+
+    from Acquire.Service import get_service_account_bucket as \
+        _get_service_account_bucket
+
+    bucket = _get_service_account_bucket()
+    version = _get_identity_version(bucket)
+
+    if version is None:
+        version = _bump_identity_version(bucket)
+
+    # the data are also checked, in case 'service_info' was loaded
+    # before the version was changed
+    from hashlib import sha256 as _sha256
+    digest = _sha256(_json.dumps(service_info, sort_keys=True).encode(
+                                                    "utf-8")).hexdigest()
+
+    with _cache_lock:
+        try:
+            (cached_version, cached_digest,
+             service) = _service_identities[service_uid]
+        except KeyError:
+            cached_version = None
+            cached_digest = None
+
+        if cached_version == version and cached_digest == digest:
+            _service_identity_stats["hits"] += 1
+            return service
+
+    service = _Service.from_data(service_info, service_password)
+
+    with _cache_lock:
+        _service_identity_stats["decrypts"] += 1
+        _service_identities[service_uid] = (version, digest, service)
+
+    return service
 
 
 # Cache this function as the data will rarely change, and this
 # will prevent too many runs to the ObjectStore
-@_cached(_cache_serviceinfo_data)
+@_cached(_cache_serviceinfo_data, lock=_cache_lock)
 def _get_this_service_data():
     """Internal function that loads up the service info data from
        the object store.
@@ -253,6 +366,7 @@ def setup_this_service(service_type, canonical_url, registry_uid,
     service = _Service.from_data(service_data, service_password)
     # now it is ok, save this data to the object store
     _ObjectStore.set_object_from_json(bucket, _service_key, service_data)
+    _bump_identity_version(bucket)
 
     mutex.unlock()
 
@@ -333,7 +447,7 @@ def add_admin_user(service, account_uid, authorisation=None):
     _cache_adminusers.clear()
 
 
-@_cached(_cache_adminusers)
+@_cached(_cache_adminusers, lock=_cache_lock)
 def get_admin_users():
     """This function returns all of the admin_users data. This is a
        dictionary of the UIDs of all of the admin users
@@ -415,15 +529,16 @@ def _refresh_this_service_keys_and_certs(service_info, service_password):
 
     if service_info.last_key_update() == last_update:
         # no-one else has beaten us - write the updated keys to global state
-        _ObjectStore.set_object_from_json(bucket, _service_key,
-                                          service.to_data(service_password))
+        service_data = service.to_data(service_password)
+        _ObjectStore.set_object_from_json(bucket, _service_key, service_data)
+        _bump_identity_version(bucket)
 
     m.unlock()
 
     return service_data
 
 
-@_cached(_cache_service_info)
+@_cached(_cache_service_info, lock=_cache_lock)
 def get_this_service(need_private_access=False):
     """Return the service info object for this service. If private
        access is needed then this will decrypt and access the private
@@ -451,7 +566,7 @@ def get_this_service(need_private_access=False):
     try:
         from Acquire.Service import Service as _Service
         if service_password:
-            service = _Service.from_data(service_info, service_password)
+            service = _get_service_identity(service_info, service_password)
         else:
             service = _Service.from_data(service_info)
 
@@ -468,14 +583,14 @@ def get_this_service(need_private_access=False):
                                                             service_password)
 
         if need_private_access:
-            return _Service.from_data(service_info, service_password)
+            return _get_service_identity(service_info, service_password)
         else:
             return _Service.from_data(service_info)
     else:
         return service
 
 
-@_cached(_cache_service_account_uid)
+@_cached(_cache_service_account_uid, lock=_cache_lock)
 def get_service_user_account_uid(accounting_service_uid):
     """Return the UID of the financial Acquire.Accounting.Account
        that is held on the accounting service with UID
@@ -564,8 +679,17 @@ def create_service_user_account(service, accounting_service_url):
 def load_service_key_from_objstore(fingerprint):
     """This function will see if we have an old key with the requested
        fingerprint, and if so, we will try to load and return that
-       key from the object store
+       key from the object store. Loaded keys are cached, so each
+       old key is only loaded and decrypted once per process
     """
+    service = get_this_service(need_private_access=True)
+    cache_key = (service.uid(), fingerprint)
+
+    try:
+        return _old_service_keys[cache_key]
+    except KeyError:
+        pass
+
     from Acquire.ObjectStore import ObjectStore as _ObjectStore
     from Acquire.Service import get_service_account_bucket \
         as _get_service_account_bucket
@@ -595,8 +719,14 @@ def load_service_key_from_objstore(fingerprint):
             "Unable to load the key or certificate with fingerprint '%s': %s"
             % (fingerprint, error))
 
-    service = get_this_service(need_private_access=True)
-    return service.load_keys(keydata)[fingerprint]
+    keys = service.load_keys(keydata)
+
+    # the key file holds several keys, so cache all of them
+    for (key_fingerprint, key) in keys.items():
+        if key_fingerprint != "datetime":
+            _old_service_keys[(service.uid(), key_fingerprint)] = key
+
+    return keys[fingerprint]
 
 
 def save_service_keys_to_objstore(include_old_keys=False):
@@ -665,6 +795,7 @@ def refresh_service_keys_and_certs(service, force_refresh=False):
         _ObjectStore.set_object_from_json(bucket, _service_key,
                                           service.to_data(
                                               _get_service_password()))
+        _bump_identity_version(bucket)
 
     m.unlock()
 
@@ -7,35 +7,16 @@ based on permissions routed via the access service
 
 """
 
-from Acquire.Identity import ACLRule, ACLRules
+# objects from other modules that are also available from here
+_attributes = {"ACLRule": "Acquire.Identity",
+               "ACLRules": "Acquire.Identity"}
 
-from ._storage_service import *
-from ._errors import *
-from ._userdrives import *
-from ._filehandle import *
-from ._fileinfo import *
-from ._driveinfo import *
-from ._filemeta import *
-from ._parregistry import *
-from ._drivemeta import *
-from ._dirmeta import *
+_submodules = ["_storage_service", "_errors", "_userdrives", "_filehandle",
+               "_chunkstore", "_fileinfo", "_driveinfo", "_filemeta",
+               "_parregistry", "_drivemeta", "_dirmeta"]
 
-try:
-    if __IPYTHON__:
-        def _set_printer(C):
-            """Function to tell ipython to use __str__ if available"""
-            get_ipython().display_formatter.formatters['text/plain'].for_type(
-                C,
-                lambda obj, p, cycle: p.text(str(obj) if not cycle else '...')
-                )
+# the objects in this module are only imported when they are first
+# used, so that importing this module is fast
+from Acquire.Stubs import lazy_package as _lazy_package
 
-        import sys as _sys
-        import inspect as _inspect
-
-        _clsmembers = _inspect.getmembers(_sys.modules[__name__],
-                                          _inspect.isclass)
-
-        for _clsmember in _clsmembers:
-            _set_printer(_clsmember[1])
-except:
-    pass
+__getattr__, __dir__ = _lazy_package(__name__, _submodules, _attributes)
@@ -0,0 +1,259 @@
+
+__all__ = ["ChunkStore"]
+
+_chunkstore_root = "storage/chunkstore"
+
+# the maximum number of times to retry a compare-and-swap of the
+# reference count of a chunk before giving up
+_max_cas_attempts = 100
+
+
+def _get_meta_and_etag(bucket, key):
+    """Return the json-decoded metadata at 'key' together with its
+       etag, or (None, None) if there is no metadata at this key
+    """
+    from Acquire.ObjectStore import ObjectStore as _ObjectStore
+    import json as _json
+
+    try:
+        (data, etag) = _ObjectStore.get_object_and_etag(bucket, key)
+    except:
+        return (None, None)
+
+    return (_json.loads(data.decode("utf-8")), etag)
+
+
+def _encode(meta):
+    """Return the passed metadata encoded as json bytes"""
+    import json as _json
+    return _json.dumps(meta).encode("utf-8")
+
+
+class ChunkStore:
+    """This is a content-addressed store of chunks of file data, held
+       in a file bucket. Each drive has its own store, so that a chunk
+       can only be read or de-duplicated against by uploaders to the
+       drive that holds it (knowing the hash of a chunk in another
+       drive gives no access to it, nor reveals that it exists).
+       Each chunk is stored (compressed) once per drive, under
+       the sha256 hash of its uncompressed content, together with
+       metadata that holds a reference count of the number of file
+       versions that use the chunk. Chunked uploads that are
+       de-duplicated record the hash of each chunk (a manifest)
+       rather than storing the chunk data again. Reference counts
+       are updated using compare-and-swap, so can be updated
+       concurrently by many uploaders
+    """
+    @staticmethod
+    def hash_chunk(chunk):
+        """Return the hash used to address the passed (uncompressed)
+           chunk of data
+        """
+        from hashlib import sha256 as _sha256
+        return _sha256(chunk).hexdigest()
+
+    @staticmethod
+    def _meta_key(drive_uid, chunk_hash):
+        """Return the key for the metadata of the chunk with
+           hash 'chunk_hash' in the store of the drive with UID
+           'drive_uid', validating that the hash is sensible
+        """
+        chunk_hash = str(chunk_hash)
+        drive_uid = str(drive_uid)
+
+        if len(drive_uid) == 0 or "/" in drive_uid:
+            raise ValueError("Invalid drive UID '%s'" % drive_uid)
+
+        if len(chunk_hash) != 64 or \
+                chunk_hash.strip("0123456789abcdef") != "":
+            raise ValueError("Invalid chunk hash '%s'" % chunk_hash)
+
+        return "%s/%s/meta/%s" % (_chunkstore_root, drive_uid, chunk_hash)
+
+    @staticmethod
+    def get_chunk_metas(bucket, drive_uid, chunk_hashes):
+        """Return a dictionary of the metadata of all of the chunks
+           in 'chunk_hashes' that are in the store of the drive with
+           UID 'drive_uid'. Chunks that are
+           not in the store are not included
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        keys = {}
+        for chunk_hash in chunk_hashes:
+            keys[ChunkStore._meta_key(drive_uid, chunk_hash)] = chunk_hash
+
+        metas = _ObjectStore.get_objects_from_json(bucket=bucket,
+                                                   keys=list(keys.keys()))
+
+        result = {}
+        for (key, meta) in metas.items():
+            if meta["refcount"] > 0:
+                result[keys[key]] = meta
+
+        return result
+
+    @staticmethod
+    def add_reference(bucket, drive_uid, chunk_hash):
+        """Add a reference to the chunk with hash 'chunk_hash' in the
+           store of the drive with UID 'drive_uid', returning the
+           chunk's metadata, or None if this chunk is not in the
+           store (in which case it must be uploaded using 'add_chunk')
+        """
+        key = ChunkStore._meta_key(drive_uid, chunk_hash)
+
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        for _attempt in range(0, _max_cas_attempts):
+            (meta, etag) = _get_meta_and_etag(bucket, key)
+
+            if meta is None or meta["refcount"] <= 0:
+                return None
+
+            meta["refcount"] += 1
+
+            if _ObjectStore.set_object_if(bucket, key, _encode(meta),
+                                          etag) is not None:
+                return meta
+
+        from Acquire.Storage import StorageServiceError
+        raise StorageServiceError(
+            "Cannot add a reference to chunk '%s' as it is being "
+            "updated too often" % chunk_hash)
+
+    @staticmethod
+    def add_chunk(bucket, drive_uid, chunk_hash, chunk, checksum,
+                  compression):
+        """Add the passed 'chunk' of data, compressed using
+           'compression' (and with md5 'checksum'), to the store of
+           the drive with UID 'drive_uid' as the chunk with hash
+           'chunk_hash', adding a reference to the chunk. The chunk is
+           validated, so that its uncompressed content must hash to
+           'chunk_hash'. This returns the chunk's metadata
+        """
+        from Acquire.Crypto import Hash as _Hash
+        from Acquire.Storage import FileValidationError
+
+        key = ChunkStore._meta_key(drive_uid, chunk_hash)
+
+        check = _Hash.md5(chunk)
+
+        if check != checksum:
+            raise FileValidationError(
+                "Invalid checksum for chunk: %s versus %s" %
+                (check, checksum))
+
+        from Acquire.Client import uncompress as _uncompress
+        uncompressed = _uncompress(inputdata=chunk,
+                                   compression_type=compression)
+
+        check = ChunkStore.hash_chunk(uncompressed)
+
+        if check != chunk_hash:
+            raise FileValidationError(
+                "Invalid content hash for chunk: %s versus %s" %
+                (check, chunk_hash))
+
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import create_uid as _create_uid
+
+        # the data is written to a new key each time, so that a chunk
+        # being released cannot delete the data of a chunk being added
+        data_key = "%s/%s/data/%s/%s" % (_chunkstore_root, drive_uid,
+                                         chunk_hash,
+                                         _create_uid(short_uid=True))
+
+        new_meta = {"refcount": 1,
+                    "data_key": data_key,
+                    "filesize": len(chunk),
+                    "checksum": checksum,
+                    "compression": compression,
+                    "size": len(uncompressed)}
+
+        _ObjectStore.set_object(bucket, data_key, chunk)
+
+        for _attempt in range(0, _max_cas_attempts):
+            (meta, etag) = _get_meta_and_etag(bucket, key)
+
+            if meta is None:
+                if _ObjectStore.set_object_if(bucket, key, _encode(new_meta),
+                                              None) is not None:
+                    return new_meta
+            else:
+                # someone else has already stored this chunk
+                meta["refcount"] += 1
+
+                if _ObjectStore.set_object_if(bucket, key, _encode(meta),
+                                              etag) is not None:
+                    _ObjectStore.delete_object(bucket, data_key)
+                    return meta
+
+        _ObjectStore.delete_object(bucket, data_key)
+
+        from Acquire.Storage import StorageServiceError
+        raise StorageServiceError(
+            "Cannot add chunk '%s' as it is being updated too often" %
+            chunk_hash)
+
+    @staticmethod
+    def get_chunk(bucket, drive_uid, chunk_hash, meta=None):
+        """Return the (compressed) data of the chunk with hash
+           'chunk_hash' in the store of the drive with UID
+           'drive_uid', together with its metadata. The metadata
+           can be passed in if it has already been loaded
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        if meta is None:
+            key = ChunkStore._meta_key(drive_uid, chunk_hash)
+            meta = _ObjectStore.get_object_from_json(bucket, key)
+
+        return (_ObjectStore.get_object(bucket, meta["data_key"]), meta)
+
+    @staticmethod
+    def release(bucket, drive_uid, chunk_hash):
+        """Release a reference to the chunk with hash 'chunk_hash'
+           in the store of the drive with UID 'drive_uid'.
+           The chunk is deleted once there are no more references.
+           This returns whether or not the chunk was deleted
+        """
+        key = ChunkStore._meta_key(drive_uid, chunk_hash)
+
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        for _attempt in range(0, _max_cas_attempts):
+            (meta, etag) = _get_meta_and_etag(bucket, key)
+
+            if meta is None or meta["refcount"] <= 0:
+                return False
+
+            meta["refcount"] -= 1
+
+            if meta["refcount"] > 0:
+                if _ObjectStore.set_object_if(bucket, key, _encode(meta),
+                                              etag) is not None:
+                    return False
+            elif _ObjectStore.delete_object_if(bucket, key, etag):
+                _ObjectStore.delete_object(bucket, meta["data_key"])
+                return True
+
+        from Acquire.Storage import StorageServiceError
+        raise StorageServiceError(
+            "Cannot release chunk '%s' as it is being updated too often" %
+            chunk_hash)
+
+    @staticmethod
+    def release_all(bucket, drive_uid, chunk_hashes):
+        """Release a reference to each of the chunks in 'chunk_hashes'
+           in the store of the drive with UID 'drive_uid'
+           (e.g. from the manifest of a file version that is being
+           deleted). This returns the number of chunks deleted
+        """
+        ndeleted = 0
+
+        for chunk_hash in chunk_hashes:
+            if chunk_hash is not None:
+                if ChunkStore.release(bucket, drive_uid, chunk_hash):
+                    ndeleted += 1
+
+        return ndeleted
@@ -8,6 +8,32 @@ _fileinfo_root = "storage/file"
 _uploader_root = "storage/uploader"
 _downloader_root = "storage/downloader"
 
+# the number of seconds that a chunked uploader stays open. Uploaders
+# that are not closed by then are treated as abandoned, and the
+# references that they hold to chunks in the ChunkStore are released
+_uploader_lifetime = 7 * 24 * 3600
+
+# the number of FileInfo metadata objects read per bulk read
+# when listing the files in a drive
+_list_files_page_size = 100
+
+
+def _is_expired(data):
+    """Return whether or not the uploader described by 'data'
+       has expired
+    """
+    from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
+    from Acquire.ObjectStore import string_to_datetime \
+        as _string_to_datetime
+
+    try:
+        expires = _string_to_datetime(data["expires"])
+    except:
+        # uploaders opened before expiry was recorded never expire
+        return False
+
+    return expires <= _get_datetime_now()
+
 
 def _validate_file_upload(par, file_bucket, file_key, objsize, checksum):
     """Call this function to signify that the file associated with
@@ -238,21 +264,39 @@ class DriveInfo:
         from Acquire.Service import get_service_account_bucket \
             as _get_service_account_bucket
 
+        from Acquire.ObjectStore import get_datetime_now as _get_datetime_now
+        from Acquire.ObjectStore import datetime_to_string \
+            as _datetime_to_string
+        import datetime as _datetime
+
+        # release the chunks held by any abandoned uploaders
+        self._expire_uploaders()
+
         bucket = _get_service_account_bucket()
         key = "%s/%s/%s" % (_uploader_root, self._drive_uid, filemeta.uid())
 
+        expires = _get_datetime_now() + \
+            _datetime.timedelta(seconds=_uploader_lifetime)
+
+        # only uploaders who can read the drive can de-duplicate
+        # against the chunks that are already stored in the drive
         data = {"filename": filename,
                 "version": filemeta.uid(),
                 "filekey": fileinfo.latest_version()._file_key(),
-                "secret": uploader.secret()}
+                "secret": uploader.secret(),
+                "can_dedup": drive_acl.is_readable(),
+                "expires": _datetime_to_string(expires)}
 
         _ObjectStore.set_object_from_json(bucket, key, data)
 
         return (filemeta, uploader)
 
-    def close_uploader(self, file_uid, secret):
+    def close_uploader(self, file_uid, secret, num_chunks=None):
         """Close the uploader associated with the passed file_uid,
-           authenticated using the passed secret
+           authenticated using the passed secret. If 'num_chunks' is
+           passed then this verifies that exactly this number of
+           chunks have been uploaded. If any chunks are missing then
+           the uploader is left open so that they can be uploaded
         """
         from Acquire.ObjectStore import ObjectStore as _ObjectStore
         from Acquire.Service import get_service_account_bucket \
@@ -277,6 +321,12 @@ class DriveInfo:
                 "Invalid request - you do not have permission to "
                 "close this uploader")
 
+        if _is_expired(data):
+            self._abandon_uploader(file_uid)
+            raise PermissionError(
+                "Cannot close the uploader as it has expired. The "
+                "file will need to be uploaded again.")
+
         try:
             data2 = _ObjectStore.take_object_from_json(bucket, key)
         except:
@@ -298,7 +348,16 @@ class DriveInfo:
 
         file_key = data["filekey"]
         file_bucket = self._get_file_bucket(file_key)
-        fileinfo.close_uploader(file_bucket=file_bucket)
+
+        try:
+            fileinfo.close_uploader(file_bucket=file_bucket,
+                                    num_chunks=num_chunks)
+        except:
+            # restore the uploader so that the missing chunks
+            # can be uploaded and the uploader closed again
+            _ObjectStore.set_object_from_json(bucket, key, data)
+            raise
+
         fileinfo.save()
 
     def close_downloader(self, downloader_uid, file_uid, secret):
@@ -335,13 +394,103 @@ class DriveInfo:
         except:
             pass
 
-    def upload_chunk(self, file_uid, chunk_index, secret, chunk, checksum):
-        """Upload a chunk of the file with UID 'file_uid'. This is the
-           chunk at index 'chunk_idx', which is set equal to 'chunk'
-           (validated with 'checksum'). The passed secret is used to
-           authenticate this upload. The secret should be the
-           multi_md5 has of the shared secret with the concatenated
-           drive_uid, file_uid and chunk_index
+    def abort_uploader(self, file_uid, secret):
+        """Abort the uploader associated with the passed file_uid,
+           authenticated using the passed secret. This discards all
+           of the chunks that have been uploaded, releasing their
+           references to chunks in the ChunkStore. The file will
+           need to be uploaded again
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.ObjectStore import get_datetime_now_to_string \
+            as _get_datetime_now_to_string
+        from Acquire.Service import get_service_account_bucket \
+            as _get_service_account_bucket
+
+        bucket = _get_service_account_bucket()
+        key = "%s/%s/%s" % (_uploader_root, self._drive_uid, file_uid)
+
+        try:
+            data = _ObjectStore.get_object_from_json(bucket, key)
+        except:
+            data = None
+
+        if data is None:
+            # the uploader has already been closed or aborted
+            return
+
+        if secret != data["secret"]:
+            raise PermissionError(
+                "Invalid request - you do not have permission to "
+                "abort this uploader")
+
+        # expire the uploader now, so that no more chunks can be
+        # uploaded while it is being discarded
+        data["expires"] = _get_datetime_now_to_string()
+        _ObjectStore.set_object_from_json(bucket, key, data)
+
+        self._abandon_uploader(file_uid)
+
+    def _abandon_uploader(self, file_uid):
+        """Discard the chunks uploaded by the (expired or aborted)
+           uploader of the file with UID 'file_uid', releasing the
+           references they hold to chunks in the ChunkStore, and
+           then remove the uploader
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Service import get_service_account_bucket \
+            as _get_service_account_bucket
+
+        bucket = _get_service_account_bucket()
+        key = "%s/%s/%s" % (_uploader_root, self._drive_uid, file_uid)
+
+        try:
+            data = _ObjectStore.get_object_from_json(bucket, key)
+        except:
+            data = None
+
+        if data is None:
+            return
+
+        file_key = data["filekey"]
+        file_bucket = self._get_file_bucket(file_key)
+
+        keys = _ObjectStore.get_all_object_names(
+                                bucket=file_bucket,
+                                prefix="%s/meta/" % file_key)
+
+        for meta_key in keys:
+            self._release_chunk(file_bucket, file_key,
+                                int(meta_key.split("/")[-1]))
+
+        # the uploader is removed last, so that chunks that are
+        # uploaded while this is running can see it has expired
+        try:
+            _ObjectStore.delete_object(bucket, key)
+        except:
+            pass
+
+    def _expire_uploaders(self):
+        """Abandon all of the uploaders to this drive that have
+           expired without being closed
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Service import get_service_account_bucket \
+            as _get_service_account_bucket
+
+        bucket = _get_service_account_bucket()
+        prefix = "%s/%s/" % (_uploader_root, self._drive_uid)
+
+        uploaders = _ObjectStore.get_all_objects_from_json(bucket, prefix)
+
+        for (key, data) in uploaders.items():
+            if _is_expired(data):
+                self._abandon_uploader(key.split("/")[-1])
+
+    def _get_uploader_data(self, file_uid):
+        """Return the data for the active uploader of the file with
+           UID 'file_uid'. This raises a PermissionError if the
+           uploader has expired
         """
         from Acquire.ObjectStore import ObjectStore as _ObjectStore
         from Acquire.Service import get_service_account_bucket \
@@ -350,6 +499,117 @@ class DriveInfo:
         bucket = _get_service_account_bucket()
         key = "%s/%s/%s" % (_uploader_root, self._drive_uid, file_uid)
         data = _ObjectStore.get_object_from_json(bucket, key)
+
+        if _is_expired(data):
+            self._abandon_uploader(file_uid)
+            raise PermissionError(
+                "Cannot upload to this file as the uploader has "
+                "expired. The file will need to be uploaded again.")
+
+        return data
+
+    def _check_uploader_open(self, file_uid, file_bucket, file_key,
+                             chunk_indexes):
+        """Check that the uploader of the file with UID 'file_uid' has
+           not expired while the chunks at 'chunk_indexes' were being
+           added. If it has, then these chunks are released (as they
+           may have been missed when the uploader was abandoned) and
+           a PermissionError is raised
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        from Acquire.Service import get_service_account_bucket \
+            as _get_service_account_bucket
+
+        bucket = _get_service_account_bucket()
+        key = "%s/%s/%s" % (_uploader_root, self._drive_uid, file_uid)
+
+        try:
+            data = _ObjectStore.get_object_from_json(bucket, key)
+        except:
+            data = None
+
+        if data is None or not _is_expired(data):
+            return
+
+        for chunk_index in chunk_indexes:
+            self._release_chunk(file_bucket, file_key, chunk_index)
+
+        raise PermissionError(
+            "Cannot upload to this file as the uploader has "
+            "expired. The file will need to be uploaded again.")
+
+    def _release_chunk(self, file_bucket, file_key, chunk_index):
+        """Remove the chunk at 'chunk_index' of the file at 'file_key',
+           releasing its reference to the chunk in the ChunkStore.
+           The metadata is removed using compare-and-swap, so that
+           the chunk is only released once, however many abandoners
+           are running
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        import json as _json
+
+        meta_key = "%s/meta/%d" % (file_key, chunk_index)
+
+        try:
+            (meta, etag) = _ObjectStore.get_object_and_etag(file_bucket,
+                                                            meta_key)
+        except:
+            return
+
+        if not _ObjectStore.delete_object_if(file_bucket, meta_key, etag):
+            # someone else is releasing this chunk
+            return
+
+        meta = _json.loads(meta.decode("utf-8"))
+
+        if "chunk_hash" in meta:
+            from Acquire.Storage import ChunkStore as _ChunkStore
+            _ChunkStore.release(file_bucket, self._drive_uid,
+                                meta["chunk_hash"])
+        else:
+            data_key = "%s/data/%d" % (file_key, chunk_index)
+            try:
+                _ObjectStore.delete_object(file_bucket, data_key)
+            except:
+                pass
+
+    def _set_chunk_meta(self, file_bucket, file_key, chunk_index, meta,
+                        old_meta=None):
+        """Set the metadata for the chunk at 'chunk_index' of the file
+           at 'file_key' to 'meta', releasing the chunk that was
+           previously at this index (described by 'old_meta')
+        """
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        meta_key = "%s/meta/%d" % (file_key, chunk_index)
+        _ObjectStore.set_object_from_json(file_bucket, meta_key, meta)
+
+        if old_meta is None:
+            return
+
+        if "chunk_hash" in old_meta:
+            if old_meta["chunk_hash"] != meta.get("chunk_hash", None):
+                from Acquire.Storage import ChunkStore as _ChunkStore
+                _ChunkStore.release(file_bucket, self._drive_uid,
+                                    old_meta["chunk_hash"])
+        elif "chunk_hash" in meta:
+            data_key = "%s/data/%d" % (file_key, chunk_index)
+            _ObjectStore.delete_object(file_bucket, data_key)
+
+    def upload_chunk(self, file_uid, chunk_index, secret, chunk, checksum,
+                     compression="bz2", chunk_hash=None):
+        """Upload a chunk of the file with UID 'file_uid'. This is the
+           chunk at index 'chunk_idx', which is set equal to 'chunk'
+           (validated with 'checksum'), and which has been compressed
+           using 'compression' (recorded in the chunk's metadata so
+           that it can be decompressed when read). The passed secret is used to
+           authenticate this upload. The secret should be the
+           multi_md5 has of the shared secret with the concatenated
+           drive_uid, file_uid and chunk_index. If 'chunk_hash' is
+           passed then the chunk is stored in the drive's
+           de-duplicated ChunkStore under this (content) hash
+        """
+        data = self._get_uploader_data(file_uid)
         shared_secret = data["secret"]
 
         from Acquire.Crypto import Hash as _Hash
@@ -363,6 +623,46 @@ class DriveInfo:
                 "Invalid chunked upload secret. You do not have permission "
                 "to upload chunks to this file!")
 
+        file_key = data["filekey"]
+        chunk_index = int(chunk_index)
+
+        file_bucket = self._get_file_bucket(file_key)
+        data_key = "%s/data/%d" % (file_key, chunk_index)
+        meta_key = "%s/meta/%d" % (file_key, chunk_index)
+
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+
+        if chunk_hash is not None:
+            try:
+                old_meta = _ObjectStore.get_object_from_json(file_bucket,
+                                                             meta_key)
+            except:
+                old_meta = None
+
+            if old_meta is not None and \
+                    old_meta.get("chunk_hash", None) == chunk_hash:
+                # this chunk has already been uploaded
+                return
+
+            from Acquire.Storage import ChunkStore as _ChunkStore
+            chunk_meta = _ChunkStore.add_chunk(file_bucket,
+                                               drive_uid=self._drive_uid,
+                                               chunk_hash=chunk_hash,
+                                               chunk=chunk,
+                                               checksum=checksum,
+                                               compression=str(compression))
+
+            meta = {"filesize": chunk_meta["filesize"],
+                    "checksum": chunk_meta["checksum"],
+                    "compression": chunk_meta["compression"],
+                    "chunk_hash": chunk_hash}
+
+            self._set_chunk_meta(file_bucket, file_key, chunk_index,
+                                 meta, old_meta)
+            self._check_uploader_open(file_uid, file_bucket, file_key,
+                                      [chunk_index])
+            return
+
         # validate the data checksum
         check = _Hash.md5(chunk)
 
@@ -374,18 +674,90 @@ class DriveInfo:
 
         meta = {"filesize": len(chunk),
                 "checksum": checksum,
-                "compression": "bz2"}
+                "compression": str(compression)}
 
-        file_key = data["filekey"]
-        chunk_index = int(chunk_index)
+        _ObjectStore.set_object_from_json(file_bucket, meta_key, meta)
+        _ObjectStore.set_object(file_bucket, data_key, chunk)
 
+    def dedup_chunks(self, file_uid, secret, chunk_hashes):
+        """De-duplicate the chunks of the file with UID 'file_uid'
+           that is being uploaded. 'chunk_hashes' is a dictionary
+           of the (content) hash of the chunk at each index. Every
+           chunk that is already in the drive's ChunkStore is
+           recorded as the chunk at that index without needing to
+           be uploaded. This returns the sorted list of indicies of
+           the chunks that are not in the ChunkStore, and so which
+           must be uploaded (using 'upload_chunk' with the chunk hash).
+           Uploaders who cannot read the drive are told that every
+           chunk is missing, so that they can neither use nor learn
+           about chunks that they haven't uploaded themselves.
+           The passed secret is the shared secret of the uploader
+        """
+        data = self._get_uploader_data(file_uid)
+
+        if secret != data["secret"]:
+            raise PermissionError(
+                "Invalid chunked upload secret. You do not have permission "
+                "to upload chunks to this file!")
+
+        file_key = data["filekey"]
         file_bucket = self._get_file_bucket(file_key)
-        data_key = "%s/data/%d" % (file_key, chunk_index)
-        meta_key = "%s/meta/%d" % (file_key, chunk_index)
+
+        chunk_hashes = {int(index): str(chunk_hash)
+                        for (index, chunk_hash) in chunk_hashes.items()}
+
+        if not data.get("can_dedup", False):
+            return sorted(chunk_hashes.keys())
 
         from Acquire.ObjectStore import ObjectStore as _ObjectStore
-        _ObjectStore.set_object_from_json(file_bucket, meta_key, meta)
-        _ObjectStore.set_object(file_bucket, data_key, chunk)
+        from Acquire.Storage import ChunkStore as _ChunkStore
+
+        meta_keys = {}
+        for index in chunk_hashes.keys():
+            meta_keys[index] = "%s/meta/%d" % (file_key, index)
+
+        old_metas = _ObjectStore.get_objects_from_json(
+                                file_bucket, list(meta_keys.values()))
+
+        stored = _ChunkStore.get_chunk_metas(file_bucket, self._drive_uid,
+                                             set(chunk_hashes.values()))
+
+        missing = []
+        added = []
+
+        for (index, chunk_hash) in sorted(chunk_hashes.items()):
+            old_meta = old_metas.get(meta_keys[index], None)
+
+            if old_meta is not None and \
+                    old_meta.get("chunk_hash", None) == chunk_hash:
+                # this chunk has already been uploaded
+                continue
+
+            chunk_meta = None
+
+            if chunk_hash in stored:
+                chunk_meta = _ChunkStore.add_reference(file_bucket,
+                                                       self._drive_uid,
+                                                       chunk_hash)
+
+            if chunk_meta is None:
+                missing.append(index)
+                continue
+
+            meta = {"filesize": chunk_meta["filesize"],
+                    "checksum": chunk_meta["checksum"],
+                    "compression": chunk_meta["compression"],
+                    "chunk_hash": chunk_hash}
+
+            self._set_chunk_meta(file_bucket, file_key, index,
+                                 meta, old_meta)
+            added.append(index)
+
+        if len(added) > 0:
+            self._check_uploader_open(file_uid, file_bucket, file_key,
+                                      added)
+
+        return missing
 
     def download_chunk(self, file_uid, downloader_uid, chunk_index, secret):
         """Download a chunk of the file with UID 'file_uid' at chunk
@@ -468,6 +840,14 @@ class DriveInfo:
             # we should be able to read this metadata...
             meta = _ObjectStore.get_object_from_json(file_bucket, meta_key)
 
+        if "chunk_hash" in meta:
+            # this chunk is held in the de-duplicated chunk store
+            from Acquire.Storage import ChunkStore as _ChunkStore
+            (chunk, _) = _ChunkStore.get_chunk(file_bucket,
+                                               self._drive_uid,
+                                               meta["chunk_hash"])
+            return (chunk, meta, num_chunks)
+
         chunk = _ObjectStore.get_object(file_bucket, data_key)
 
         return (chunk, meta, num_chunks)
@@ -720,14 +1100,15 @@ class DriveInfo:
 
     def list_files(self, authorisation=None, par=None,
                    identifiers=None, include_metadata=False,
-                   dir=None, filename=None):
+                   dir=None, filename=None, max_results=None):
         """Return the list of FileMeta data for the files contained
            in this Drive. The passed authorisation is needed in case
            the list contents of this drive is not public.
 
            If 'dir' is specified, then only search for files in 'dir'.
            If 'filename' is specified, then only search for the
-           file called 'filename'
+           file called 'filename'. If 'max_results' is specified,
+           then only (up to) this number of files are returned
         """
         (drive_acl, identifiers) = self._resolve_acl(
                                         authorisation=authorisation,
@@ -780,48 +1161,72 @@ class DriveInfo:
             key = "%s/%s/%s" % (_fileinfo_root, self._drive_uid,
                                 encoded_dir)
 
-            all_names = _ObjectStore.get_all_object_names(metadata_bucket,
-                                                          key)
-
-            names = []
+            all_names = _ObjectStore.iter_object_names(metadata_bucket,
+                                                       key)
 
             dir = "%s/" % dir
 
-            for name in all_names:
-                decoded_name = _encoded_to_string(name.split("/")[-1])
-
-                if decoded_name.startswith(dir):
-                    names.append(name)
+            names = (name for name in all_names
+                     if _encoded_to_string(
+                            name.split("/")[-1]).startswith(dir))
         else:
             key = "%s/%s" % (_fileinfo_root, self._drive_uid)
-            names = _ObjectStore.get_all_object_names(metadata_bucket, key)
+            names = _ObjectStore.iter_object_names(metadata_bucket, key)
 
         files = []
 
+        if max_results is not None:
+            max_results = int(max_results)
+
+            if max_results <= 0:
+                return files
+
         if include_metadata:
             # we need to load all of the metadata info for this file to
             # return to the user
+            from itertools import islice as _islice
             from Acquire.Storage import FileInfo as _FileInfo
 
-            for name in names:
-                try:
-                    data = _ObjectStore.get_object_from_json(metadata_bucket,
-                                                             name)
-                    fileinfo = _FileInfo.from_data(data,
-                                                   identifiers=identifiers,
-                                                   upstream=drive_acl)
-                    filemeta = fileinfo.get_filemeta()
-                    file_acl = filemeta.acl()
-
-                    if file_acl.is_readable() or file_acl.is_writeable():
-                        files.append(filemeta)
-                except:
-                    pass
+            names = iter(names)
+
+            while True:
+                # fetch the metadata a page at a time using bulk reads,
+                # stopping once we have enough readable files
+                page = list(_islice(names, _list_files_page_size))
+
+                if len(page) == 0:
+                    break
+
+                objects = _ObjectStore.get_objects_from_json(
+                                                metadata_bucket, page)
+
+                for name in page:
+                    try:
+                        data = objects[name]
+                        fileinfo = _FileInfo.from_data(
+                                                data,
+                                                identifiers=identifiers,
+                                                upstream=drive_acl)
+                        filemeta = fileinfo.get_filemeta()
+                        file_acl = filemeta.acl()
+
+                        if file_acl.is_readable() or \
+                                file_acl.is_writeable():
+                            files.append(filemeta)
+                    except:
+                        pass
+
+                    if max_results is not None and \
+                            len(files) >= max_results:
+                        return files
         else:
             for name in names:
                 filename = _encoded_to_string(name.split("/")[-1])
                 files.append(_FileMeta(filename=filename))
 
+                if max_results is not None and len(files) >= max_results:
+                    break
+
         return files
 
     def list_versions(self, filename, authorisation=None,
@@ -5,55 +5,148 @@ __all__ = ["FileHandle"]
 _magic_dict = {
     b"\x1f\x8b\x08": "gz",
     b"\x42\x5a\x68": "bz2",
-    b"\x50\x4b\x03\x04": "zip"
+    b"\x50\x4b\x03\x04": "zip",
+    b"\xfd\x37\x7a\x58\x5a\x00": "xz",
+    b"\x28\xb5\x2f\xfd": "zstd",
+    b"\x04\x22\x4d\x18": "lz4"
     }
 
 
 _max_magic_len = max(len(x) for x in _magic_dict)
 
 
-def _should_compress(filename, filesize):
-    """Return whether or not the passed file is worth compressing.
-       It is not worth compressing very small files (<128 bytes) or
-       already-compressed files
+# the size of each window of the file that is sampled to estimate
+# how well the file will compress
+_sample_window_size = 65536
+
+# the number of windows (spread evenly through the file) that are sampled
+_num_sample_windows = 4
+
+# the minimum fractional saving in size (estimated from the samples)
+# needed for a file to be compressed. Files that will shrink by less
+# than this are stored uncompressed, as it is not worth the time
+# needed to compress and decompress them
+_min_compression_saving = 0.05
+
+
+def _sample_compression_ratio(filename, filesize):
+    """Estimate the compression ratio (compressed size divided by
+       original size) of the passed file by quickly compressing
+       a few windows spread evenly through the file
 
        Args:
             filename (str): Filename
             filesize (int): Size of file in bytes
        Returns:
-            bool: True if file should be compressed, else
-            False
+            float: Estimated compression ratio
+    """
+    import zlib as _zlib
+
+    window = _sample_window_size
+    nwindows = _num_sample_windows
+
+    if filesize <= window * nwindows:
+        offsets = [0]
+        window = filesize
+    else:
+        step = (filesize - window) // (nwindows - 1)
+        offsets = [i * step for i in range(0, nwindows)]
+
+    original = 0
+    compressed = 0
+
+    with open(filename, "rb") as FILE:
+        for offset in offsets:
+            FILE.seek(offset)
+            data = FILE.read(window)
+            original += len(data)
+            compressed += len(_zlib.compress(data, 1))
+
+    if original == 0:
+        return 1.0
+    else:
+        return float(compressed) / original
+
+
+def _compression_strategy(filename, filesize, min_saving=None):
+    """Return the strategy to use to compress the passed file,
+       together with the estimated compression ratio (or None if
+       this was not measured). The strategy is one of;
+
+       "too_small" - very small files (<128 bytes) are not compressed
+       "precompressed" - already-compressed files are not compressed
+       "incompressible" - files estimated (by sampling) to shrink by
+                          less than 'min_saving' are not compressed
+       "compress" - the file should be compressed
+
+       Args:
+            filename (str): Filename
+            filesize (int): Size of file in bytes
+            min_saving (float, default=None): Minimum fractional saving
+            needed to compress the file
+       Returns:
+            tuple: (strategy, ratio)
     """
     if filesize < 128:
-        return False
+        return ("too_small", None)
 
     with open(filename, "rb") as FILE:
         file_start = FILE.read(_max_magic_len)
 
     for magic in _magic_dict.keys():
         if file_start.startswith(magic):
-            return False
+            return ("precompressed", None)
+
+    if min_saving is None:
+        min_saving = _min_compression_saving
+
+    ratio = _sample_compression_ratio(filename=filename, filesize=filesize)
+
+    if 1.0 - ratio < min_saving:
+        return ("incompressible", ratio)
+    else:
+        return ("compress", ratio)
 
-    return True
 
+def _should_compress(filename, filesize, min_saving=None):
+    """Return whether or not the passed file is worth compressing.
+       It is not worth compressing very small files (<128 bytes),
+       already-compressed files, or files that, from sampling,
+       are estimated to shrink by less than 'min_saving'
 
-def _bz2compress(inputfile, outputfile=None):
-    """Compress 'inputfile', writing the output to 'outputfile'
-       If 'outputfile' is None, then this will create a new filename
-       in the current directory for the file. This returns
-       the filename for the compressed file
+       Args:
+            filename (str): Filename
+            filesize (int): Size of file in bytes
+            min_saving (float, default=None): Minimum fractional saving
+            needed to compress the file
+       Returns:
+            bool: True if file should be compressed, else
+            False
+    """
+    (strategy, _) = _compression_strategy(filename=filename,
+                                          filesize=filesize,
+                                          min_saving=min_saving)
+    return strategy == "compress"
+
+
+def _compress_file(inputfile, outputfile=None, compression_type=None):
+    """Compress 'inputfile' using 'compression_type', writing the
+       output to 'outputfile'. If 'outputfile' is None, then this will
+       create a new filename in the current directory for the file.
+       This returns the filename for the compressed file
 
        Args:
             inputfile (str): File to compress
             outputfile (str, default=None): Name for compressed
             file
+            compression_type (str, default=None): Compression type
        Returns:
             str: Filename of compressed file
 
     """
     from Acquire.Client import compress as _compress
     return _compress(inputfile=inputfile, outputfile=outputfile,
-                     compression_type="bz2")
+                     compression_type=compression_type)
 
 
 class FileHandle:
@@ -72,11 +165,17 @@ class FileHandle:
             compress (bool, default=True): Should files be compressed
             local_cutoff (int, default=None): Size of file to be held
             locally by the handle (bytes)
+            compression_type (str, default=None): Compression type
+            to use (default is 'get_default_compression_type()')
+            min_compression_saving (float, default=None): Minimum
+            fractional saving (estimated by sampling the file) needed
+            to compress the file
 
     """
     def __init__(self, filename=None, remote_filename=None,
                  aclrules=None, drive_uid=None,
-                 compress=True, local_cutoff=None):
+                 compress=True, local_cutoff=None, compression_type=None,
+                 min_compression_saving=None):
         """Construct a handle for the local file 'filename'. This will
            create the initial version of the file that can be uploaded
            to the storage service. If the file is less than
@@ -87,6 +186,8 @@ class FileHandle:
         self._local_filedata = None
         self._compression = None
         self._compressed_filename = None
+        self._compression_strategy = None
+        self._compression_ratio = None
         self._drive_uid = drive_uid
         self._aclrules = None
 
@@ -109,28 +210,42 @@ class FileHandle:
 
             (filesize, cksum) = _get_filesize_and_checksum(filename=filename)
 
-            if compress and _should_compress(filename=filename,
-                                             filesize=filesize):
-                import bz2 as _bz2
+            if compress:
+                (self._compression_strategy, self._compression_ratio) = \
+                    _compression_strategy(filename=filename,
+                                          filesize=filesize,
+                                          min_saving=min_compression_saving)
+            else:
+                self._compression_strategy = "disabled"
+
+            if self._compression_strategy == "compress":
+                if compression_type is None:
+                    from Acquire.Client import get_default_compression_type \
+                        as _get_default_compression_type
+                    compression_type = _get_default_compression_type()
+
                 if filesize < local_cutoff:
                     # this is not big, so better to compress in memory
                     from Acquire.Access import get_size_and_checksum \
                         as _get_size_and_checksum
+                    from Acquire.Client import compress as _compress
                     data = open(filename, "rb").read()
-                    data = _bz2.compress(data)
+                    data = _compress(inputdata=data,
+                                     compression_type=compression_type)
                     (filesize, cksum) = _get_size_and_checksum(data=data)
                     self._local_filedata = data
-                    self._compression = "bz2"
+                    self._compression = compression_type
                 else:
                     # this is a bigger file, so compress on disk
                     try:
-                        self._compressed_filename = _bz2compress(
-                                                        inputfile=filename)
+                        self._compressed_filename = _compress_file(
+                                            inputfile=filename,
+                                            compression_type=compression_type)
                     except:
                         pass
 
                     if self._compressed_filename is not None:
-                        self._compression = "bz2"
+                        self._compression = compression_type
                         (filesize, cksum) = _get_filesize_and_checksum(
                                             filename=self._compressed_filename)
             elif filesize < local_cutoff:
@@ -193,6 +308,27 @@ class FileHandle:
         """
         return self._compression
 
+    def compression_strategy(self):
+        """Return the strategy that was chosen when deciding whether
+           or not to compress this file (see '_compression_strategy'),
+           e.g. "compress", "incompressible", "precompressed",
+           "too_small" or "disabled"
+
+           Returns:
+                str: Compression strategy
+        """
+        return self._compression_strategy
+
+    def sampled_compression_ratio(self):
+        """Return the compression ratio (compressed size divided by
+           original size) that was estimated by sampling the file,
+           or None if the file was not sampled
+
+           Returns:
+                float: Estimated compression ratio
+        """
+        return self._compression_ratio
+
     def is_localdata(self):
         """Return whether or not this file is so small that the data
            is held in memory
@@ -218,8 +354,9 @@ class FileHandle:
         """
         if decompress and self.is_compressed():
             if self._local_filedata is not None:
-                import bz2 as _bz2
-                return _bz2.decompress(self._local_filedata)
+                from Acquire.Client import uncompress as _uncompress
+                return _uncompress(inputdata=self._local_filedata,
+                                   compression_type=self._compression)
             else:
                 return None
         else:
@@ -327,6 +464,12 @@ class FileHandle:
             if self._compression is not None:
                 data["compression"] = self._compression
 
+            if self._compression_strategy is not None:
+                data["compression_strategy"] = self._compression_strategy
+
+            if self._compression_ratio is not None:
+                data["compression_ratio"] = self._compression_ratio
+
         return data
 
     @staticmethod
@@ -355,6 +498,12 @@ class FileHandle:
             if "compression" in data:
                 f._compression = data["compression"]
 
+            if "compression_strategy" in data:
+                f._compression_strategy = data["compression_strategy"]
+
+            if "compression_ratio" in data:
+                f._compression_ratio = float(data["compression_ratio"])
+
             if "aclrules" in data:
                 from Acquire.Storage import ACLRules as _ACLRules
                 f._aclrules = _ACLRules.from_data(data["aclrules"])
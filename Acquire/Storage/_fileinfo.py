@@ -46,6 +46,7 @@ class VersionInfo:
 
             self._filesize = 0
             self._nchunks = 0
+            self._is_deduplicated = False
             self._checksum = None
             self._compression = None
             self._datetime = _get_datetime_now()
@@ -88,6 +89,7 @@ class VersionInfo:
             self._compression = compression
             self._aclrules = aclrules
             self._nchunks = None
+            self._is_deduplicated = False
 
         else:
             self._filesize = None
@@ -127,10 +129,12 @@ class VersionInfo:
         else:
             return False
 
-    def close_uploader(self, file_bucket):
-        """Close the uploader. This will count the number of chunks,
-           and will also create a checksum of all of the chunk's
-           checksums
+    def close_uploader(self, file_bucket, num_chunks=None):
+        """Close the uploader. This will verify that every chunk
+           from 0 to the last chunk has been uploaded (and, if
+           'num_chunks' is passed, that this is the number of chunks),
+           and will then count the number of chunks and create a
+           checksum of all of the chunk's checksums
         """
         if not self.is_uploading():
             return
@@ -146,24 +150,75 @@ class VersionInfo:
             idx = int(key.split("/")[-1])
             meta_keys[idx] = key
 
-        nchunks = len(keys)
+        nchunks = len(meta_keys)
+
+        if num_chunks is not None:
+            nchunks = max(nchunks, int(num_chunks))
+
+        missing = [i for i in range(0, nchunks) if i not in meta_keys]
+
+        if len(missing) > 0 or nchunks != len(meta_keys):
+            from Acquire.Storage import FileValidationError
+            raise FileValidationError(
+                "Cannot close the uploader as the chunked upload is "
+                "incomplete. Missing chunks %s (expected %d chunks, "
+                "received %d)" % (missing[0:10], nchunks, len(meta_keys)))
+
         size = 0
-        from Acquire.Crypto import Hash as _Hash
         from hashlib import md5 as _md5
         md5 = _md5()
 
+        metas = _ObjectStore.get_objects_from_json(
+                    bucket=file_bucket, keys=list(meta_keys.values()))
+
+        manifest = []
+
         for i in range(0, nchunks):
-            key = meta_keys[i]
-            meta = _ObjectStore.get_object_from_json(
-                            bucket=file_bucket, key="%s/%d" % (meta_root, i))
+            meta = metas[meta_keys[i]]
 
             size += meta["filesize"]
             md5.update(meta["checksum"].encode("utf-8"))
+            manifest.append(meta.get("chunk_hash", None))
+
+        if any(chunk_hash is not None for chunk_hash in manifest):
+            # record the manifest of the hashes of each chunk in the
+            # ChunkStore, so that they can be released when this
+            # version is deleted
+            _ObjectStore.set_object_from_json(
+                            bucket=file_bucket,
+                            key="%s/manifest" % self._file_key(),
+                            data={"chunks": manifest})
+            self._is_deduplicated = True
 
         self._filesize = size
         self._checksum = md5.hexdigest()
         self._nchunks = nchunks
 
+    def is_deduplicated(self):
+        """Return whether or not (some of) the chunks of this version
+           are held in the de-duplicated ChunkStore
+        """
+        if self.is_null():
+            return False
+        else:
+            return self._is_deduplicated
+
+    def chunk_manifest(self, file_bucket):
+        """Return the manifest of this version, which is the list of
+           the hash of each chunk in the ChunkStore (or None for
+           chunks that are not held in the ChunkStore). This returns
+           None if this version is not de-duplicated
+        """
+        if not self.is_deduplicated():
+            return None
+
+        from Acquire.ObjectStore import ObjectStore as _ObjectStore
+        data = _ObjectStore.get_object_from_json(
+                            bucket=file_bucket,
+                            key="%s/manifest" % self._file_key())
+
+        return data["chunks"]
+
     def num_chunks(self):
         """Return the number of chunks used for this file. This is
            equal to 1 for unchunked files, or for files that
@@ -262,6 +317,9 @@ class VersionInfo:
             if self._nchunks is not None:
                 data["nchunks"] = int(self._nchunks)
 
+            if self._is_deduplicated:
+                data["is_deduplicated"] = True
+
             if self._aclrules is not None:
                 data["aclrules"] = self._aclrules.to_data()
 
@@ -305,6 +363,8 @@ class VersionInfo:
             else:
                 v._nchunks = None
 
+            v._is_deduplicated = bool(data.get("is_deduplicated", False))
+
         return v
 
 
@@ -542,14 +602,16 @@ class FileInfo:
         else:
             return {self._latest_version.datetime(), self._latest_version}
 
-    def close_uploader(self, file_bucket):
-        """Close the uploader"""
+    def close_uploader(self, file_bucket, num_chunks=None):
+        """Close the uploader, verifying that all chunks have been
+           uploaded
+        """
         if self.is_null():
             return
         elif not self._latest_version.is_uploading():
             return
 
-        self._latest_version.close_uploader(file_bucket)
+        self._latest_version.close_uploader(file_bucket, num_chunks)
 
     def is_uploading(self):
         """Return whether this version is still in the process of
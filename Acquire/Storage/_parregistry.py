@@ -1,4 +1,6 @@
 
+__all__ = ["PARRegistry"]
+
 _par_root = "storage/par"
 
 
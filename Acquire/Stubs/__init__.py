@@ -8,12 +8,34 @@ or available on this system, e.g. for license incompatibility reasons
  in systems where GPL modules are installed)
 """
 
-try:
-    import lazy_import
-    lazy_import.logging.disable(lazy_import.logging.DEBUG)
-except:
-    # lazy_import is not available, e.g. because we want the Apache
-    # licensed version of this code - import the non-lazy wrapper
-    from ._lazy_import import *
-
-requests = lazy_import.lazy_module("requests")
+from ._lazy_package import *
+
+
+def __getattr__(name):
+    # lazy_import and requests are only imported when first used, so
+    # that importing Acquire is fast
+    if name == "lazy_import":
+        try:
+            import lazy_import
+            lazy_import.logging.disable(lazy_import.logging.DEBUG)
+        except:
+            # lazy_import is not available, e.g. because we want the
+            # Apache licensed version of this code - import the
+            # wrapper that uses only the standard library
+            from ._lazy_import import lazy_import
+
+        value = lazy_import
+    elif name == "requests":
+        value = __getattr__("lazy_import").lazy_module("requests")
+    else:
+        raise AttributeError(
+            "module '%s' has no attribute '%s'" % (__name__, name))
+
+    globals()[name] = value
+    return value
+
+
+if not has_module_getattr():
+    # Python 3.6 ignores a module's __getattr__, so import these now
+    lazy_import = __getattr__("lazy_import")
+    requests = __getattr__("requests")
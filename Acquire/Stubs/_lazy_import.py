@@ -1,22 +1,61 @@
 
+import types as _types
+
 __all__ = ["lazy_import"]
 
 
+def _import_module(m):
+    """Import and return the module called 'm'"""
+    import importlib as _importlib
+    return _importlib.import_module(m)
+
+
+class _LazyModule(_types.ModuleType):
+    """A placeholder for a module that imports the module (and then
+       takes on all of its attributes) the first time that any of its
+       attributes are used
+    """
+    def __getattr__(self, attr):
+        if attr.startswith("__") and attr.endswith("__"):
+            # don't import the module just to look up special names
+            raise AttributeError(attr)
+
+        module = _import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
 class lazy_import:
     """This is not lazy_import, but instead a thin stub that matches the
-       API but DOES NOT lazy_import anything. This imports at call time.
-       Use this module if you are running a python installation that
-       does not have lazy_import installed, e.g. because you don't want
-       to install any GPL modules
+       API using only the standard library. Modules are imported when
+       one of their attributes is first used, and functions (and
+       classes) are imported when they are first called. Use this
+       module if you are running a python installation that does not
+       have lazy_import installed, e.g. because you don't want to
+       install any GPL modules
     """
     @staticmethod
     def lazy_module(m):
-        return __import__(m, fromlist=[''])
+        import sys as _sys
+
+        try:
+            return _sys.modules[m]
+        except KeyError:
+            return _LazyModule(m)
 
     @staticmethod
     def lazy_function(f):
         module_name, unit_name = f.rsplit('.', 1)
-        return getattr(__import__(module_name, fromlist=['']), unit_name)
+        function = []
+
+        def _lazy_function(*args, **kwargs):
+            if len(function) == 0:
+                function.append(getattr(_import_module(module_name),
+                                        unit_name))
+
+            return function[0](*args, **kwargs)
+
+        return _lazy_function
 
     @staticmethod
     def lazy_class(c):
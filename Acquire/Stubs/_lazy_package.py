@@ -0,0 +1,187 @@
+
+__all__ = ["lazy_package", "has_module_getattr"]
+
+
+def has_module_getattr():
+    """Return whether or not modules can define __getattr__ and
+       __dir__ (PEP 562), which is only supported by Python 3.7+
+    """
+    import sys as _sys
+    return _sys.version_info >= (3, 7)
+
+
+def _read_all(filename):
+    """Return the names in the __all__ list of the python file
+       'filename', read from the source without importing the module,
+       or None if this cannot be found
+    """
+    import ast as _ast
+    import re as _re
+
+    try:
+        with open(filename, "r") as FILE:
+            source = FILE.read()
+    except:
+        return None
+
+    match = _re.search(r"^__all__\s*=\s*(\[[^\]]*\])", source, _re.MULTILINE)
+
+    if match is None:
+        return None
+
+    try:
+        return list(_ast.literal_eval(match.group(1)))
+    except:
+        return None
+
+
+def _set_printer(C):
+    """Function to tell ipython to use __str__ if available"""
+    get_ipython().display_formatter.formatters['text/plain'].for_type(
+        C,
+        lambda obj, p, cycle: p.text(str(obj) if not cycle else '...')
+        )
+
+
+def lazy_package(name, submodules, attributes=None):
+    """Return the __getattr__ and __dir__ functions (PEP 562) for the
+       package called 'name', so that it behaves as if it had run
+       'from .submodule import *' for each of 'submodules' (in order),
+       and 'from module import attribute' for each item of the
+       'attributes' dictionary (attribute name => module), but without
+       importing anything until an attribute is first used. The names
+       exported by each submodule are read from the '__all__' list in
+       its source, so are found without importing the submodule. The
+       submodules themselves are also imported when first used. For
+       example, at the end of a package's __init__.py;
+
+       __getattr__, __dir__ = lazy_package(__name__, ["_keys", "_hash"])
+
+       Args:
+            name (str): The name of the package
+            submodules (list): Names of the submodules of the package
+            attributes (dict, default=None): Names imported from other
+            modules, that are overridden by those in 'submodules'
+       Returns:
+            tuple: The (__getattr__, __dir__) functions for the package
+    """
+    import sys as _sys
+
+    package = _sys.modules[name]
+    submodules = list(submodules)
+
+    if attributes is None:
+        attributes = {}
+    else:
+        attributes = dict(attributes)
+
+    index = []
+
+    def _get_index():
+        """Return the dictionary of the module for each exported name,
+           building this the first time it is needed
+        """
+        if len(index) > 0:
+            return index[0]
+
+        import os as _os
+        import importlib as _importlib
+
+        names = dict(attributes)
+        dirname = _os.path.dirname(package.__file__)
+
+        for submodule in submodules:
+            module = "%s.%s" % (name, submodule)
+            exported = _read_all(_os.path.join(dirname, "%s.py" % submodule))
+
+            if exported is None:
+                # this submodule does not have a static __all__, so
+                # has to be imported to find the names it exports
+                m = _importlib.import_module(module)
+                exported = getattr(m, "__all__", None)
+
+                if exported is None:
+                    exported = [n for n in dir(m) if not n.startswith("_")]
+
+            for n in exported:
+                names[n] = module
+
+        index.append(names)
+        return names
+
+    def __getattr__(attr):
+        if attr == "__all__":
+            value = list(_get_index().keys())
+        elif attr in submodules:
+            import importlib as _importlib
+            value = _importlib.import_module("%s.%s" % (name, attr))
+        else:
+            try:
+                module = _get_index()[attr]
+            except KeyError:
+                raise AttributeError(
+                    "module '%s' has no attribute '%s'" % (name, attr))
+
+            import importlib as _importlib
+            value = getattr(_importlib.import_module(module), attr)
+
+            try:
+                if __IPYTHON__ and isinstance(value, type):
+                    _set_printer(value)
+            except:
+                pass
+
+        # save the value so that this is only called once per attribute
+        setattr(package, attr, value)
+
+        return value
+
+    def __dir__():
+        return sorted(set(package.__dict__.keys()) |
+                      set(_get_index().keys()))
+
+    if not has_module_getattr():
+        # Python 3.6 ignores a module's __getattr__, so everything
+        # has to be imported now (as 'from .submodule import *' would)
+        _import_all(package, submodules, attributes)
+
+    return (__getattr__, __dir__)
+
+
+def _import_all(package, submodules, attributes):
+    """Eagerly import all of the names exported by 'submodules', and
+       then the 'attributes', into 'package'. This is used on Python
+       versions that don't support lazy loading via PEP 562
+    """
+    import importlib as _importlib
+
+    names = []
+
+    for submodule in submodules:
+        m = _importlib.import_module("%s.%s" % (package.__name__,
+                                                submodule))
+        exported = getattr(m, "__all__", None)
+
+        if exported is None:
+            exported = [n for n in dir(m) if not n.startswith("_")]
+
+        for n in exported:
+            setattr(package, n, getattr(m, n))
+            names.append(n)
+
+    for (attr, module) in attributes.items():
+        if attr not in names:
+            value = getattr(_importlib.import_module(module), attr)
+            setattr(package, attr, value)
+            names.append(attr)
+
+    package.__all__ = names
+
+    try:
+        if __IPYTHON__:
+            for n in names:
+                value = getattr(package, n)
+                if isinstance(value, type):
+                    _set_printer(value)
+    except:
+        pass
@@ -6,18 +6,36 @@ function service to run functions. Data from functions is stored
 in an intermediary Object Store.
 """
 
-from Acquire.Stubs import lazy_import as _lazy_import
-
-Access = _lazy_import.lazy_module("Acquire.Access")
-Accounting = _lazy_import.lazy_module("Acquire.Accounting")
-Crypto = _lazy_import.lazy_module("Acquire.Crypto")
-Identity = _lazy_import.lazy_module("Acquire.Identity")
-ObjectStore = _lazy_import.lazy_module("Acquire.ObjectStore")
-Service = _lazy_import.lazy_module("Acquire.Service")
-Client = _lazy_import.lazy_module("Acquire.Client")
-Registry = _lazy_import.lazy_module("Acquire.Registry")
-
 __version__ = "0.1.2"
 
 __all__ = ["Access", "Accounting", "Client", "Crypto",
            "Identity", "ObjectStore", "Registry", "Service"]
+
+
+def __getattr__(name):
+    # the subpackages are only imported when they are first used
+    if name in __all__:
+        import importlib as _importlib
+        return _importlib.import_module("%s.%s" % (__name__, name))
+
+    raise AttributeError(
+        "module '%s' has no attribute '%s'" % (__name__, name))
+
+
+def _add_lazy_subpackages():
+    """Python 3.6 ignores a module's __getattr__, so the subpackages
+       are added as lazy modules instead
+    """
+    import sys as _sys
+
+    if _sys.version_info >= (3, 7):
+        return
+
+    from Acquire.Stubs import lazy_import as _lazy_import
+
+    for name in __all__:
+        globals()[name] = _lazy_import.lazy_module(
+                                    "%s.%s" % (__name__, name))
+
+
+_add_lazy_subpackages()
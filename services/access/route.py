@@ -1,18 +1,12 @@
 
-def access_functions(function, args):
-    """ This function routes the passed arguments to the function
-        selected by the function parameter.
-    """
-
-    if function == "request":
-        from access.request import run as _request
-        return _request(args)
-    elif function == "run_calculation":
-        from access.run_calculation import run as _run_calculation
-        return _run_calculation(args)
-    else:
-        from admin.handler import MissingFunctionError
-        raise MissingFunctionError()
+from admin.handler import FunctionRouter as _FunctionRouter
+
+# routes calls to the access service's extra functions to the modules
+# that implement them, so that a single access function can stay hot for
+# longer
+access_functions = _FunctionRouter({
+    "request": "access.request",
+    "run_calculation": "access.run_calculation"})
 
 
 if __name__ == "__main__":
@@ -7,13 +7,150 @@ import os
 import subprocess
 
 __all__ = ["create_handler", "create_async_handler",
-           "MissingFunctionError"]
+           "MissingFunctionError", "FunctionRouter", "warm_routes"]
+
+
+# the names of the function used to call a batch of functions
+_batch_functions = ["batch", "admin/batch"]
+
+# the maximum number of functions that can be called in one batch
+_max_batch_size = 100
+
+# the maximum number of threads used by the async handler to run
+# requests without blocking the event loop
+_max_handler_threads = 8
+
+_handler_executor = None
 
 
 class MissingFunctionError(Exception):
     pass
 
 
+# all of the routers that have been created, so that they can be
+# warmed by 'admin/warm'
+_routers = []
+
+
+class FunctionRouter:
+    """This class routes function names to the 'run' function of the
+       module that implements each function. Modules are only imported
+       when their function is first called (or when the router is
+       warmed), after which the 'run' function is cached, so routing
+       a call is a single dictionary lookup. A router can be passed
+       as the 'additional_functions' of a handler
+
+       Args:
+            functions (dict): The names of the modules that implement
+            each function, indexed by function name
+    """
+    def __init__(self, functions):
+        self._modules = dict(functions)
+        self._routes = {}
+        _routers.append(self)
+
+    def __call__(self, function, args):
+        """Call 'function' with 'args', raising a MissingFunctionError
+           if this router does not have this function
+        """
+        return self.get(function)(args)
+
+    def __contains__(self, function):
+        return function in self._modules
+
+    def functions(self):
+        """Return the names of all of the functions in this router"""
+        return list(self._modules.keys())
+
+    def get(self, function):
+        """Return the 'run' function that implements 'function',
+           raising a MissingFunctionError if there is no such function
+        """
+        try:
+            return self._routes[function]
+        except KeyError:
+            pass
+
+        try:
+            module = self._modules[function]
+        except KeyError:
+            raise MissingFunctionError()
+
+        import importlib as _importlib
+        route = _importlib.import_module(module).run
+        self._routes[function] = route
+        return route
+
+    def warm(self):
+        """Import the modules of all of the functions in this router,
+           returning a dictionary of the errors for any functions
+           that could not be imported
+        """
+        errors = {}
+
+        for function in self._modules.keys():
+            try:
+                self.get(function)
+            except Exception as e:
+                errors[str(function)] = str(e)
+
+        return errors
+
+
+def warm_routes():
+    """Import the modules of all of the functions in all of the routers,
+       and load this service (with and without private access) so that
+       it is cached. This moves the cold-start time of these imports
+       ahead of the first real call to each function
+
+       Returns:
+            dict: containing the number of functions that were warmed,
+            plus any import errors and the UID of this service
+    """
+    result = {}
+    errors = {}
+    num_functions = 0
+
+    for router in _routers:
+        errors.update(router.warm())
+        num_functions += len(router.functions())
+
+    result["num_functions"] = num_functions - len(errors)
+
+    if len(errors) > 0:
+        result["errors"] = errors
+
+    from Acquire.Service import get_this_service as _get_this_service
+
+    try:
+        _get_this_service(need_private_access=False)
+        service = _get_this_service(need_private_access=True)
+        result["service_uid"] = service.uid()
+    except Exception as e:
+        # the service may not have been set up yet
+        result["service_error"] = str(e)
+
+    return result
+
+
+_admin_functions = FunctionRouter({
+    None: "admin.root",
+    "admin/dump_keys": "admin.dump_keys",
+    "admin/get_session_info": "admin.get_session_info",
+    "admin/login": "admin.login",
+    "admin/logout": "admin.logout",
+    "admin/metrics": "admin.metrics",
+    "admin/recover_otp": "admin.recover_otp",
+    "admin/refresh_keys": "admin.refresh_keys",
+    "admin/request_login": "admin.request_login",
+    "admin/reset": "admin.reset",
+    "admin/setup": "admin.setup",
+    "admin/test": "admin.test",
+    "admin/trust_accounting_service": "admin.trust_accounting_service",
+    "admin/trust_service": "admin.trust_service",
+    "admin/warm": "admin.warm"})
+
+
 def _one_hot_spare():
     """This function will (in the background) cause the function service
        to spin up another hot spare ready to process another request.
@@ -50,63 +187,63 @@ def _route_function(function, args, additional_functions=None):
             function : selected function
 
     """
-    if function is None:
-        from admin.root import run as _root
-        return _root(args)
-    elif function == "admin/dump_keys":
-        from admin.dump_keys import run as _dump_keys
-        return _dump_keys(args)
-    elif function == "admin/request_login":
-        from admin.request_login import run as _request_login
-        return _request_login(args)
-    elif function == "admin/get_session_info":
-        from admin.get_session_info import run as _get_session_info
-        return _get_session_info(args)
-    elif function == "admin/login":
-        from admin.login import run as _login
-        return _login(args)
-    elif function == "admin/logout":
-        from admin.logout import run as _logout
-        return _logout(args)
-    elif function == "admin/recover_otp":
-        from admin.recover_otp import run as _recover_otp
-        return _recover_otp(args)
-    elif function == "admin/refresh_keys":
-        from admin.refresh_keys import run as _refresh_keys
-        return _refresh_keys(args)
-    elif function == "admin/request_login":
-        from admin.request_login import run as _request_login
-        return _request_login(args)
-    elif function == "admin/reset":
-        from admin.reset import run as _reset
-        return _reset(args)
-    elif function == "admin/setup":
-        from admin.setup import run as _setup
-        return _setup(args)
-    elif function == "admin/trust_accounting_service":
-        from admin.trust_accounting_service import run as \
-            _trust_accounting_service
-        return _trust_accounting_service(args)
-    elif function == "admin/trust_service":
-        from admin.trust_service import run as _trust_service
-        return _trust_service(args)
-    elif function == "admin/test":
-        from admin.test import run as _test
-        return _test(args)
-    elif function == "admin/warm":
-        from admin.warm import run as _warm
-        return _warm(args)
-    else:
-        if additional_functions is not None:
-            try:
-                return additional_functions(function, args)
-            except MissingFunctionError:
-                pass
+    if function in _admin_functions:
+        return _admin_functions(function, args)
+
+    if additional_functions is not None:
+        try:
+            return additional_functions(function, args)
+        except MissingFunctionError:
+            pass
+
+    if function is None or function.startswith("admin/"):
+        raise LookupError("No function called '%s'" % function)
+
+    return _route_function("admin/%s" % function, args)
+
+
+def _handle_batch(args, additional_functions=None):
+    """Internal function that calls each of the functions in the
+       batch of calls in 'args', in order, returning the list of
+       their return values (or the exceptions they raised). This lets
+       a client make many function calls using a single request,
+       and so a single encryption / key-wrap of the arguments
+
+       Args:
+        args (dict): contains "calls", the list of dictionaries
+        holding the "function" to call and its "args"
+        additional_functions (function, optional): function to route
+
+        Returns:
+            dict: containing "results", the list of return values
+    """
+    from Acquire.Service import create_return_value
+
+    calls = args["calls"]
+
+    if len(calls) > _max_batch_size:
+        raise ValueError(
+            "You cannot call more than %d functions in one batch "
+            "(you tried to call %d)" % (_max_batch_size, len(calls)))
+
+    results = []
+
+    for call in calls:
+        function = call.get("function", None)
+
+        try:
+            if function in _batch_functions:
+                raise LookupError("You cannot call a batch of functions "
+                                  "from within a batch")
 
-        if function.startswith("admin/"):
-            raise LookupError("No function called '%s'" % function)
+            result = _route_function(function, call.get("args", {}),
+                                     additional_functions)
+        except Exception as e:
+            result = e
+
+        results.append(create_return_value(payload=result))
 
-        return _route_function("admin/%s" % function, args)
+    return {"results": results}
 
 
 def _handle(function=None, additional_functions=None, args={}):
@@ -124,14 +261,18 @@ def _handle(function=None, additional_functions=None, args={}):
             function: the routed function
        """
 
-    from Acquire.Service import start_profile, end_profile
+    from Acquire.Service import start_profile, end_profile, trace_span
 
-    pr = start_profile()
+    pr = start_profile(args)
 
     # if function != "warm":
     #     one_hot_spare()
 
-    result = _route_function(function, args, additional_functions)
+    with trace_span("route"):
+        if function in _batch_functions:
+            result = _handle_batch(args, additional_functions)
+        else:
+            result = _route_function(function, args, additional_functions)
 
     end_profile(pr, result)
 
@@ -163,15 +304,33 @@ def _base_handler(additional_functions=None, ctx=None, data=None, loop=None):
     from Acquire.Service import push_is_running_service, \
         pop_is_running_service, unpack_arguments, \
         get_service_private_key, pack_return_value, \
-        create_return_value
+        create_return_value, is_frame, unpack_frame, pack_frame, \
+        start_trace, end_trace, trace_span
 
     push_is_running_service()
 
+    # time each phase of this request, so that the latencies can be
+    # reported by 'admin/metrics'
+    trace = start_trace()
+
     result = None
 
     try:
-        (function, args, keys) = unpack_arguments(data,
-                                                  get_service_private_key)
+        with trace_span("unpack"):
+            if is_frame(data):
+                # binary data is sent as the raw body of a frame, with
+                # the normal arguments in the header
+                (data, body) = unpack_frame(data)
+            else:
+                body = None
+
+            (function, args, keys) = unpack_arguments(
+                                            data, get_service_private_key)
+
+            if body is not None:
+                from Acquire.Service._frame import _decrypt_body
+                args["body"] = _decrypt_body(args.pop("body_key"), body)
+                body = None
     except Exception as e:
         function = None
         args = None
@@ -186,17 +345,44 @@ def _base_handler(additional_functions=None, ctx=None, data=None, loop=None):
         except Exception as e:
             result = e
 
-    result = create_return_value(payload=result)
+    body = None
 
-    try:
-        result = pack_return_value(payload=result, key=keys)
-    except Exception as e:
-        result = pack_return_value(payload=create_return_value(e))
+    with trace_span("pack"):
+        if isinstance(result, dict) and \
+                isinstance(result.get("body", None), (bytes, bytearray)):
+            # return binary data as the raw body of a frame
+            from Acquire.Service._frame import _encrypt_body
+            result = result.copy()
+            (result["body_key"], body) = _encrypt_body(result.pop("body"))
+
+        result = create_return_value(payload=result)
+
+        try:
+            result = pack_return_value(payload=result, key=keys)
+
+            if body is not None:
+                result = pack_frame(result, body)
+        except Exception as e:
+            result = pack_return_value(payload=create_return_value(e))
+
+    end_trace(trace, function=function)
 
     pop_is_running_service()
     return result
 
 
+def _get_handler_executor():
+    """Return the thread pool used by the async handler"""
+    global _handler_executor
+
+    if _handler_executor is None:
+        from concurrent.futures import ThreadPoolExecutor \
+            as _ThreadPoolExecutor
+        _handler_executor = _ThreadPoolExecutor(_max_handler_threads)
+
+    return _handler_executor
+
+
 def create_async_handler(additional_functions=None):
     """Function that creates the async handler functions for all standard
         functions, plus the passed additional_functions
@@ -210,8 +396,14 @@ def create_async_handler(additional_functions=None):
 
     """
     async def async_handler(ctx, data=None, loop=None):
-        return _base_handler(additional_functions=additional_functions,
-                             ctx=ctx, data=data, loop=loop)
+        # run the (blocking) handler in a thread, so that slow calls
+        # (e.g. to the object store) do not block the event loop
+        from functools import partial as _partial
+        return await asyncio.get_event_loop().run_in_executor(
+                    _get_handler_executor(),
+                    _partial(_base_handler,
+                             additional_functions=additional_functions,
+                             ctx=ctx, data=data, loop=loop))
 
     return async_handler
 
@@ -0,0 +1,21 @@
+
+from Acquire.Service import get_metrics, get_service_identity_stats
+
+
+def run(args):
+    """Return the latency histograms of all of the functions called
+       on this service, and of each phase of those calls (e.g. unpack,
+       decrypt, route, object store operations, calls to other
+       services, pack and encrypt), as measured by this process,
+       together with the number of times that the service identity
+       was reused or had to be decrypted
+
+       Args:
+            args: unused
+       Returns:
+            dict: the histograms of "functions" and "phases", and
+            the "identity" cache statistics
+    """
+    metrics = get_metrics()
+    metrics["identity"] = get_service_identity_stats()
+    return {"metrics": metrics}
@@ -0,0 +1,281 @@
+
+import http.server
+import signal
+import sys
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ["ServiceServer", "create_server", "serve"]
+
+# the default number of threads used to handle requests
+_max_workers = 8
+
+# the default number of accepted requests that can wait for a free
+# thread. Once this many requests are waiting, new connections are
+# left in the listen backlog until a thread is free
+_max_pending = 32
+
+# the default number of seconds to wait for in-flight requests to
+# finish when the server is shut down
+_drain_timeout = 30
+
+
+class _RequestHandler(http.server.BaseHTTPRequestHandler):
+    """Handles each HTTP request by passing the body of a POST
+       (or GET) to the service handler, and returning its result
+    """
+    def do_POST(self):
+        try:
+            size = int(self.headers.get("Content-Length", 0))
+        except:
+            size = 0
+
+        if size > 0:
+            data = self.rfile.read(size)
+        else:
+            data = None
+
+        result = self.server.handler(None, data)
+
+        if isinstance(result, str):
+            result = result.encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(result)))
+        self.end_headers()
+        self.wfile.write(result)
+
+    do_GET = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ServiceServer(http.server.HTTPServer):
+    """A long-lived HTTP server for a service, as an alternative to
+       running each call as a one-shot Fn invocation. Requests are
+       handled by a bounded pool of threads, so that slow calls (e.g.
+       to the object store) do not block other requests, and all
+       requests share the same warm caches (service info, keys,
+       imported functions). The server can be drained, so that it
+       stops accepting new requests and waits for in-flight requests
+       to finish before exiting
+
+       Args:
+            address (tuple): The (host, port) to listen on
+            handler (function): The service handler, called as
+            handler(ctx, data), returning the response
+            max_workers (int, default=None): Number of request threads
+            max_pending (int, default=None): Number of accepted
+            requests that can wait for a thread
+            running_service (bool, default=False): Whether to mark
+            this process as running a service until the server closes
+    """
+    def __init__(self, address, handler, max_workers=None,
+                 max_pending=None, running_service=False):
+        if max_workers is None:
+            max_workers = _max_workers
+
+        if max_pending is None:
+            max_pending = _max_pending
+
+        max_workers = int(max_workers)
+        max_pending = int(max_pending)
+
+        if max_workers < 1 or max_pending < 0:
+            raise ValueError("Invalid number of workers (%s) or pending "
+                             "requests (%s)" % (max_workers, max_pending))
+
+        self.handler = handler
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._idle = threading.Condition(self._lock)
+        self._draining = False
+        self._running_service = False
+
+        super().__init__(address, _RequestHandler)
+
+        if running_service:
+            # the handler pushes and pops this for every request -
+            # pushing it once here means that it is always set while
+            # the server runs
+            from Acquire.Service import push_is_running_service \
+                as _push_is_running_service
+            _push_is_running_service()
+            self._running_service = True
+
+    def process_request(self, request, client_address):
+        """Pass the request to the thread pool, blocking (so not
+           accepting any more connections) if the pool is full
+        """
+        self._slots.acquire()
+
+        with self._lock:
+            self._in_flight += 1
+
+        try:
+            self._executor.submit(self._process_request, request,
+                                  client_address)
+        except:
+            self._finish_request()
+            self.shutdown_request(request)
+            raise
+
+    def _process_request(self, request, client_address):
+        """Handle the request in a pool thread"""
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._finish_request()
+
+    def _finish_request(self):
+        """Record that a request has finished"""
+        with self._lock:
+            self._in_flight -= 1
+
+            if self._in_flight == 0:
+                self._idle.notify_all()
+
+        self._slots.release()
+
+    def server_close(self):
+        """Close the server's socket"""
+        super().server_close()
+
+        if self._running_service:
+            self._running_service = False
+            from Acquire.Service import pop_is_running_service \
+                as _pop_is_running_service
+            _pop_is_running_service()
+
+    def num_in_flight(self):
+        """Return the number of requests being handled or waiting"""
+        with self._lock:
+            return self._in_flight
+
+    def drain(self, timeout=None):
+        """Stop accepting new requests, and wait up to 'timeout' seconds
+           for the in-flight requests to finish. This must be called,
+           while the server is running, from a different thread to the
+           one running 'serve_forever'. This returns whether or not
+           all requests finished
+        """
+        if timeout is None:
+            timeout = _drain_timeout
+
+        with self._lock:
+            already_draining = self._draining
+            self._draining = True
+
+        if not already_draining:
+            self.shutdown()
+
+        with self._lock:
+            finished = self._idle.wait_for(lambda: self._in_flight == 0,
+                                           timeout=timeout)
+
+        self._executor.shutdown(wait=finished)
+        self.server_close()
+
+        return finished
+
+
+def create_server(additional_functions=None, host="0.0.0.0", port=8080,
+                  max_workers=None, max_pending=None, warm=True):
+    """Create and return a ServiceServer that handles the standard
+       functions, plus 'additional_functions' (e.g. the functions
+       router from a service's route.py). This marks the process as
+       running a service for the lifetime of the server and, if
+       'warm' is True, imports all functions and loads the service
+       before accepting requests
+
+       Args:
+            additional_functions (function, default=None): Extra
+            functions of this service
+            host (str, default="0.0.0.0"): Host to listen on
+            port (int, default=8080): Port to listen on (0 for any)
+            max_workers (int, default=None): Number of request threads
+            max_pending (int, default=None): Number of accepted
+            requests that can wait for a thread
+            warm (bool, default=True): Whether to warm the service
+       Returns:
+            ServiceServer: The server (call serve_forever to start it)
+    """
+    from admin.handler import create_handler as _create_handler
+
+    server = ServiceServer((host, int(port)),
+                           _create_handler(additional_functions),
+                           max_workers=max_workers, max_pending=max_pending,
+                           running_service=True)
+
+    if warm:
+        from admin.handler import warm_routes as _warm_routes
+        _warm_routes()
+
+    return server
+
+
+def serve(additional_functions=None, host="0.0.0.0", port=8080,
+          max_workers=None, max_pending=None, drain_timeout=None):
+    """Run a long-lived server for the service with the passed
+       'additional_functions' until it receives SIGINT or SIGTERM,
+       at which point it drains the in-flight requests and returns.
+       See 'create_server' for the arguments
+    """
+    server = create_server(additional_functions=additional_functions,
+                           host=host, port=port, max_workers=max_workers,
+                           max_pending=max_pending)
+
+    drainer = []
+
+    def _shutdown(signum, frame):
+        # drain in a new thread, as this signal handler runs in
+        # the thread that is running serve_forever
+        if len(drainer) == 0:
+            drainer.append(threading.Thread(
+                                target=server.drain,
+                                kwargs={"timeout": drain_timeout}))
+            drainer[0].start()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    server.serve_forever()
+
+    for thread in drainer:
+        thread.join()
+
+
+if __name__ == "__main__":
+    # run a service as a long-lived server, e.g.
+    #
+    #     python -m admin.server storage --port 8080 --workers 8
+    #
+    # (run from the 'services' directory)
+    import argparse
+    import importlib
+
+    parser = argparse.ArgumentParser(
+                description="Run an Acquire service as a long-lived server")
+    parser.add_argument("service", help="The service to run, e.g. storage")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--pending", type=int, default=None)
+    parser.add_argument("--drain-timeout", type=float, default=None)
+    args = parser.parse_args()
+
+    route = importlib.import_module("%s.route" % args.service)
+    functions = getattr(route, "%s_functions" % args.service)
+
+    serve(additional_functions=functions, host=args.host, port=args.port,
+          max_workers=args.workers, max_pending=args.pending,
+          drain_timeout=args.drain_timeout)
+    sys.exit(0)
@@ -1,11 +1,13 @@
-
 def run(args):
-    """This function does absolutely nothing. It is called to pre-warm
-       a set of functions so that we can hide the long cold-start time
+    """This function is called to pre-warm the service, so that we can
+       hide the long cold-start time. It imports the modules of all
+       of the functions of this service and loads (and caches) this
+       service, so that the first real call is as fast as later calls
 
        Args:
          args: unused
        Returns:
-         dict: empty dict
+         dict: the number of functions warmed, and any errors
     """
-    return {}
+    from admin.handler import warm_routes as _warm_routes
+    return _warm_routes()
@@ -6,8 +6,14 @@ def run(args):
     """This function returns the UIDs of all pending jobs"""
     passphrase = str(args["passphrase"])
 
+    try:
+        max_results = int(args["max_results"])
+    except:
+        max_results = None
+
     cluster = Cluster.get_cluster()
 
-    job_uids = cluster.get_pending_job_uids(passphrase=passphrase)
+    job_uids = cluster.get_pending_job_uids(passphrase=passphrase,
+                                            max_results=max_results)
 
     return {"job_uids": cluster.encrypt_data(job_uids)}
@@ -1,22 +1,14 @@
 
+from admin.handler import FunctionRouter as _FunctionRouter
 
-def compute_functions(function, args):
-    """These are all of the additional functions for the compute service"""
-    if function == "submit_job":
-        from compute.submit_job import run as _submit_job
-        return _submit_job(args)
-    elif function == "get_job":
-        from compute.get_job import run as _get_job
-        return _get_job(args)
-    elif function == "get_pending_job_uids":
-        from compute.get_pending_job_uids import run as _get_job_uids
-        return _get_job_uids(args)
-    elif function == "set_cluster":
-        from compute.set_cluster import run as _set_cluster
-        return _set_cluster(args)
-    else:
-        from admin.handler import MissingFunctionError
-        raise MissingFunctionError()
+# routes calls to the compute service's extra functions to the modules
+# that implement them, so that a single compute function can stay hot
+# for longer
+compute_functions = _FunctionRouter({
+    "submit_job": "compute.submit_job",
+    "get_job": "compute.get_job",
+    "get_pending_job_uids": "compute.get_pending_job_uids",
+    "set_cluster": "compute.set_cluster"})
 
 
 if __name__ == "__main__":
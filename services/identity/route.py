@@ -1,39 +1,16 @@
 
+from admin.handler import FunctionRouter as _FunctionRouter
 
-def identity_functions(function, args):
-    """This function routes calls to sub-functions, thereby allowing
-       a single identity function to stay hot for longer
-
-       Args:
-            function (str): for selection of function to call
-            args: arguments to be passed to the selected function
-
-       Returns:
-            function: If valid function selected, function with args passed
-            else None
-
-       """
-    if function == "get_session_info":
-        from admin.get_session_info import run as _get_session_info
-        return _get_session_info(args)
-    elif function == "login":
-        from admin.login import run as _login
-        return _login(args)
-    elif function == "logout":
-        from admin.logout import run as _logout
-        return _logout(args)
-    elif function == "recover_otp":
-        from admin.recover_otp import run as _recover_otp
-        return _recover_otp(args)
-    elif function == "register":
-        from admin.register import run as _register
-        return _register(args)
-    elif function == "request_login":
-        from admin.request_login import run as _request_login
-        return _request_login(args)
-    else:
-        from admin.handler import MissingFunctionError
-        raise MissingFunctionError()
+# routes calls to the identity service's extra functions to the modules
+# that implement them, so that a single identity function can stay hot
+# for longer
+identity_functions = _FunctionRouter({
+    "get_session_info": "admin.get_session_info",
+    "login": "admin.login",
+    "logout": "admin.logout",
+    "recover_otp": "admin.recover_otp",
+    "register": "admin.register",
+    "request_login": "admin.request_login"})
 
 
 if __name__ == "__main__":
@@ -1,18 +1,12 @@
 
-
-def registry_functions(function, args):
-    """This function routes calls to sub-functions, thereby allowing
-       a single registry function to stay hot for longer
-    """
-    if function == "get_service":
-        from registry.get_service import run as _get_service
-        return _get_service(args)
-    elif function == "register_service":
-        from registry.register_service import run as _register_service
-        return _register_service(args)
-    else:
-        from admin.handler import MissingFunctionError
-        raise MissingFunctionError()
+from admin.handler import FunctionRouter as _FunctionRouter
+
+# routes calls to the registry service's extra functions to the modules
+# that implement them, so that a single registry function can stay hot
+# for longer
+registry_functions = _FunctionRouter({
+    "get_service": "registry.get_service",
+    "register_service": "registry.register_service"})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+
+from Acquire.Storage import DriveInfo
+
+
+def run(args):
+    """Abort the uploader for a file - this discards all of the chunks
+       that have been uploaded
+    """
+
+    drive_uid = str(args["drive_uid"])
+    file_uid = str(args["file_uid"])
+    secret = str(args["secret"])
+
+    drive = DriveInfo(drive_uid=drive_uid)
+
+    drive.abort_uploader(file_uid=file_uid, secret=secret)
+
+    return True
@@ -0,0 +1,20 @@
+
+from Acquire.Storage import DriveInfo
+
+
+def run(args):
+    """De-duplicate the chunks of a file that is being uploaded,
+       returning the indicies of the chunks that must be uploaded
+    """
+
+    drive_uid = str(args["drive_uid"])
+    file_uid = str(args["file_uid"])
+    secret = str(args["secret"])
+    chunk_hashes = dict(args["chunk_hashes"])
+
+    drive = DriveInfo(drive_uid=drive_uid)
+
+    missing = drive.dedup_chunks(file_uid=file_uid, secret=secret,
+                                 chunk_hashes=chunk_hashes)
+
+    return {"missing": missing}
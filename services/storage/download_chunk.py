@@ -14,6 +14,11 @@ def run(args):
     chunk_idx = int(args["chunk_index"])
     secret = str(args["secret"])
 
+    try:
+        binary = bool(args["binary"])
+    except:
+        binary = False
+
     drive = DriveInfo(drive_uid=drive_uid)
 
     try:
@@ -29,7 +34,12 @@ def run(args):
     response = {}
 
     if data is not None:
-        response["chunk"] = bytes_to_string(data)
+        if binary:
+            # return the chunk as the raw body of a binary frame
+            response["body"] = data
+        else:
+            response["chunk"] = bytes_to_string(data)
+
         data = None
 
     if meta is not None:
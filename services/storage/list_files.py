@@ -48,6 +48,11 @@ def run(args):
     else:
         include_metadata = False
 
+    try:
+        max_results = int(args["max_results"])
+    except:
+        max_results = None
+
     if par_uid is not None:
         registry = PARRegistry()
         (par, identifiers) = registry.load(par_uid=par_uid, secret=secret)
@@ -60,7 +65,8 @@ def run(args):
     files = drive.list_files(authorisation=authorisation,
                              include_metadata=include_metadata,
                              par=par, identifiers=identifiers,
-                             dir=directory, filename=filename)
+                             dir=directory, filename=filename,
+                             max_results=max_results)
 
     return_value = {}
 
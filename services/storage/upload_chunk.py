@@ -10,12 +10,27 @@ def run(args):
     file_uid = str(args["file_uid"])
     chunk_idx = int(args["chunk_index"])
     secret = str(args["secret"])
-    data = string_to_bytes(args["data"])
+
+    if isinstance(args.get("body", None), bytes):
+        # the chunk was sent as the raw body of a binary frame
+        data = args["body"]
+    else:
+        data = string_to_bytes(args["data"])
+
     checksum = str(args["checksum"])
 
+    # old clients always compressed chunks using bz2
+    compression = str(args.get("compression", "bz2"))
+
+    try:
+        chunk_hash = str(args["chunk_hash"])
+    except:
+        chunk_hash = None
+
     drive = DriveInfo(drive_uid=drive_uid)
 
     drive.upload_chunk(file_uid=file_uid, chunk_index=chunk_idx,
-                       secret=secret, chunk=data, checksum=checksum)
+                       secret=secret, chunk=data, checksum=checksum,
+                       compression=compression, chunk_hash=chunk_hash)
 
     return True
@@ -345,3 +345,68 @@ def test_pending_transactions(random_transaction):
     assert(starting_balance2.balance() + value == ending_balance2.balance())
     assert(starting_balance2.liability() == ending_balance2.liability())
     assert(starting_balance1.receivable() == ending_balance1.receivable())
+
+
+def test_batch_transactions(account1, account2, bucket):
+    transactions = [Transaction(create_decimal(10.0 * random.random()),
+                                "batch transaction %d" % i)
+                    for i in range(0, 5)]
+
+    total = create_decimal(0)
+    for transaction in transactions:
+        total += transaction.value()
+
+    starting_balance1 = account1.balance()
+    starting_balance2 = account2.balance()
+
+    resource = "batch %s" % total
+    authorisation = Authorisation(resource=resource,
+                                  testing_key=testing_key,
+                                  testing_user_guid=account1.group_name())
+
+    records = Ledger.perform(transactions=transactions,
+                             debit_account=account1,
+                             credit_account=account2,
+                             authorisation=authorisation,
+                             authorisation_resource=resource,
+                             is_provisional=False,
+                             batch=True,
+                             bucket=bucket)
+
+    assert(len(records) == len(transactions))
+
+    for (record, transaction) in zip(records, transactions):
+        assert(record.debit_account_uid() == account1.uid())
+        assert(record.credit_account_uid() == account2.uid())
+        assert(record.debit_note().value() == transaction.value())
+        assert(record.credit_note().value() == transaction.value())
+        assert_packable(record.debit_note())
+
+    ending_balance1 = account1.balance()
+    ending_balance2 = account2.balance()
+
+    assert(ending_balance1.balance() == starting_balance1.balance() - total)
+    assert(ending_balance2.balance() == starting_balance2.balance() + total)
+
+    # a batch whose total value is more than is available must fail
+    # without debiting anything
+    available = ending_balance1.available(account1.get_overdraft_limit())
+    value = create_decimal(min(float(available) / 2 + 1,
+                               float(Transaction.maximum_transaction_value())))
+    transactions = [Transaction(value, "large batch transaction %d" % i)
+                    for i in range(0, 3)]
+
+    from Acquire.Accounting import InsufficientFundsError
+
+    with pytest.raises(InsufficientFundsError):
+        Ledger.perform(transactions=transactions,
+                       debit_account=account1,
+                       credit_account=account2,
+                       authorisation=authorisation,
+                       authorisation_resource=resource,
+                       is_provisional=False,
+                       batch=True,
+                       bucket=bucket)
+
+    assert(account1.balance() == ending_balance1)
+    assert(account2.balance() == ending_balance2)
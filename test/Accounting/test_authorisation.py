@@ -66,3 +66,34 @@ def test_authorisation(bucket):
         raise
 
     pop_is_running_service()
+
+
+def test_authorisation_signature_cache(bucket, monkeypatch):
+    import Acquire.Crypto._keys as _keys
+
+    key = get_private_key("testing")
+    resource = str(uuid.uuid4())
+
+    data = Authorisation(resource=resource, testing_key=key).to_data()
+
+    auth = Authorisation.from_data(data)
+    auth._testing_key = key
+    auth.verify(resource=resource)
+
+    # prevent any RSA verification - a re-loaded copy of the same
+    # authorisation is verified from the cache
+    monkeypatch.setattr(_keys, "_padding", None)
+
+    auth = Authorisation.from_data(data)
+    auth._testing_key = key
+    auth.verify(resource=resource)
+
+    # different resources, or forced verifications, are not cached
+    auth = Authorisation.from_data(data)
+    auth._testing_key = key
+
+    with pytest.raises(PermissionError):
+        auth.verify(resource=str(uuid.uuid4()))
+
+    with pytest.raises(PermissionError):
+        auth.verify(resource=resource, force=True)
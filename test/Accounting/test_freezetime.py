@@ -350,3 +350,244 @@ def test_parallel_transaction(account1, account2, bucket):
 
     assert(account1.balance() == start1 + total1)
     assert(account2.balance() == start2 + total2)
+
+
+def test_balance_rollups(bucket):
+    if not have_freezetime:
+        return
+
+    from Acquire.Accounting._account import _sum_transactions
+    from Acquire.ObjectStore import ObjectStore
+
+    rollup_start = datetime.datetime(2020, 1, 5, 10, 30,
+                                     tzinfo=datetime.timezone.utc)
+
+    with freeze_time(rollup_start) as _frozen_datetime:
+        push_is_running_service()
+        accounts = Accounts(user_guid=account1_user)
+        debit_account = Account(name="Rollup Debit",
+                                description="Debit account for rollups",
+                                group_name=accounts.name())
+        credit_account = Account(name="Rollup Credit",
+                                 description="Credit account for rollups",
+                                 group_name=accounts.name())
+        debit_account.set_overdraft_limit(account1_overdraft_limit)
+        pop_is_running_service()
+
+    # a transaction every eleven days, spanning several months
+    for i in range(0, 15):
+        transaction_time = rollup_start + datetime.timedelta(days=11*i,
+                                                             hours=i)
+
+        with freeze_time(transaction_time) as _frozen_datetime:
+            transaction = Transaction(10*random.random(),
+                                      "rollup transaction %d" % i)
+
+            auth = Authorisation(
+                        resource=transaction.fingerprint(),
+                        testing_key=testing_key,
+                        testing_user_guid=debit_account.group_name())
+
+            Ledger.perform(transaction=transaction,
+                           debit_account=debit_account,
+                           credit_account=credit_account,
+                           authorisation=auth,
+                           is_provisional=False,
+                           bucket=bucket)
+
+    end_time = rollup_start + datetime.timedelta(days=200)
+
+    with freeze_time(end_time) as _frozen_datetime:
+        push_is_running_service()
+
+        for (start, end) in [(rollup_start, end_time),
+                             (rollup_start + datetime.timedelta(days=3),
+                              end_time - datetime.timedelta(days=20)),
+                             (rollup_start + datetime.timedelta(days=40),
+                              rollup_start + datetime.timedelta(days=41))]:
+            for account in [debit_account, credit_account]:
+                expected = _sum_transactions(
+                            account._get_transactions_between(start, end))
+                assert(account._get_balance_between(start, end) == expected)
+
+        # the whole months and days should now have been rolled up
+        names = ObjectStore.get_all_object_names(
+                                bucket, debit_account._rollup_key())
+        assert(len([n for n in names if "/month/" in n]) > 0)
+        assert(len([n for n in names if "/day/" in n]) > 0)
+
+        # and reading back the roll-ups gives the same balance
+        expected = _sum_transactions(
+                        debit_account._get_transactions_between(rollup_start,
+                                                                end_time))
+        assert(debit_account._get_balance_between(rollup_start, end_time)
+               == expected)
+
+        pop_is_running_service()
+
+
+def test_balance_rollups_midnight(bucket, monkeypatch):
+    if not have_freezetime:
+        return
+
+    from Acquire.Accounting._account import _sum_transactions
+
+    # the ledger normally moves transactions away from the top of the
+    # hour - allow them, so that there are transactions at exactly
+    # midnight at the boundaries of the roll-ups
+    monkeypatch.setattr(Account, "_get_safe_now",
+                        lambda account: account._get_now())
+
+    midnight = datetime.datetime(2020, 6, 1, tzinfo=datetime.timezone.utc)
+
+    with freeze_time(midnight - datetime.timedelta(days=2)) as _frozen:
+        push_is_running_service()
+        accounts = Accounts(user_guid=account1_user)
+        debit_account = Account(name="Midnight Debit",
+                                description="Debit account for midnight",
+                                group_name=accounts.name())
+        credit_account = Account(name="Midnight Credit",
+                                 description="Credit account for midnight",
+                                 group_name=accounts.name())
+        debit_account.set_overdraft_limit(account1_overdraft_limit)
+        pop_is_running_service()
+
+    # transactions at exactly midnight at the start and end of
+    # the range, and at midnight and midday of the days between
+    times = []
+    for day in range(0, 11):
+        times.append(midnight + datetime.timedelta(days=day))
+        times.append(midnight + datetime.timedelta(days=day, hours=12))
+
+    for transaction_time in times:
+        with freeze_time(transaction_time) as _frozen:
+            transaction = Transaction(10*random.random(),
+                                      "midnight transaction")
+
+            auth = Authorisation(
+                        resource=transaction.fingerprint(),
+                        testing_key=testing_key,
+                        testing_user_guid=debit_account.group_name())
+
+            Ledger.perform(transaction=transaction,
+                           debit_account=debit_account,
+                           credit_account=credit_account,
+                           authorisation=auth,
+                           is_provisional=False,
+                           bucket=bucket)
+
+    with freeze_time(midnight + datetime.timedelta(days=40)) as _frozen:
+        push_is_running_service()
+
+        all_transactions = debit_account._get_transactions_between(
+                                midnight - datetime.timedelta(days=1),
+                                midnight + datetime.timedelta(days=20))
+        assert(len(all_transactions) == len(times))
+
+        end = midnight + datetime.timedelta(days=10)
+
+        for start in [midnight,
+                      midnight - datetime.timedelta(hours=6),
+                      midnight + datetime.timedelta(hours=6)]:
+            # twice, so that the second uses the saved roll-ups
+            for _ in range(0, 2):
+                expected = _sum_transactions(
+                                [t for t in all_transactions
+                                 if t.datetime() > start and
+                                 t.datetime() <= end])
+
+                assert(debit_account._get_balance_between(start, end) ==
+                       expected)
+
+        # the transaction at exactly 'start' is excluded, and the one at
+        # exactly 'end' is included
+        all_transactions.sort(key=lambda t: t.datetime())
+        expected = _sum_transactions(all_transactions[1:-1])
+        assert(debit_account._get_balance_between(midnight, end) == expected)
+
+        pop_is_running_service()
+
+
+def test_last_balance_pointer(bucket):
+    if not have_freezetime:
+        return
+
+    from Acquire.ObjectStore import ObjectStore
+
+    pointer_start = datetime.datetime(2020, 3, 10, 9, 15,
+                                      tzinfo=datetime.timezone.utc)
+
+    with freeze_time(pointer_start) as _frozen_datetime:
+        push_is_running_service()
+        accounts = Accounts(user_guid=account1_user)
+        debit_account = Account(name="Pointer Debit",
+                                description="Debit account for pointer",
+                                group_name=accounts.name())
+        credit_account = Account(name="Pointer Credit",
+                                 description="Credit account for pointer",
+                                 group_name=accounts.name())
+        debit_account.set_overdraft_limit(account1_overdraft_limit)
+
+        pointer_key = debit_account._last_balance_key()
+        data = ObjectStore.get_object_from_json(bucket, pointer_key)
+        assert(data["key"] == debit_account._get_balance_key())
+        pop_is_running_service()
+
+    transaction_time = pointer_start + datetime.timedelta(days=2, hours=3)
+
+    with freeze_time(transaction_time) as _frozen_datetime:
+        transaction = Transaction(15, "pointer transaction")
+        auth = Authorisation(resource=transaction.fingerprint(),
+                             testing_key=testing_key,
+                             testing_user_guid=debit_account.group_name())
+
+        Ledger.perform(transaction=transaction,
+                       debit_account=debit_account,
+                       credit_account=credit_account,
+                       authorisation=auth,
+                       is_provisional=False,
+                       bucket=bucket)
+
+        push_is_running_service()
+        data = ObjectStore.get_object_from_json(bucket, pointer_key)
+        assert(data["key"] == debit_account._get_balance_key())
+        pop_is_running_service()
+
+    with freeze_time(transaction_time + datetime.timedelta(hours=5)) \
+            as _frozen_datetime:
+        push_is_running_service()
+
+        # remove the pointer - it should be rebuilt from a scan
+        ObjectStore.delete_object(bucket, pointer_key)
+
+        account = Account(uid=debit_account.uid())
+        assert(account.balance() == Balance(balance=-15))
+
+        data = ObjectStore.get_object_from_json(bucket, pointer_key)
+        assert(data["key"] == account._get_balance_key())
+
+        # concurrent writers can never move the pointer backwards
+        latest = data["key"]
+        keys = [account._get_balance_key(
+                    transaction_time + datetime.timedelta(hours=6+i))
+                for i in range(0, 40)]
+        random.shuffle(keys)
+
+        threads = [Thread(target=account._set_last_balance_key,
+                          args=(key, bucket)) for key in keys]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        data = ObjectStore.get_object_from_json(bucket, pointer_key)
+        assert(data["key"] == max(keys))
+        assert(data["key"] > latest)
+
+        account._set_last_balance_key(latest, bucket)
+        data = ObjectStore.get_object_from_json(bucket, pointer_key)
+        assert(data["key"] == max(keys))
+
+        pop_is_running_service()
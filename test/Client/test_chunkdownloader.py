@@ -0,0 +1,107 @@
+
+import bz2
+import json
+import os
+import threading
+
+import pytest
+
+from Acquire.Client import ChunkDownloader
+from Acquire.Crypto import Hash
+
+
+class _FakeService:
+    """Fake storage service that serves the chunks of a single file,
+       optionally failing (once) when asked for a specific chunk
+    """
+    def __init__(self, chunks, fail_index=None):
+        self._chunks = [bz2.compress(chunk) for chunk in chunks]
+        self._fail_index = fail_index
+        self._lock = threading.Lock()
+        self.requested = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    def call_function(self, function, args=None, body=None):
+        if function == "close_downloader":
+            return {}
+
+        assert(function == "download_chunk")
+        index = args["chunk_index"]
+
+        with self._lock:
+            self.requested.append(index)
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+        try:
+            if index == self._fail_index:
+                self._fail_index = None
+                raise ConnectionError("Failed to download chunk %d" % index)
+
+            response = {"num_chunks": len(self._chunks)}
+
+            if index < len(self._chunks):
+                chunk = self._chunks[index]
+                response["meta"] = json.dumps(
+                                    {"checksum": Hash.md5(chunk)})
+                response["body"] = chunk
+
+            return response
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+def _make_downloader(service):
+    downloader = ChunkDownloader(drive_uid="drive", file_uid="file")
+    downloader._service = service
+    return downloader
+
+
+def _make_chunks(num_chunks):
+    return [os.urandom(1024) + (b"chunk %d" % i) for i in range(num_chunks)]
+
+
+@pytest.mark.parametrize("parallel", [None, 1, 4, 32])
+def test_parallel_download(tmpdir, parallel):
+    chunks = _make_chunks(20)
+    service = _FakeService(chunks)
+    downloader = _make_downloader(service)
+
+    filename = downloader.download(filename="output.bin", dir=str(tmpdir),
+                                   parallel=parallel)
+
+    assert(not downloader.is_open())
+
+    with open(filename, "rb") as FILE:
+        assert(FILE.read() == b"".join(chunks))
+
+    if parallel is not None:
+        assert(service.max_in_flight <= parallel)
+
+
+def test_parallel_download_resumes(tmpdir):
+    chunks = _make_chunks(20)
+    service = _FakeService(chunks, fail_index=7)
+    downloader = _make_downloader(service)
+
+    with pytest.raises(ConnectionError):
+        downloader.download(filename="output.bin", dir=str(tmpdir),
+                            parallel=4)
+
+    # everything before the failed chunk has been written
+    assert(downloader.is_open())
+    assert(downloader._next_index == 7)
+
+    with open(downloader.local_filename(), "rb") as FILE:
+        assert(FILE.read() == b"".join(chunks[0:7]))
+
+    service.requested = []
+    filename = downloader.download(parallel=4)
+
+    assert(min(service.requested) == 7)
+    assert(not downloader.is_open())
+
+    with open(filename, "rb") as FILE:
+        assert(FILE.read() == b"".join(chunks))
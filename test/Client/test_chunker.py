@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from Acquire.Client import content_defined_chunks
+
+
+def test_content_defined_chunks(tmpdir):
+    data = os.urandom(300000)
+
+    chunks = list(content_defined_chunks(data=data, avg_size=8192,
+                                         min_size=2048, max_size=32768))
+
+    assert(b"".join(chunks) == data)
+    assert(len(chunks) > 10)
+
+    for chunk in chunks[0:-1]:
+        assert(len(chunk) >= 2048)
+        assert(len(chunk) <= 32768)
+
+    # chunking a file gives the same chunks as chunking the data
+    filename = os.path.join(str(tmpdir), "data.bin")
+    with open(filename, "wb") as FILE:
+        FILE.write(data)
+
+    assert(list(content_defined_chunks(filename=filename, avg_size=8192,
+                                       min_size=2048,
+                                       max_size=32768)) == chunks)
+
+    # inserting data only changes the chunks around the insertion
+    data2 = data[0:150000] + b"some inserted data" + data[150000:]
+    chunks2 = list(content_defined_chunks(data=data2, avg_size=8192,
+                                          min_size=2048, max_size=32768))
+
+    assert(b"".join(chunks2) == data2)
+    assert(len(set(chunks) - set(chunks2)) <= 2)
+
+    assert(list(content_defined_chunks(data=b"")) == [])
+
+    with pytest.raises(ValueError):
+        list(content_defined_chunks(data=data, avg_size=1024, min_size=2048))
+
+
+def test_content_defined_chunks_refill(tmpdir, monkeypatch):
+    import Acquire.Client._chunker as _chunker
+
+    data = os.urandom(200000)
+    filename = os.path.join(str(tmpdir), "refill.bin")
+    with open(filename, "wb") as FILE:
+        FILE.write(data)
+
+    chunks = list(content_defined_chunks(data=data, avg_size=8192,
+                                         min_size=2048, max_size=32768))
+
+    # the chunks are the same however often the buffer is refilled
+    monkeypatch.setattr(_chunker, "_read_size", 1000)
+
+    assert(list(content_defined_chunks(filename=filename, avg_size=8192,
+                                       min_size=2048,
+                                       max_size=32768)) == chunks)
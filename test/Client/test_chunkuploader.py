@@ -0,0 +1,152 @@
+
+import os
+import threading
+
+import pytest
+
+from Acquire.Client import ChunkUploader, uncompress
+
+
+class _FakeService:
+    """Fake storage service that accepts chunks in any order,
+       optionally failing (once) when sent a specific chunk
+    """
+    def __init__(self, fail_index=None):
+        self._fail_index = fail_index
+        self._lock = threading.Lock()
+        self.chunks = {}
+        self.closed_with = None
+        self.max_in_flight = 0
+        self._in_flight = 0
+
+    def call_function(self, function, args=None, body=None):
+        if function == "close_uploader":
+            self.closed_with = args["num_chunks"]
+            return True
+
+        assert(function == "upload_chunk")
+        index = args["chunk_index"]
+
+        with self._lock:
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+
+        try:
+            if index == self._fail_index:
+                self._fail_index = None
+                raise ConnectionError("Failed to upload chunk %d" % index)
+
+            chunk = uncompress(inputdata=body,
+                               compression_type=args["compression"])
+
+            with self._lock:
+                self.chunks[index] = chunk
+
+            return True
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def data(self):
+        return b"".join([self.chunks[i] for i in range(0, len(self.chunks))])
+
+
+def _make_uploader(service):
+    uploader = ChunkUploader(drive_uid="drive", file_uid="file")
+    uploader._service = service
+    return uploader
+
+
+def _make_file(tmpdir, size):
+    filename = os.path.join(str(tmpdir), "input.bin")
+    data = os.urandom(size)
+
+    with open(filename, "wb") as FILE:
+        FILE.write(data)
+
+    return (filename, data)
+
+
+@pytest.mark.parametrize("parallel, size, compression_type",
+                         [(None, 10000, "bz2"), (4, 10000, "zlib"),
+                          (4, 10240, "lzma"), (4, 0, "zlib"),
+                          (32, 5000, "bz2")])
+def test_upload_file(tmpdir, parallel, size, compression_type):
+    (filename, data) = _make_file(tmpdir, size)
+    service = _FakeService()
+    uploader = _make_uploader(service)
+
+    uploader.set_compression_type(compression_type)
+    uploader.upload_file(filename, chunk_size=1024, parallel=parallel)
+
+    num_chunks = max(1, (size + 1023) // 1024)
+
+    assert(uploader.uploaded_chunks() == list(range(0, num_chunks)))
+    assert(service.data() == data)
+
+    if parallel is not None:
+        assert(service.max_in_flight <= parallel)
+
+    uploader.close()
+    assert(service.closed_with == num_chunks)
+
+
+def test_upload_file_resumes(tmpdir):
+    (filename, data) = _make_file(tmpdir, 20000)
+    service = _FakeService(fail_index=7)
+    uploader = _make_uploader(service)
+
+    with pytest.raises(ConnectionError):
+        uploader.upload_file(filename, chunk_size=1024, parallel=4)
+
+    assert(7 not in uploader.uploaded_chunks())
+    assert(set(uploader.uploaded_chunks()) == set(service.chunks.keys()))
+
+    # the acknowledged chunks survive serialisation of the uploader
+    uploader = ChunkUploader.from_data(uploader.to_data(), service=service)
+
+    with pytest.raises(ValueError):
+        uploader.upload_file(filename, chunk_size=2048)
+
+    uploaded = len(service.chunks)
+    service.chunks = {}
+
+    uploader.upload_file(filename, parallel=4)
+
+    # only the missing chunks were sent again
+    assert(7 in service.chunks)
+    assert(len(service.chunks) == 20 - uploaded)
+    assert(uploader.uploaded_chunks() == list(range(0, 20)))
+
+
+def test_close_incomplete_upload(tmpdir):
+    (filename, data) = _make_file(tmpdir, 10240)
+    service = _FakeService(fail_index=9)
+    uploader = _make_uploader(service)
+
+    # the trailing chunk fails, so the highest acknowledged index
+    # is not the last chunk of the file
+    with pytest.raises(ConnectionError):
+        uploader.upload_file(filename, chunk_size=1024, parallel=4)
+
+    missing = uploader.missing_chunks()
+    assert(9 in missing)
+
+    with pytest.raises(PermissionError):
+        uploader.close()
+
+    assert(service.closed_with is None)
+
+    # the expected number of chunks survives serialisation
+    uploader = ChunkUploader.from_data(uploader.to_data(), service=service)
+    assert(uploader.missing_chunks() == missing)
+
+    with pytest.raises(PermissionError):
+        uploader.close()
+
+    uploader.upload_file(filename, parallel=4)
+    assert(uploader.missing_chunks() == [])
+
+    uploader.close()
+    assert(service.closed_with == 10)
+    assert(service.data() == data)
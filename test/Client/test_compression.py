@@ -0,0 +1,73 @@
+
+import os
+
+import pytest
+
+from Acquire.Client import compress, uncompress, get_compression_types, \
+    get_default_compression_type, set_default_compression_type
+
+
+def _make_data():
+    lines = ["ATOM  %5d  CA  ALA A%4d    %8.3f%8.3f%8.3f  1.00  0.00\n" %
+             (i, i // 10, 0.1 * i, 0.2 * i, 0.3 * i) for i in range(0, 5000)]
+    return "".join(lines).encode("utf-8") + os.urandom(10000)
+
+
+def test_builtin_compression_types():
+    types = get_compression_types()
+
+    for compression_type in ["bz2", "zlib", "lzma"]:
+        assert(compression_type in types)
+
+    assert(get_default_compression_type() in types)
+
+
+@pytest.mark.parametrize("compression_type", get_compression_types())
+def test_compress_data(compression_type):
+    data = _make_data()
+
+    compressed = compress(inputdata=data, compression_type=compression_type)
+
+    assert(len(compressed) < len(data))
+    assert(uncompress(inputdata=compressed,
+                      compression_type=compression_type) == data)
+
+
+@pytest.mark.parametrize("compression_type", get_compression_types())
+def test_compress_file(tmpdir, compression_type):
+    data = _make_data() * 50
+
+    inputfile = os.path.join(str(tmpdir), "input.pdb")
+    with open(inputfile, "wb") as FILE:
+        FILE.write(data)
+
+    compressed = compress(inputfile=inputfile,
+                          outputfile=os.path.join(str(tmpdir), "c.dat"),
+                          compression_type=compression_type)
+
+    assert(os.path.getsize(compressed) < len(data))
+
+    # decompress in place, as is done when downloading a file
+    uncompress(inputfile=compressed, outputfile=compressed,
+               compression_type=compression_type)
+
+    with open(compressed, "rb") as FILE:
+        assert(FILE.read() == data)
+
+
+def test_default_compression_type():
+    old_type = get_default_compression_type()
+
+    with pytest.raises(ValueError):
+        set_default_compression_type("not_a_compression_type")
+
+    with pytest.raises(ValueError):
+        compress(inputdata=b"data", compression_type="not_a_compression_type")
+
+    try:
+        set_default_compression_type("lzma")
+        data = _make_data()
+        import lzma
+        assert(lzma.decompress(compress(inputdata=data)) == data)
+    finally:
+        set_default_compression_type(old_type)
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# the heavy modules that must not be imported until they are used
+_heavy_modules = ["cryptography", "oci", "google.cloud"]
+
+
+def _run(code, use_lazy_import=True):
+    """Run 'code' in a new python process (so that nothing has
+       already been imported), returning what it prints
+    """
+    if not use_lazy_import:
+        # hide the third-party lazy_import, so the stub is used
+        code = "import sys\nsys.modules['lazy_import'] = None\n" + code
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = _root
+
+    output = subprocess.check_output([sys.executable, "-c", code],
+                                     env=env, cwd=_root)
+
+    return output.decode("utf-8").rstrip()
+
+
+_print_imported = """
+import sys
+print(",".join(m for m in %s if m in sys.modules))
+""" % _heavy_modules
+
+
+@pytest.mark.parametrize("use_lazy_import", [True, False])
+def test_import_client(use_lazy_import):
+    code = "import Acquire.Client\n" + _print_imported
+    assert(_run(code, use_lazy_import) == "")
+
+    code = "from Acquire.Client import User, Wallet, Drive\n" + \
+           _print_imported
+    assert(_run(code, use_lazy_import) == "")
+
+
+def test_lazy_stub():
+    # the stub only imports cryptography when a key is first used
+    code = "from Acquire.Client import PrivateKey\n" + _print_imported + \
+           "key = PrivateKey()\n" + _print_imported
+
+    assert(_run(code, use_lazy_import=False).split("\n") ==
+           ["", "cryptography"])
+
+
+def test_lazy_package():
+    import Acquire.Client
+    from Acquire.Client import Wallet
+    from Acquire.Client._wallet import Wallet as _Wallet
+
+    assert(Wallet is _Wallet)
+    assert("Wallet" in Acquire.Client.__all__)
+    assert("Wallet" in dir(Acquire.Client))
+    assert(Acquire.Client._wallet.Wallet is _Wallet)
+
+    with pytest.raises(AttributeError):
+        Acquire.Client.NotAnAttribute
+
+
+def test_lazy_package_python36():
+    # Python 3.6 ignores module __getattr__, so everything must be
+    # imported eagerly when the package is imported
+    code = "import sys\n" \
+           "import collections\n" \
+           "V = collections.namedtuple('version_info', 'major minor micro " \
+           "releaselevel serial')\n" \
+           "sys.version_info = V(3, 6, 15, 'final', 0)\n" \
+           "import Acquire.Client\n" \
+           "d = Acquire.Client.__dict__\n" \
+           "print('Wallet' in d, 'PrivateKey' in d, " \
+           "'Wallet' in Acquire.Client.__all__)\n" \
+           "import Acquire.Stubs\n" \
+           "print('lazy_import' in Acquire.Stubs.__dict__)\n"
+
+    for use_lazy_import in [True, False]:
+        assert(_run(code, use_lazy_import).split("\n") ==
+               ["True True True", "True"])
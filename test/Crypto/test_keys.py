@@ -94,3 +94,170 @@ def test_keys():
     assert(symkey == symkey2)
 
     assert(long_message == symkey2.decrypt(c))
+
+
+def test_session_keys():
+    import time
+    from Acquire.Crypto import DecryptionError, enable_session_keys, \
+        disable_session_keys
+
+    privkey = PrivateKey()
+    pubkey = privkey.public_key()
+    key_size = pubkey.key_size_in_bytes()
+
+    # messages up to the OAEP limit are encrypted directly
+    short_message = b"x" * (key_size - 66)
+    c = pubkey.encrypt(short_message)
+    assert(len(c) == key_size)
+    assert(privkey.decrypt(c) == short_message.decode("utf-8"))
+
+    long_message = os.urandom(10000)
+
+    # session keys are not re-used by default
+    c1 = pubkey.encrypt(long_message)
+    c2 = pubkey.encrypt(long_message)
+    assert(c1[0:key_size] != c2[0:key_size])
+
+    try:
+        enable_session_keys(lifetime=300)
+
+        c1 = pubkey.encrypt(long_message)
+        c2 = pubkey.encrypt(long_message)
+
+        # the same session key is used, but a different token
+        assert(c1[0:key_size] == c2[0:key_size])
+        assert(c1 != c2)
+
+        assert(privkey.decrypt(c1) == long_message)
+        assert(privkey.decrypt(c2) == long_message)
+
+        # a different private key cannot use the cached session key
+        with pytest.raises(DecryptionError):
+            PrivateKey().decrypt(c1)
+
+        # a different public key uses a different session key
+        c3 = PrivateKey().public_key().encrypt(long_message)
+        assert(c3[0:key_size] != c1[0:key_size])
+
+        # session keys expire
+        enable_session_keys(lifetime=0.01)
+        c4 = pubkey.encrypt(long_message)
+        time.sleep(0.02)
+        c5 = pubkey.encrypt(long_message)
+        assert(c4[0:key_size] != c5[0:key_size])
+        assert(privkey.decrypt(c4) == long_message)
+        assert(privkey.decrypt(c5) == long_message)
+
+        disable_session_keys()
+
+        c5 = pubkey.encrypt(long_message)
+        c6 = pubkey.encrypt(long_message)
+        assert(c5[0:key_size] != c6[0:key_size])
+        assert(privkey.decrypt(c5) == long_message)
+        assert(privkey.decrypt(c6) == long_message)
+    finally:
+        disable_session_keys()
+
+
+@pytest.mark.parametrize("size, segment_size",
+                         [(0, 1024), (100, 1024), (1024, 1024),
+                          (10000, 1024), (100000, None)])
+def test_stream_encryption(size, segment_size):
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+    from Acquire.Crypto import DecryptionError
+
+    key = SymmetricKey()
+    data = os.urandom(size)
+
+    encrypted = io.BytesIO()
+    n = key.encrypt_stream(io.BytesIO(data), encrypted,
+                           segment_size=segment_size)
+    encrypted = encrypted.getvalue()
+    assert(n == len(encrypted))
+
+    decrypted = io.BytesIO()
+    assert(key.decrypt_stream(io.BytesIO(encrypted), decrypted) == size)
+    assert(decrypted.getvalue() == data)
+
+    # each segment can be decrypted independently
+    header_size = SymmetricKey.stream_header_size()
+    header = encrypted[0:header_size]
+    (segsize, _) = SymmetricKey.read_stream_header(header)
+    encsize = segsize + SymmetricKey.stream_tag_size()
+    body = encrypted[header_size:]
+    segments = [body[i:i+encsize] for i in range(0, len(body), encsize)]
+
+    def decrypt(i):
+        return key.decrypt_segment(header, i, segments[i],
+                                   i == len(segments) - 1)
+
+    with ThreadPoolExecutor(4) as pool:
+        assert(b"".join(pool.map(decrypt, range(0, len(segments)))) == data)
+
+    # a different key, a modified stream or a truncated stream all fail
+    with pytest.raises(DecryptionError):
+        SymmetricKey().decrypt_stream(io.BytesIO(encrypted), io.BytesIO())
+
+    modified = bytearray(encrypted)
+    modified[-1] ^= 1
+
+    with pytest.raises(DecryptionError):
+        key.decrypt_stream(io.BytesIO(bytes(modified)), io.BytesIO())
+
+    if len(segments) > 1:
+        truncated = encrypted[0:header_size + encsize]
+
+        with pytest.raises(DecryptionError):
+            key.decrypt_stream(io.BytesIO(truncated), io.BytesIO())
+
+
+def test_verify_cache(monkeypatch):
+    import Acquire.Crypto._keys as _keys
+
+    privkey = PrivateKey()
+    pubkey = privkey.public_key()
+
+    message = "Hello World %s" % random.getrandbits(64)
+    sig = privkey.sign(message)
+
+    pubkey.verify(sig, message, cache_time=60)
+
+    with pytest.raises(SignatureVerificationError):
+        pubkey.verify(privkey.sign("something else"), message,
+                      cache_time=60)
+
+    # prevent any RSA verification - only the cached signature passes
+    monkeypatch.setattr(_keys, "_padding", None)
+
+    pubkey.verify(sig, message, cache_time=60)
+    PublicKey.read_bytes(pubkey.bytes()).verify(sig, message, cache_time=60)
+
+    with pytest.raises(SignatureVerificationError):
+        pubkey.verify(sig, message)
+
+    with pytest.raises(SignatureVerificationError):
+        pubkey.verify(sig, message + "!", cache_time=60)
+
+    with pytest.raises(SignatureVerificationError):
+        PrivateKey().public_key().verify(sig, message, cache_time=60)
+
+
+def test_fingerprint_memoised(monkeypatch):
+    privkey = PrivateKey()
+    pubkey = privkey.public_key()
+
+    fingerprint = pubkey.fingerprint()
+    assert(privkey.fingerprint() == fingerprint)
+
+    # the fingerprint is not recalculated
+    monkeypatch.setattr(PublicKey, "bytes", None)
+    assert(pubkey.fingerprint() == fingerprint)
+    assert(privkey.fingerprint() == fingerprint)
+    monkeypatch.undo()
+
+    # ...unless the key is changed
+    privkey2 = PrivateKey()
+    privkey._privkey = privkey2._privkey
+    assert(privkey.fingerprint() == privkey2.fingerprint())
+    assert(privkey.fingerprint() != fingerprint)
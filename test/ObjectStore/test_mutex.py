@@ -86,4 +86,31 @@ def test_mutex(bucket):
         pop_is_running_service()
         raise
 
-    pop_is_running_service()
\ No newline at end of file
+    pop_is_running_service()
+
+
+def test_mutex_contention(bucket):
+    from Acquire.ObjectStore import ObjectStore
+    import threading
+
+    ObjectStore.set_string_object(bucket, "contended_counter", "0")
+
+    def _increment():
+        for _ in range(0, 5):
+            m = Mutex("ObjectStore.test_mutex_contention", bucket=bucket)
+            value = int(ObjectStore.get_string_object(bucket,
+                                                      "contended_counter"))
+            ObjectStore.set_string_object(bucket, "contended_counter",
+                                          str(value + 1))
+            m.unlock()
+
+    threads = [threading.Thread(target=_increment) for _ in range(0, 4)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert(ObjectStore.get_string_object(bucket, "contended_counter") ==
+           "20")
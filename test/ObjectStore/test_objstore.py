@@ -95,3 +95,279 @@ def test_objstore(bucket):
     test_value2 = ObjectStore.get_string_object(new_bucket2, test_key)
 
     assert(test_value == test_value2)
+
+
+def test_objstore_index(bucket):
+    from Acquire.ObjectStore._testing_objstore import _walk_object_names
+
+    bucket = ObjectStore.get_bucket(bucket, "index_bucket")
+
+    for i in range(0, 20):
+        ObjectStore.set_string_object(bucket, "index/%02d" % i, str(i))
+        ObjectStore.set_string_object(bucket, "index/sub/%02d" % i, str(i))
+
+    ObjectStore.set_string_object(bucket, "indexed", "value")
+
+    def _assert_consistent(prefix=None, without_prefix=False):
+        names = ObjectStore.get_all_object_names(bucket, prefix,
+                                                 without_prefix)
+        walked = _walk_object_names(bucket, prefix, without_prefix)
+        assert(sorted(names) == sorted(walked))
+        return names
+
+    assert(len(_assert_consistent()) == 41)
+    assert(len(_assert_consistent("index")) == 41)
+    assert(len(_assert_consistent("index/")) == 40)
+    assert(len(_assert_consistent("index/sub")) == 20)
+    assert(len(_assert_consistent("index/sub/", True)) == 20)
+    assert("00" in _assert_consistent("index/sub/", True))
+
+    ObjectStore.delete_object(bucket, "index/00")
+    assert(ObjectStore.take_string_object(bucket, "index/01") == "1")
+    assert(len(_assert_consistent("index/")) == 38)
+
+    ObjectStore.delete_all_objects(bucket, "index/sub")
+    assert(len(_assert_consistent("index/")) == 18)
+    assert(len(_assert_consistent("index/sub")) == 0)
+
+    assert(not ObjectStore.is_bucket_empty(bucket))
+    ObjectStore.delete_all_objects(bucket, "index")
+    ObjectStore.delete_object(bucket, "indexed")
+    assert(len(_assert_consistent()) == 0)
+    assert(ObjectStore.is_bucket_empty(bucket))
+
+
+def test_objstore_bulk(bucket):
+    from Acquire.ObjectStore._testing_objstore import _walk_object_names
+
+    bucket = ObjectStore.get_bucket(bucket, "bulk_bucket")
+
+    objects = {}
+    for i in range(0, 10):
+        objects["bulk/%02d" % i] = ("%d" % i).encode("utf-8")
+
+    ObjectStore.set_objects(bucket, objects)
+
+    names = ObjectStore.get_all_object_names(bucket, "bulk")
+    assert(sorted(names) == sorted(objects.keys()))
+    assert(sorted(names) == sorted(_walk_object_names(bucket, "bulk")))
+
+    keys = ["bulk/00", "bulk/05", "bulk/missing"]
+    result = ObjectStore.get_objects(bucket, keys)
+    assert(result == {"bulk/00": b"0", "bulk/05": b"5"})
+
+    assert(ObjectStore.get_all_objects(bucket, "bulk") == objects)
+    assert(ObjectStore.get_all_objects_from_json(bucket, "bulk")["bulk/09"]
+           == 9)
+
+    ObjectStore.delete_objects(bucket, ["bulk/00", "bulk/01", "missing"])
+    assert(len(ObjectStore.get_all_object_names(bucket, "bulk")) == 8)
+
+    ObjectStore.clear_all_except(bucket, ["bulk/02", "bulk/03"])
+    names = ObjectStore.get_all_object_names(bucket)
+    assert(sorted(names) == ["bulk/02", "bulk/03"])
+    assert(sorted(names) == sorted(_walk_object_names(bucket)))
+
+    ObjectStore.delete_objects(bucket, names)
+    assert(len(ObjectStore.get_all_object_names(bucket)) == 0)
+
+
+def test_objstore_cache(bucket):
+    from Acquire.ObjectStore import enable_object_store_cache, \
+        disable_object_store_cache, get_object_store_cache
+
+    bucket = ObjectStore.get_bucket(bucket, "cache_bucket")
+
+    cache = enable_object_store_cache(max_bytes=8 * 1024, ttl=60)
+
+    try:
+        assert(get_object_store_cache() is cache)
+
+        ObjectStore.set_object_from_json(bucket, "cached", {"a": 1})
+        assert(ObjectStore.get_object_from_json(bucket, "cached") == {"a": 1})
+        assert(ObjectStore.get_object_from_json(bucket, "cached") == {"a": 1})
+
+        stats = cache.statistics()
+        assert(stats["hits"] == 1)
+        assert(stats["misses"] == 1)
+
+        # cached data is immutable
+        assert(isinstance(ObjectStore.get_object(bucket, "cached"), bytes))
+
+        # writes must invalidate the cached copy
+        ObjectStore.set_object_from_json(bucket, "cached", {"a": 2})
+        assert(ObjectStore.get_object_from_json(bucket, "cached") == {"a": 2})
+
+        assert(ObjectStore.take_object_from_json(bucket, "cached") ==
+               {"a": 2})
+
+        with pytest.raises(ObjectStoreError):
+            ObjectStore.get_object(bucket, "cached")
+
+        # bulk reads only fetch the uncached keys
+        ObjectStore.set_objects(bucket, {"bulk/1": b"1", "bulk/2": b"2"})
+        assert(ObjectStore.get_object(bucket, "bulk/1") == b"1")
+        cache.reset_statistics()
+        assert(ObjectStore.get_objects(bucket, ["bulk/1", "bulk/2"]) ==
+               {"bulk/1": b"1", "bulk/2": b"2"})
+        assert(cache.statistics()["hits"] == 1)
+        assert(cache.statistics()["misses"] == 1)
+
+        ObjectStore.delete_all_objects(bucket, "bulk")
+        assert(ObjectStore.get_objects(bucket, ["bulk/1", "bulk/2"]) == {})
+
+        # the cache is bounded in size
+        for i in range(0, 32):
+            ObjectStore.set_object(bucket, "big/%d" % i, b"x" * 512)
+            ObjectStore.get_object(bucket, "big/%d" % i)
+
+        stats = cache.statistics()
+        assert(stats["size_bytes"] <= 8 * 1024)
+        assert(stats["evictions"] > 0)
+    finally:
+        disable_object_store_cache()
+
+    assert(get_object_store_cache() is None)
+
+
+class _SlowBackend:
+    """Dictionary backend whose reads can be paused, to test writes
+       that race with reads that fill the cache
+    """
+    def __init__(self):
+        import threading
+        self.objects = {}
+        self.reading = threading.Event()
+        self.resume = threading.Event()
+        self.resume.set()
+
+    def get_object(self, bucket, key):
+        data = self.objects[key]
+        self.reading.set()
+        self.resume.wait()
+        return data
+
+    def get_objects(self, bucket, keys):
+        return {key: self.get_object(bucket, key) for key in keys
+                if key in self.objects}
+
+    def set_object(self, bucket, key, data):
+        self.objects[key] = data
+
+    def delete_all_objects(self, bucket, prefix=None):
+        for key in list(self.objects.keys()):
+            if prefix is None or key.startswith(prefix):
+                del self.objects[key]
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_objstore_cache_race(bulk):
+    import threading
+    from Acquire.ObjectStore._cached_objstore import Cached_ObjectStore
+
+    backend = _SlowBackend()
+    cache = Cached_ObjectStore(backend, ttl=60)
+    backend.objects["key"] = b"old"
+
+    def _read():
+        if bulk:
+            return cache.get_objects("bucket", ["key"])["key"]
+        else:
+            return cache.get_object("bucket", "key")
+
+    for write in ["set", "delete"]:
+        cache.clear()
+        backend.objects["key"] = b"old"
+        backend.reading.clear()
+        backend.resume.clear()
+
+        # a slow read of the old value races with a write...
+        result = []
+        thread = threading.Thread(target=lambda: result.append(_read()))
+        thread.start()
+        backend.reading.wait()
+
+        if write == "set":
+            cache.set_object("bucket", "key", b"new")
+        else:
+            cache.delete_all_objects("bucket", "k")
+            backend.objects["key"] = b"new"
+
+        backend.resume.set()
+        thread.join()
+
+        assert(result == [b"old"])
+
+        # ...but the old value must not be cached over the new one
+        assert(_read() == b"new")
+        assert(cache._generations == {})
+
+
+def test_objstore_iter_names(bucket):
+    from itertools import islice
+
+    bucket = ObjectStore.get_bucket(bucket, "iter_bucket")
+
+    objects = {}
+    for i in range(0, 25):
+        objects["iter/%02d" % i] = b"x"
+
+    objects["other"] = b"x"
+
+    ObjectStore.set_objects(bucket, objects)
+
+    names = list(ObjectStore.iter_object_names(bucket, "iter",
+                                               page_size=4))
+    assert(names == sorted(ObjectStore.get_all_object_names(bucket,
+                                                            "iter")))
+    assert(len(names) == 25)
+
+    names = list(ObjectStore.iter_object_names(bucket, "iter/",
+                                               page_size=4,
+                                               without_prefix=True))
+    assert(names == ["%02d" % i for i in range(0, 25)])
+
+    names = list(ObjectStore.iter_object_names(bucket, "iter",
+                                               start_after="iter/20",
+                                               page_size=2))
+    assert(names == ["iter/21", "iter/22", "iter/23", "iter/24"])
+
+    names = list(islice(ObjectStore.iter_object_names(bucket, page_size=3),
+                        5))
+    assert(names == ["iter/00", "iter/01", "iter/02", "iter/03", "iter/04"])
+
+    assert(len(list(ObjectStore.iter_object_names(bucket))) == 26)
+
+
+def test_objstore_set_object_if(bucket):
+    bucket = ObjectStore.get_bucket(bucket, "cas_bucket")
+
+    # only create if there is no object
+    etag = ObjectStore.set_object_if(bucket, "cas/key", b"one")
+    assert(etag is not None)
+    assert(ObjectStore.set_object_if(bucket, "cas/key", b"two") is None)
+    assert(ObjectStore.get_object(bucket, "cas/key") == b"one")
+
+    (data, read_etag) = ObjectStore.get_object_and_etag(bucket, "cas/key")
+    assert(data == b"one")
+    assert(read_etag == etag)
+
+    # only update if the etag matches
+    new_etag = ObjectStore.set_object_if(bucket, "cas/key", b"two", etag)
+    assert(new_etag is not None and new_etag != etag)
+    assert(ObjectStore.set_object_if(bucket, "cas/key", b"three",
+                                     etag) is None)
+    assert(ObjectStore.get_object(bucket, "cas/key") == b"two")
+    assert("cas/key" in ObjectStore.get_all_object_names(bucket, "cas"))
+
+    # only delete if the etag matches
+    assert(not ObjectStore.delete_object_if(bucket, "cas/key", etag))
+    assert(ObjectStore.delete_object_if(bucket, "cas/key", new_etag))
+    assert(ObjectStore.get_all_object_names(bucket, "cas") == [])
+
+    with pytest.raises(ObjectStoreError):
+        ObjectStore.get_object_and_etag(bucket, "cas/key")
+
+    assert(ObjectStore.set_object_if(bucket, "cas/key", b"x",
+                                     new_etag) is None)
+    assert(not ObjectStore.delete_object_if(bucket, "cas/missing", etag))
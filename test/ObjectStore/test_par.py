@@ -110,3 +110,37 @@ def test_par(bucket):
         value = par.read(privkey).get_string_object()
 
         assert(keyvals[key] == value)
+
+
+def test_par_encrypted_file(bucket, tmpdir):
+    import os
+    from Acquire.Crypto import SymmetricKey
+
+    privkey = get_private_key()
+    pubkey = privkey.public_key()
+
+    key = "encrypted_file"
+    ObjectStore.set_string_object(bucket, key, "placeholder")
+
+    par = ObjectStore.create_par(bucket, key=key, readable=True,
+                                 writeable=True, encrypt_key=pubkey)
+
+    data = os.urandom(100000)
+    filename = str(tmpdir.join("input.bin"))
+
+    with open(filename, "wb") as FILE:
+        FILE.write(data)
+
+    symkey = SymmetricKey()
+    par.write(privkey).set_object_from_file(filename, symmetric_key=symkey)
+
+    # the stored object is encrypted
+    assert(data not in ObjectStore.get_object(bucket, key))
+
+    outfile = str(tmpdir.join("output.bin"))
+    par.read(privkey).get_object_as_file(outfile, symmetric_key=symkey)
+
+    with open(outfile, "rb") as FILE:
+        assert(FILE.read() == data)
+
+    par.close()
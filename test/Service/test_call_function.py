@@ -0,0 +1,64 @@
+
+import asyncio
+import threading
+import time
+
+import Acquire.Service._function as _function
+from Acquire.Service import async_call_function
+
+
+def test_pooled_sessions():
+    import Acquire.Stubs
+
+    class _FakeRequests:
+        class Session:
+            def post(self, url, data, timeout=None):
+                pass
+
+    original = Acquire.Stubs.requests
+    Acquire.Stubs.requests = _FakeRequests
+
+    try:
+        s1 = _function._get_session("https://example.com/t/identity")
+        s2 = _function._get_session("https://example.com/t/identity")
+        s3 = _function._get_session("https://example.com/t/storage")
+
+        assert(s1 is s2)
+        assert(s1 is not s3)
+        assert(isinstance(s1, _FakeRequests.Session))
+    finally:
+        Acquire.Stubs.requests = original
+
+
+def test_async_call_function(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def _mock_call_function(service_url, function=None, args=None,
+                            args_key=None, response_key=None,
+                            public_cert=None):
+        time.sleep(0.2)
+
+        with lock:
+            calls.append(service_url)
+
+        return {"service": service_url, "function": function}
+
+    monkeypatch.setattr(_function, "call_function", _mock_call_function)
+
+    async def _fan_out():
+        return await asyncio.gather(
+                    async_call_function("storage", "list_files"),
+                    async_call_function("compute", "get_job"),
+                    async_call_function("accounting", "get_info"))
+
+    start = time.time()
+    results = asyncio.run(_fan_out())
+    elapsed = time.time() - start
+
+    assert(sorted(calls) == ["accounting", "compute", "storage"])
+    assert(results[0] == {"service": "storage", "function": "list_files"})
+    assert(results[2]["function"] == "get_info")
+
+    # the calls should have run concurrently
+    assert(elapsed < 0.5)
@@ -0,0 +1,55 @@
+
+import pytest
+
+from Acquire.Service import pack_frame, unpack_frame, is_frame, \
+    UnpackingError
+from Acquire.Service._frame import _encrypt_body, _decrypt_body
+
+
+def test_frame():
+    header = '{"function": "upload_chunk", "payload": {"a": "ƒ∂"}}'
+    body = bytes(range(0, 256)) * 100
+
+    frame = pack_frame(header, body)
+
+    assert(is_frame(frame))
+    assert(not is_frame(header.encode("utf-8")))
+    assert(not is_frame(header))
+
+    # the body is not re-encoded, so the only overhead is the framing
+    assert(len(frame) == 4 + 4 + len(header.encode("utf-8")) + 8 + len(body))
+
+    (h, b) = unpack_frame(frame)
+
+    assert(h == header)
+    assert(bytes(b) == body)
+
+    with pytest.raises(UnpackingError):
+        unpack_frame(frame[0:-10])
+
+    with pytest.raises(UnpackingError):
+        unpack_frame(header.encode("utf-8"))
+
+    (h, b) = unpack_frame(pack_frame(header, None))
+    assert(h == header)
+    assert(len(b) == 0)
+
+
+def test_frame_body_encryption():
+    body = b"some binary \x00\x01\x02 data" * 1000
+
+    (key, encrypted) = _encrypt_body(body)
+
+    assert(len(encrypted) == len(body) + 28)
+    assert(_decrypt_body(key, encrypted) == body)
+
+    (other_key, _) = _encrypt_body(body)
+
+    with pytest.raises(UnpackingError):
+        _decrypt_body(other_key, encrypted)
+
+    corrupted = bytearray(encrypted)
+    corrupted[50] ^= 1
+
+    with pytest.raises(UnpackingError):
+        _decrypt_body(key, bytes(corrupted))
@@ -60,3 +60,37 @@ def test_service_object(tmpdir_factory):
 
     pop_is_running_service()
     pop_testing_objstore()
+
+
+def test_service_get_key(tmpdir_factory):
+    bucket = tmpdir_factory.mktemp("test_service_get_key")
+    push_testing_objstore(bucket)
+    push_is_running_service()
+
+    try:
+        service = Service.create(service_type="identity",
+                                 service_url="identity")
+        service.create_stage2(service_uid="Z9-Z7", response=service.uid())
+
+        key = service.private_key()
+        cert = service.private_certificate()
+
+        assert(service.get_key(key.fingerprint()) is key)
+        assert(service.get_key(cert.fingerprint()) is cert)
+
+        service.refresh_keys()
+
+        # the index is rebuilt after the keys are refreshed
+        assert(service.get_key(key.fingerprint()) is key)
+        assert(service.get_key(cert.fingerprint()) is cert)
+
+        new_key = service.private_key()
+        assert(new_key is not key)
+        assert(service.get_key(new_key.fingerprint()) is new_key)
+    except:
+        pop_is_running_service()
+        pop_testing_objstore()
+        raise
+
+    pop_is_running_service()
+    pop_testing_objstore()
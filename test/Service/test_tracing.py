@@ -0,0 +1,114 @@
+
+import threading
+
+from Acquire.Service import start_trace, end_trace, trace_span, \
+    get_current_span, get_metrics, reset_metrics
+
+
+def test_tracing():
+    reset_metrics()
+
+    # spans outside of a trace do nothing
+    with trace_span("unpack") as span:
+        assert(span is None)
+
+    assert(get_current_span() is None)
+
+    trace = start_trace()
+
+    with trace_span("unpack"):
+        with trace_span("decrypt"):
+            pass
+
+    with trace_span("route"):
+        for _ in range(0, 3):
+            with trace_span("objstore/get_object"):
+                pass
+
+    tree = end_trace(trace, function="some_function")
+
+    assert(get_current_span() is None)
+    assert([child["name"] for child in tree["children"]] ==
+           ["unpack", "route"])
+    assert(tree["children"][0]["children"][0]["name"] == "decrypt")
+    assert(len(tree["children"][1]["children"]) == 3)
+
+    metrics = get_metrics()
+
+    assert(metrics["functions"]["some_function"]["count"] == 1)
+
+    for phase in ["unpack", "decrypt", "route", "objstore/get_object"]:
+        assert(metrics["phases"][phase]["count"] == 1)
+
+    reset_metrics()
+    assert(get_metrics() == {"functions": {}, "phases": {}})
+
+
+def test_tracing_threads():
+    reset_metrics()
+
+    # each thread has its own trace
+    def traced(i):
+        trace = start_trace()
+
+        with trace_span("phase_%d" % i):
+            pass
+
+        end_trace(trace, function="threaded")
+
+    threads = [threading.Thread(target=traced, args=(i,))
+               for i in range(0, 8)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    metrics = get_metrics()
+
+    assert(metrics["functions"]["threaded"]["count"] == 8)
+    assert(len(metrics["phases"]) == 8)
+
+    reset_metrics()
+
+
+def test_tracing_without_contextvars(monkeypatch):
+    # Python 3.6 has no contextvars, so spans are held per thread
+    import Acquire.ObjectStore._tracing as _tracing
+
+    monkeypatch.setattr(_tracing, "_current_span",
+                        _tracing._ThreadLocalVar("test_span"))
+
+    test_tracing()
+    test_tracing_threads()
+
+    assert(_tracing.get_current_span() is None)
+
+
+def test_sampled_profile(monkeypatch):
+    import Acquire.Service._profile as _profile
+    from Acquire.Service import start_profile, end_profile
+
+    monkeypatch.setattr(_profile, "profiling_code", False)
+
+    args = {"profile": True, "value": 1}
+    assert(start_profile(args) is None)
+    assert(args == {"value": 1})
+
+    monkeypatch.setattr(_profile, "profiling_code", True)
+    monkeypatch.setattr(_profile, "_profile_sample_rate", 0.0)
+
+    assert(start_profile({}) is None)
+
+    pr = start_profile({"profile": True})
+    assert(pr is not None)
+
+    result = end_profile(pr, {})
+    assert("profile_data" in result)
+
+    monkeypatch.setattr(_profile, "_profile_sample_rate", 1.0)
+
+    pr = start_profile({})
+    assert(pr is not None)
+    end_profile(pr, {})
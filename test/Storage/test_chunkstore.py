@@ -0,0 +1,122 @@
+import bz2
+
+import pytest
+
+from Acquire.Crypto import Hash
+from Acquire.ObjectStore import ObjectStore
+from Acquire.Service import get_service_account_bucket, \
+    push_is_running_service, pop_is_running_service, \
+    is_running_service
+from Acquire.Storage import ChunkStore, FileValidationError
+
+
+@pytest.fixture(scope="module")
+def bucket(tmpdir_factory):
+    d = tmpdir_factory.mktemp("chunkstore")
+    push_is_running_service()
+    bucket = get_service_account_bucket(str(d))
+
+    while is_running_service():
+        pop_is_running_service()
+
+    return bucket
+
+
+_drive_uid = "test_drive"
+
+
+def _add(bucket, data, drive_uid=_drive_uid):
+    chunk = bz2.compress(data)
+    chunk_hash = ChunkStore.hash_chunk(data)
+    meta = ChunkStore.add_chunk(bucket, drive_uid=drive_uid,
+                                chunk_hash=chunk_hash, chunk=chunk,
+                                checksum=Hash.md5(chunk), compression="bz2")
+    return (chunk_hash, meta)
+
+
+def test_chunkstore_refcount(bucket):
+    data = b"some chunk of data " * 100
+    (chunk_hash, meta) = _add(bucket, data)
+
+    assert(meta["refcount"] == 1)
+    assert(meta["size"] == len(data))
+
+    # adding the same chunk again just adds a reference
+    (chunk_hash2, meta) = _add(bucket, data)
+    assert(chunk_hash2 == chunk_hash)
+    assert(meta["refcount"] == 2)
+
+    meta = ChunkStore.add_reference(bucket, _drive_uid, chunk_hash)
+    assert(meta["refcount"] == 3)
+
+    (chunk, meta) = ChunkStore.get_chunk(bucket, _drive_uid, chunk_hash)
+    assert(bz2.decompress(chunk) == data)
+
+    # only one copy of the data is stored
+    names = ObjectStore.get_all_object_names(
+                        bucket, "storage/chunkstore/%s/data/%s" %
+                        (_drive_uid, chunk_hash))
+    assert(len(names) == 1)
+
+    assert(not ChunkStore.release(bucket, _drive_uid, chunk_hash))
+    assert(ChunkStore.release_all(bucket, _drive_uid,
+                                  [chunk_hash, None]) == 0)
+    metas = ChunkStore.get_chunk_metas(bucket, _drive_uid, [chunk_hash])
+    assert(metas[chunk_hash]["refcount"] == 1)
+    assert(ChunkStore.release(bucket, _drive_uid, chunk_hash))
+
+    # the chunk is deleted once all references are released
+    assert(ChunkStore.get_chunk_metas(bucket, _drive_uid,
+                                      [chunk_hash]) == {})
+    assert(ChunkStore.add_reference(bucket, _drive_uid, chunk_hash) is None)
+    assert(not ChunkStore.release(bucket, _drive_uid, chunk_hash))
+
+    names = ObjectStore.get_all_object_names(
+                        bucket, "storage/chunkstore/%s/data/%s" %
+                        (_drive_uid, chunk_hash))
+    assert(len(names) == 0)
+
+
+def test_chunkstore_validation(bucket):
+    data = b"some other chunk of data"
+    chunk = bz2.compress(data)
+
+    with pytest.raises(FileValidationError):
+        ChunkStore.add_chunk(bucket, _drive_uid,
+                             chunk_hash=ChunkStore.hash_chunk(b"x"),
+                             chunk=chunk, checksum=Hash.md5(chunk),
+                             compression="bz2")
+
+    with pytest.raises(FileValidationError):
+        ChunkStore.add_chunk(bucket, _drive_uid,
+                             chunk_hash=ChunkStore.hash_chunk(data),
+                             chunk=chunk, checksum=Hash.md5(b"x"),
+                             compression="bz2")
+
+    with pytest.raises(ValueError):
+        ChunkStore.add_reference(bucket, _drive_uid, "../../not_a_hash")
+
+    with pytest.raises(ValueError):
+        ChunkStore.add_reference(bucket, "../other",
+                                 ChunkStore.hash_chunk(data))
+
+
+def test_chunkstore_per_drive(bucket):
+    data = b"a chunk of data in one drive " * 10
+    (chunk_hash, meta) = _add(bucket, data)
+
+    # the chunk is invisible to, and cannot be used by, other drives
+    assert(ChunkStore.get_chunk_metas(bucket, "other_drive",
+                                      [chunk_hash]) == {})
+    assert(ChunkStore.add_reference(bucket, "other_drive",
+                                    chunk_hash) is None)
+
+    # uploading the chunk to the other drive stores a separate copy
+    (_, meta) = _add(bucket, data, drive_uid="other_drive")
+    assert(meta["refcount"] == 1)
+
+    metas = ChunkStore.get_chunk_metas(bucket, _drive_uid, [chunk_hash])
+    assert(metas[chunk_hash]["refcount"] == 1)
+
+    assert(ChunkStore.release(bucket, "other_drive", chunk_hash))
+    assert(ChunkStore.release(bucket, _drive_uid, chunk_hash))
@@ -21,3 +21,62 @@ def test_filehandle():
     assert(f1.local_filedata() == f2.local_filedata())
     assert(f1.fingerprint() == f2.fingerprint())
     assert(f1.drive_uid() == f2.drive_uid())
+
+
+@pytest.mark.parametrize("compression_type", ["bz2", "zlib", "lzma"])
+def test_filehandle_compression_type(compression_type):
+    filename = __file__
+
+    f1 = FileHandle(filename=filename, drive_uid="test_uid",
+                    compression_type=compression_type)
+
+    assert(f1.is_compressed())
+    assert(f1.compression_type() == compression_type)
+
+    f2 = FileHandle.from_data(f1.to_data())
+
+    assert(f2.compression_type() == compression_type)
+    assert(f2.local_filedata(decompress=True) ==
+           open(filename, "rb").read())
+
+
+def test_filehandle_compression_strategy(tmpdir):
+    import os
+
+    random_file = os.path.join(str(tmpdir), "random.bin")
+    with open(random_file, "wb") as FILE:
+        FILE.write(os.urandom(600000))
+
+    f = FileHandle(filename=random_file, drive_uid="test_uid")
+
+    assert(not f.is_compressed())
+    assert(f.compression_strategy() == "incompressible")
+    assert(f.sampled_compression_ratio() > 0.95)
+
+    f2 = FileHandle.from_data(f.to_data())
+    assert(f2.compression_strategy() == "incompressible")
+    assert(f2.sampled_compression_ratio() == f.sampled_compression_ratio())
+
+    text_file = os.path.join(str(tmpdir), "text.txt")
+    with open(text_file, "w") as FILE:
+        for i in range(0, 50000):
+            FILE.write("line %d of some highly compressible text\n" % i)
+
+    f = FileHandle(filename=text_file, drive_uid="test_uid")
+
+    assert(f.is_compressed())
+    assert(f.compression_strategy() == "compress")
+    assert(f.sampled_compression_ratio() < 0.5)
+
+    # the saving needed to compress is configurable
+    f = FileHandle(filename=text_file, drive_uid="test_uid",
+                   min_compression_saving=0.99)
+
+    assert(not f.is_compressed())
+    assert(f.compression_strategy() == "incompressible")
+
+    f = FileHandle(filename=text_file, drive_uid="test_uid", compress=False)
+
+    assert(not f.is_compressed())
+    assert(f.compression_strategy() == "disabled")
+    assert(f.sampled_compression_ratio() is None)
@@ -0,0 +1,80 @@
+"""
+Benchmark that compares the compression ratio and the compression and
+decompression throughput of every available compression type, using
+either synthetic trajectory-like data (a PDB-style text topology plus
+binary frames of slowly-moving float32 coordinates) or a real file.
+
+Run using;
+
+    python bench_compression.py [filename]
+"""
+
+import os
+import random
+import struct
+import sys
+import time
+
+
+def _make_trajectory_data(natoms=20000, nframes=50):
+    """Return synthetic data that looks like a typical MD trajectory"""
+    lines = []
+    coords = []
+
+    for i in range(0, natoms):
+        (x, y, z) = (random.uniform(0, 100), random.uniform(0, 100),
+                     random.uniform(0, 100))
+        coords.append([x, y, z])
+        lines.append("ATOM  %5d  CA  ALA A%4d    %8.3f%8.3f%8.3f  1.00  0.00"
+                     "           C\n" % (i % 100000, (i // 10) % 10000,
+                                         x, y, z))
+
+    data = ["".join(lines).encode("utf-8")]
+
+    for frame in range(0, nframes):
+        for coord in coords:
+            for j in range(0, 3):
+                coord[j] += random.gauss(0, 0.05)
+
+        data.append(struct.pack("<%df" % (3 * natoms),
+                                *[c for coord in coords for c in coord]))
+
+    return b"".join(data)
+
+
+def run_benchmark(data):
+    from Acquire.Client import compress, uncompress, get_compression_types
+
+    size = len(data)
+    mb = size / (1024.0 * 1024.0)
+
+    print("Compressing %.1f MB of data" % mb)
+    print("%-6s %8s %14s %14s" % ("type", "ratio", "compress MB/s",
+                                  "uncompress MB/s"))
+
+    for compression_type in get_compression_types():
+        start = time.time()
+        compressed = compress(inputdata=data,
+                              compression_type=compression_type)
+        compress_time = time.time() - start
+
+        start = time.time()
+        uncompressed = uncompress(inputdata=compressed,
+                                  compression_type=compression_type)
+        uncompress_time = time.time() - start
+
+        assert(uncompressed == data)
+
+        print("%-6s %8.3f %14.1f %14.1f" % (
+              compression_type, float(size) / len(compressed),
+              mb / compress_time, mb / uncompress_time))
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "rb") as FILE:
+            run_benchmark(FILE.read())
+    else:
+        run_benchmark(_make_trajectory_data())
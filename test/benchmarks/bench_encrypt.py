@@ -0,0 +1,69 @@
+"""
+Benchmark that measures the time taken to encrypt and decrypt
+messages of between 100 B and 10 MB using PublicKey.encrypt and
+PrivateKey.decrypt, both with and without re-use of symmetric
+session keys.
+
+Run using;
+
+    python bench_encrypt.py [repeats]
+"""
+
+import os
+import sys
+import time
+
+
+def _time(func, repeats):
+    """Return the average time in milliseconds to call 'func'"""
+    start = time.time()
+
+    for _ in range(0, repeats):
+        result = func()
+
+    return (1000.0 * (time.time() - start) / repeats, result)
+
+
+def run_benchmark(repeats=10):
+    from Acquire.Crypto import PrivateKey, enable_session_keys, \
+        disable_session_keys
+
+    privkey = PrivateKey()
+    pubkey = privkey.public_key()
+
+    print("%10s %10s %12s %12s %12s %12s" % (
+          "size", "session", "encrypt ms", "decrypt ms",
+          "encrypt MB/s", "decrypt MB/s"))
+
+    for size in [100, 1000, 10000, 100000, 1000000, 10000000]:
+        message = os.urandom(size)
+        mb = size / (1024.0 * 1024.0)
+
+        for session in [False, True]:
+            if session:
+                enable_session_keys()
+            else:
+                disable_session_keys()
+
+            (encrypt_ms, encrypted) = _time(lambda: pubkey.encrypt(message),
+                                            repeats)
+            (decrypt_ms, decrypted) = _time(
+                                        lambda: privkey.decrypt(encrypted),
+                                        repeats)
+
+            assert(decrypted == message)
+
+            print("%10d %10s %12.3f %12.3f %12.1f %12.1f" % (
+                  size, session, encrypt_ms, decrypt_ms,
+                  1000.0 * mb / encrypt_ms, 1000.0 * mb / decrypt_ms))
+
+    disable_session_keys()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+    if len(sys.argv) > 1:
+        run_benchmark(int(sys.argv[1]))
+    else:
+        run_benchmark()
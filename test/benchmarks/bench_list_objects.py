@@ -0,0 +1,51 @@
+"""
+Benchmark that compares listing object names in the testing object
+store using the sorted key index against walking the filesystem.
+
+Run using;
+
+    python bench_list_objects.py [nkeys]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+
+def run_benchmark(nkeys=100000):
+    from Acquire.ObjectStore import ObjectStore, \
+        use_testing_object_store_backend
+    from Acquire.ObjectStore._testing_objstore import _walk_object_names
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        bucket = use_testing_object_store_backend(tmpdir)
+
+        start = time.time()
+        for i in range(0, nkeys):
+            ObjectStore.set_object(
+                bucket, "transactions/%04d/%06d" % (i % 1000, i), b"x")
+        print("Wrote %d keys in %.2f s" % (nkeys, time.time() - start))
+
+        for prefix in ["transactions/", "transactions/0042/"]:
+            start = time.time()
+            walked = _walk_object_names(bucket, prefix)
+            walk_time = time.time() - start
+
+            start = time.time()
+            indexed = ObjectStore.get_all_object_names(bucket, prefix)
+            index_time = time.time() - start
+
+            assert(sorted(walked) == indexed)
+
+            print("Listing '%s' (%d keys): walk %.4f s, index %.4f s" %
+                  (prefix, len(indexed), walk_time, index_time))
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+    if len(sys.argv) > 1:
+        run_benchmark(int(sys.argv[1]))
+    else:
+        run_benchmark()
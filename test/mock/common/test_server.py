@@ -0,0 +1,108 @@
+
+import threading
+import time
+import urllib.request
+
+from admin.server import ServiceServer, create_server
+from identity.route import identity_functions
+
+from Acquire.Service import pack_arguments, unpack_return_value, \
+    push_testing_objstore, pop_testing_objstore, is_running_service
+
+
+def _post(server, data):
+    (host, port) = server.server_address
+    request = urllib.request.Request("http://127.0.0.1:%d" % port,
+                                     data=data)
+
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+def test_server_concurrency_and_drain():
+    lock = threading.Lock()
+    release = threading.Event()
+    state = {"in_flight": 0, "max_in_flight": 0}
+
+    def handler(ctx, data):
+        with lock:
+            state["in_flight"] += 1
+            state["max_in_flight"] = max(state["max_in_flight"],
+                                         state["in_flight"])
+
+        release.wait(timeout=30)
+
+        with lock:
+            state["in_flight"] -= 1
+
+        return data[::-1]
+
+    server = ServiceServer(("127.0.0.1", 0), handler, max_workers=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    results = {}
+
+    def call(i):
+        results[i] = _post(server, b"request %d" % i)
+
+    calls = [threading.Thread(target=call, args=(i,), daemon=True)
+             for i in range(0, 12)]
+
+    for c in calls:
+        c.start()
+
+    try:
+        # wait until all requests have been accepted (4 being handled
+        # and 8 waiting for a thread)
+        for _ in range(0, 1000):
+            if server.num_in_flight() == 12:
+                break
+            time.sleep(0.01)
+
+        assert(server.num_in_flight() == 12)
+        assert(state["in_flight"] == 4)
+
+        # drain while the requests are still in flight - they must
+        # all finish
+        drainer = threading.Thread(target=lambda: results.update(
+                                   {"drained": server.drain(timeout=30)}))
+        drainer.start()
+        time.sleep(0.1)
+        assert(drainer.is_alive())
+    finally:
+        release.set()
+
+    drainer.join()
+    thread.join()
+
+    for c in calls:
+        c.join()
+
+    assert(results.pop("drained"))
+    assert(results == {i: (b"request %d" % i)[::-1] for i in range(0, 12)})
+    assert(state["max_in_flight"] == 4)
+    assert(server.num_in_flight() == 0)
+
+
+def test_service_server(aaai_services):
+    push_testing_objstore(aaai_services["_services"]["identity"])
+
+    try:
+        server = create_server(identity_functions, host="127.0.0.1",
+                               port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        try:
+            result = _post(server, pack_arguments(function="admin/test",
+                                                  args={}))
+            result = unpack_return_value(return_value=result)
+            assert("service" in result)
+        finally:
+            server.drain()
+            thread.join()
+    finally:
+        pop_testing_objstore()
+
+    assert(not is_running_service())
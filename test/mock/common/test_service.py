@@ -54,3 +54,106 @@ def test_service(service_url, aaai_services):
 
     service.call_function(
         function="dump_keys", args={"authorisation": auth.to_data()})
+
+
+def test_call_functions(aaai_services):
+    privkey = get_private_key("testing")
+    response = call_function("identity", response_key=privkey)
+    service = Service.from_data(response["service_info"])
+
+    results = service.call_functions([("admin/test", None),
+                                      ("no_such_function", {}),
+                                      ("test", {}),
+                                      ("admin/batch", {"calls": []})])
+
+    assert(len(results) == 4)
+    assert(Service.from_data(results[0]["service"]).uid() == service.uid())
+    assert(Service.from_data(results[2]["service"]).uid() == service.uid())
+    assert(isinstance(results[1], Exception))
+    assert(isinstance(results[3], LookupError))
+
+    assert(service.call_functions([]) == [])
+
+
+def test_warm(aaai_services):
+    from admin.handler import FunctionRouter, MissingFunctionError
+    from storage.route import storage_functions
+
+    privkey = get_private_key("testing")
+    response = call_function("storage", response_key=privkey)
+    service = Service.from_data(response["service_info"])
+
+    result = service.call_function("warm")
+
+    assert(result["service_uid"] == service.uid())
+    assert(result["num_functions"] >= len(storage_functions.functions()))
+
+    # every function has been imported and cached
+    for function in storage_functions.functions():
+        assert(function not in result.get("errors", {}))
+        assert(function in storage_functions._routes)
+
+    router = FunctionRouter({"test": "admin.test"})
+
+    assert("test" in router)
+    assert(router.get("test") is router.get("test"))
+
+    with pytest.raises(MissingFunctionError):
+        router("no_such_function", {})
+
+
+def test_metrics(aaai_services):
+    privkey = get_private_key("testing")
+    response = call_function("identity", response_key=privkey)
+    service = Service.from_data(response["service_info"])
+
+    service.call_function("admin/test")
+    metrics = service.call_function("metrics")["metrics"]
+
+    assert(metrics["functions"]["admin/test"]["count"] >= 1)
+
+    for phase in ["unpack", "route", "pack"]:
+        assert(metrics["phases"][phase]["count"] >= 1)
+
+    assert(metrics["identity"]["decrypts"] >= 1)
+
+
+def test_service_identity_cache(aaai_services):
+    from Acquire.Service import clear_serviceinfo_cache, \
+        get_service_identity_stats, refresh_service_keys_and_certs
+
+    push_testing_objstore(aaai_services["_services"]["compute"])
+    push_is_running_service()
+
+    try:
+        service = get_this_service(need_private_access=True)
+        stats = get_service_identity_stats()
+
+        # clearing the service info cache must not need the identity
+        # to be decrypted again
+        for _ in range(0, 3):
+            clear_serviceinfo_cache()
+            s = get_this_service(need_private_access=True)
+            assert(s.uid() == service.uid())
+            assert(s.private_key().fingerprint() ==
+                   service.private_key().fingerprint())
+
+        new_stats = get_service_identity_stats()
+        assert(new_stats["decrypts"] == stats["decrypts"])
+        assert(new_stats["hits"] == stats["hits"] + 3)
+
+        # refreshing the keys changes the identity version, so the new
+        # keys are decrypted
+        old_fingerprint = service.private_key().fingerprint()
+        refresh_service_keys_and_certs(service, force_refresh=True)
+        assert(service.private_key().fingerprint() != old_fingerprint)
+
+        s = get_this_service(need_private_access=True)
+        assert(s.private_key().fingerprint() ==
+               service.private_key().fingerprint())
+
+        assert(get_service_identity_stats()["decrypts"] ==
+               stats["decrypts"] + 1)
+    finally:
+        pop_is_running_service()
+        pop_testing_objstore()
@@ -12,8 +12,6 @@ import uuid
 import Acquire
 import Acquire.Stubs
 
-import requests as _original_requests
-
 from admin.handler import create_handler
 from identity.route import identity_functions
 from accounting.route import accounting_functions
@@ -118,6 +116,23 @@ class MockedRequests:
         return MockedRequests(status_code=200, content=result)
 
 
+class MockedSession:
+    """Mocked requests.Session object, which passes all requests
+       through to MockedRequests
+    """
+    def get(self, url, data, timeout=None):
+        return MockedRequests.get(url, data, timeout=timeout)
+
+    def post(self, url, data, timeout=None):
+        return MockedRequests.post(url, data, timeout=timeout)
+
+    def mount(self, prefix, adapter):
+        pass
+
+
+MockedRequests.Session = MockedSession
+
+
 def mocked_input(s):
     return "y"
 
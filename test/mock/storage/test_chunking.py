@@ -17,7 +17,13 @@ def _same_file(file1, file2):
     return lines1 == lines2
 
 
-def test_chunking(authenticated_user, tempdir):
+@pytest.mark.parametrize("binary", [True, False])
+def test_chunking(authenticated_user, tempdir, binary, monkeypatch):
+    import Acquire.Client._chunkuploader as _chunkuploader
+    import Acquire.Client._chunkdownloader as _chunkdownloader
+    monkeypatch.setattr(_chunkuploader, "_use_binary_transfer", binary)
+    monkeypatch.setattr(_chunkdownloader, "_use_binary_transfer", binary)
+
     drive_name = "test_chunking"
     creds = StorageCreds(user=authenticated_user, service_url="storage")
 
@@ -54,3 +60,147 @@ def test_chunking(authenticated_user, tempdir):
 
     assert(lines[0] == "This is some text\n")
     assert(lines[1] == "Here is some more!\n")
+
+
+def test_chunk_upload_file(authenticated_user, tempdir):
+    drive_name = "test_chunking"
+    creds = StorageCreds(user=authenticated_user, service_url="storage")
+
+    drive = Drive(name=drive_name, creds=creds)
+
+    source = __file__
+    uploader = drive.chunk_upload("test_upload_file.py")
+    uploader.upload_file(source, chunk_size=256)
+    uploader.close()
+
+    filename = drive.download("test_upload_file.py", dir=tempdir)
+
+    assert(_same_file(source, filename))
+
+    # the uploader cannot be closed while there is a missing chunk
+    uploader = drive.chunk_upload("test_missing_chunk.py")
+    uploader._acknowledge(uploader._upload_chunk(0, "This is some text\n"))
+    uploader._acknowledge(uploader._upload_chunk(2, " some more!\n"))
+
+    with pytest.raises(Exception):
+        uploader.close()
+
+    uploader._acknowledge(uploader._upload_chunk(1, "Here is"))
+    uploader.close()
+
+    filename = drive.download("test_missing_chunk.py", dir=tempdir)
+
+    lines = open(filename).readlines()
+
+    assert(lines[0] == "This is some text\n")
+    assert(lines[1] == "Here is some more!\n")
+
+
+def test_chunk_upload_deduplicate(authenticated_user, tempdir):
+    import os
+
+    drive_name = "test_chunking"
+    creds = StorageCreds(user=authenticated_user, service_url="storage")
+
+    drive = Drive(name=drive_name, creds=creds)
+
+    data = os.urandom(100000)
+    source = os.path.join(tempdir, "dedup_source.bin")
+
+    def _upload(data):
+        with open(source, "wb") as FILE:
+            FILE.write(data)
+
+        uploader = drive.chunk_upload("test_dedup.bin")
+
+        uploaded = []
+        upload_chunk = uploader._upload_chunk
+
+        def _upload_chunk(index, chunk, chunk_hash=None):
+            uploaded.append(index)
+            return upload_chunk(index, chunk, chunk_hash=chunk_hash)
+
+        uploader._upload_chunk = _upload_chunk
+        uploader.upload_file(source, chunk_size=4096, deduplicate=True)
+        nchunks = len(uploader.uploaded_chunks())
+        uploader.close()
+
+        filename = drive.download("test_dedup.bin", dir=tempdir)
+
+        with open(filename, "rb") as FILE:
+            assert(FILE.read() == data)
+
+        return (len(uploaded), nchunks)
+
+    (nuploaded, nchunks) = _upload(data)
+    assert(nuploaded == nchunks)
+    assert(nchunks > 5)
+
+    # re-uploading the same data doesn't send any chunks
+    (nuploaded, nchunks) = _upload(data)
+    assert(nuploaded == 0)
+
+    # a small change only sends the changed chunks
+    data = data[0:50000] + b"a small change" + data[50000:]
+    (nuploaded, nchunks) = _upload(data)
+    assert(nuploaded > 0)
+    assert(nuploaded <= 2)
+
+
+def test_chunk_upload_abort(authenticated_user, tempdir, monkeypatch):
+    import os
+    import Acquire.Storage._driveinfo as _driveinfo
+
+    drive_name = "test_chunk_abort"
+    creds = StorageCreds(user=authenticated_user, service_url="storage")
+
+    drive = Drive(name=drive_name, creds=creds)
+
+    data = os.urandom(50000)
+    source = os.path.join(tempdir, "abort_source.bin")
+
+    with open(source, "wb") as FILE:
+        FILE.write(data)
+
+    def _upload():
+        uploader = drive.chunk_upload("test_abort.bin")
+
+        uploaded = []
+        upload_chunk = uploader._upload_chunk
+
+        def _upload_chunk(index, chunk, chunk_hash=None):
+            uploaded.append(index)
+            return upload_chunk(index, chunk, chunk_hash=chunk_hash)
+
+        uploader._upload_chunk = _upload_chunk
+        uploader.upload_file(source, chunk_size=4096, deduplicate=True)
+
+        return (uploader, len(uploaded))
+
+    (uploader, nuploaded) = _upload()
+    nchunks = len(uploader.uploaded_chunks())
+    assert(nuploaded == nchunks)
+
+    # aborting releases the chunks, so they are all uploaded again
+    uploader.abort()
+    assert(not uploader.is_open())
+
+    (uploader, nuploaded) = _upload()
+    assert(nuploaded == nchunks)
+
+    # an expired uploader cannot be closed, and releases its chunks
+    monkeypatch.setattr(_driveinfo, "_is_expired", lambda data: True)
+
+    with pytest.raises(Exception):
+        uploader.close()
+
+    monkeypatch.undo()
+
+    (uploader, nuploaded) = _upload()
+    assert(nuploaded == nchunks)
+    uploader.close()
+
+    filename = drive.download("test_abort.bin", dir=tempdir)
+
+    with open(filename, "rb") as FILE:
+        assert(FILE.read() == data)